@@ -3,186 +3,1068 @@ import logging
 import argparse
 import json
 import time
-import requests
-from typing import Dict, List, Any, Optional
-from dotenv import load_dotenv
-from pydantic import BaseModel, Field
-from linkup import LinkupClient
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Iterator, Tuple
+from cache import (
+    DiskCache, get_research_cache, research_cache_key,
+    get_generation_cache, generation_cache_key, generation_cache_enabled
+)
+from batch import BatchRunner, load_topics, print_report
+from transport import Transport
+from metrics import PipelineMetrics, REGISTRY
+from model_registry import get_model_registry
+from backends import BackendPool, get_backend_pool
+from singleflight import RESEARCH_FLIGHTS, GENERATION_FLIGHTS
+from research import DeepResearchConfig, plan_subqueries, merge_deep_research
+from prompt_builder import PromptBuilder
+from sessions import SESSIONS, keep_alive, session_key
+from deadline import Deadline, STAGE_LATENCY, default_timeout, run_with_timeout
+from history import HistoryStore, get_history_store, history_enabled
+from linkup_scheduler import LinkupScheduler, get_linkup_scheduler
+from model_router import (
+    MODEL_ROUTER, ModelRouter, candidate_models, preferred_model, routing_enabled, latency_target
+)
+from vector_index import (
+    VectorIndex, EMBED_RETRY_SECONDS, get_vector_index, vector_index_enabled, embed_model,
+    embedding_payload, parse_embedding, post_text, post_excerpt
+)
+from variants import DEFAULT_VARIANTS, MAX_VARIANTS, variant_payloads, score_draft, rank_variants
+from outline import (
+    Outline, HeadingFilter, OUTLINE_TOKENS, PART_STOP, section_count, part_tokens, word_split,
+    outline_prompt, parse_outline, intro_prompt, section_prompt
+)
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Logging is configured by entry points (main, app.py, server.py), not on import
 logger = logging.getLogger(__name__)
 
-# Load environment variables
-load_dotenv()
+# Heavy dependencies (requests, linkup, httpx, pydantic, dotenv) are imported on
+# first use so the CLI and the per-session MCP server start quickly
+_env_loaded = False
 
-class LinkUpSearchInput(BaseModel):
-    """Input schema for LinkUp Search."""
-    query: str = Field(description="The search query to perform")
-    depth: str = Field(default="standard", description="Depth of search: 'standard' or 'deep'")
-    output_type: str = Field(default="sourcedAnswer", description="Output type: 'searchResults', 'sourcedAnswer', or 'structured'")
-    include_images: bool = Field(default=False, description="Whether to include images in the search results")
+# num_predict for a single-pass post
+GENERATION_TOKENS = 500
+
+def load_env() -> None:
+    """Load environment variables from .env once, on first use."""
+    global _env_loaded
+    if _env_loaded:
+        return
+    from dotenv import load_dotenv
+    load_dotenv()
+    _env_loaded = True
+
+def _build_linkup_search_input() -> type:
+    from pydantic import BaseModel, Field
+    
+    class LinkUpSearchInput(BaseModel):
+        """Input schema for LinkUp Search."""
+        query: str = Field(description="The search query to perform")
+        depth: str = Field(default="standard", description="Depth of search: 'standard' or 'deep'")
+        output_type: str = Field(default="sourcedAnswer", description="Output type: 'searchResults', 'sourcedAnswer', or 'structured'")
+        include_images: bool = Field(default=False, description="Whether to include images in the search results")
+    
+    LinkUpSearchInput.__qualname__ = "LinkUpSearchInput"
+    return LinkUpSearchInput
+
+def __getattr__(name: str) -> Any:
+    """Build LinkUpSearchInput (and import pydantic) only when someone asks for it."""
+    if name == "LinkUpSearchInput":
+        value = _build_linkup_search_input()
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 class BlogGenerator:
     """Main class for blog generation."""
     
-    def __init__(self):
+    def __init__(
+        self,
+        use_cache: bool = True,
+        transport: Optional[Transport] = None,
+        use_generation_cache: Optional[bool] = None,
+        backends: Optional[BackendPool] = None,
+        research_depth: Optional[str] = None,
+        reuse_context: Optional[bool] = None,
+        draft_mode: Optional[str] = None,
+        timeout: Optional[float] = None,
+        use_history: Optional[bool] = None,
+        use_index: Optional[bool] = None,
+        research_lane: Optional[str] = None
+    ):
         """Initialize the blog generator with necessary resources."""
+        self._configure(
+            use_cache, transport, use_generation_cache, backends, research_depth, reuse_context, draft_mode, timeout,
+            use_history, use_index, research_lane
+        )
+        
+        # Models are discovered lazily, on first use, via the shared registry
+        self._model_lock = threading.Lock()
+        
+        logger.info("BlogGenerator initialized")
+    
+    def _configure(
+        self,
+        use_cache: bool,
+        transport: Optional[Transport] = None,
+        use_generation_cache: Optional[bool] = None,
+        backends: Optional[BackendPool] = None,
+        research_depth: Optional[str] = None,
+        reuse_context: Optional[bool] = None,
+        draft_mode: Optional[str] = None,
+        timeout: Optional[float] = None,
+        use_history: Optional[bool] = None,
+        use_index: Optional[bool] = None,
+        research_lane: Optional[str] = None
+    ) -> None:
+        """Load settings shared by the sync and async generators."""
+        load_env()
         self.api_key = os.getenv("LINKUP_API_KEY")
         if not self.api_key:
             raise ValueError("LINKUP_API_KEY environment variable is not set")
             
-        # Cache available models at startup to avoid repeated API calls
         self.base_url = os.getenv("LLM_BASE_URL", "http://localhost:11434")
         self.model = os.getenv("LLM_MODEL", "llama3:latest")
-        self.available_models = self._get_available_models()
+        self.available_models: List[str] = []
+        self.model_registry = get_model_registry()
+        self._models_checked = False
         
-        # Choose best available model once at initialization
-        if self.model not in self.available_models and self.available_models:
-            for fallback in ["llama3", "llama2", "mistral", "gemma"]:
-                if fallback in self.available_models:
-                    self.model = fallback
-                    logger.info(f"Using fallback model: {self.model}")
-                    break
+        # Pooled keep-alive connections shared by every Ollama and LinkUp call
+        self.transport = transport or Transport.from_env()
+        
+        # Ollama hosts to spread generations over (LLM_BASE_URLS, else LLM_BASE_URL)
+        self.backends = backends or get_backend_pool(self.base_url, self.transport)
+        
+        # Every LinkUp search waits for the shared quota; interactive requests go before batch ones
+        self.linkup_scheduler: LinkupScheduler = get_linkup_scheduler()
+        self.research_lane = research_lane or os.getenv("RESEARCH_LANE", "interactive")
         
-        # Load minimal style guidelines
-        self.style_guide = "- Casual, friendly tone\n- Use first-person perspective\n- Include practical advice\n- Be conversational\n- No pretentious language"
+        # Research cache so repeat topics skip the Linkup round trip
+        self.research_cache: Optional[DiskCache] = None
+        if use_cache:
+            try:
+                self.research_cache = get_research_cache()
+            except Exception as e:
+                logger.warning(f"Research cache unavailable: {str(e)}")
+        
+        # "deep" fans each topic out into concurrent sub-queries merged into a brief
+        self.research_depth = research_depth or os.getenv("RESEARCH_DEPTH", "standard")
+        self.deep_research = DeepResearchConfig.from_env()
+        
+        # Opt-in cache of finished posts keyed by the exact generation payload
+        if use_generation_cache is None:
+            use_generation_cache = generation_cache_enabled()
+        self.generation_cache: Optional[DiskCache] = None
+        if use_generation_cache:
+            try:
+                self.generation_cache = get_generation_cache()
+            except Exception as e:
+                logger.warning(f"Generation cache unavailable: {str(e)}")
+        
+        # Model discovery time is reported once, on the first post's metrics
+        self.model_discovery_time: Optional[float] = None
+        self._pending_discovery_time: Optional[float] = None
+        
+        # Voice and structure come from prompts/*.md, trimmed to PROMPT_TOKEN_BUDGET
+        self.prompt_builder = PromptBuilder.from_env()
+        
+        # Keep the model loaded between posts and, optionally, reuse a precomputed
+        # Ollama context for the shared style prefix so each post only prefills its own part
+        self.keep_alive = keep_alive()
+        if reuse_context is None:
+            reuse_context = os.getenv("LLM_REUSE_CONTEXT", "0") == "1"
+        self.reuse_context = reuse_context
+        
+        # "sections" drafts an outline first, then writes its sections concurrently
+        self.draft_mode = draft_mode or os.getenv("BLOG_DRAFT_MODE", "single")
+        self.outline_sections = section_count()
+        
+        # Time limit per post, split between research and generation (0 means none)
+        if timeout is None:
+            timeout = default_timeout()
+        self.timeout = timeout if timeout and timeout > 0 else None
+        
+        # Finished posts are recorded in the history, whose research is reused for closely related topics
+        if use_history is None:
+            use_history = history_enabled()
+        self.history: Optional[HistoryStore] = None
+        if use_history:
+            try:
+                self.history = get_history_store()
+            except Exception as e:
+                logger.warning(f"Post history unavailable: {str(e)}")
+        self.history_reuse = os.getenv("HISTORY_REUSE", "1") != "0"
+        self.history_similarity = float(os.getenv("HISTORY_REUSE_SIMILARITY", "0.75"))
+        self.history_max_age = float(os.getenv("HISTORY_REUSE_MAX_AGE", str(3 * 86400)))
+        
+        # Semantic index of past research and posts, embedded by a local Ollama model:
+        # near-identical topics reuse earlier research and related posts are quoted in the prompt
+        if use_index is None:
+            use_index = vector_index_enabled()
+        self.vector_index: Optional[VectorIndex] = None
+        if use_index:
+            try:
+                self.vector_index = get_vector_index()
+            except Exception as e:
+                logger.warning(f"Vector index unavailable: {str(e)}")
+        self.embed_model = embed_model()
+        self.embed_url = os.getenv("EMBED_BASE_URL", self.base_url)
+        self.index_reuse = os.getenv("VECTOR_REUSE", "1") != "0"
+        self.index_similarity = float(os.getenv("VECTOR_REUSE_SIMILARITY", "0.9"))
+        self.index_max_age = float(os.getenv("VECTOR_REUSE_MAX_AGE", str(self.history_max_age)))
+        self.related_similarity = float(os.getenv("VECTOR_RELATED_SIMILARITY", "0.6"))
+        self.related_posts = int(os.getenv("VECTOR_RELATED_POSTS", "2"))
+        self._embed_retry_at = 0.0
         
-        logger.info(f"BlogGenerator initialized with model {self.model}")
+        # With LLM_MODELS set, each post's model is picked from those candidates by observed
+        # speed, the time the post has left and the backend queue (LLM_ROUTING=0 pins self.model)
+        self.model_router: ModelRouter = MODEL_ROUTER
+        self.routing = routing_enabled()
+        self.candidate_models: List[str] = [self.model]
+    
+    def _record_model_discovery(self, seconds: float) -> None:
+        """Remember how long model discovery took for metrics."""
+        self.model_discovery_time = seconds
+        self._pending_discovery_time = seconds
+        REGISTRY.observe_stage("model_discovery", seconds)
+    
+    def _start_metrics(self, query: str) -> PipelineMetrics:
+        """Create the metrics object for one post (call after the model is resolved)."""
+        metrics = PipelineMetrics(query, self.model)
+        if self._pending_discovery_time is not None:
+            metrics.stages["model_discovery"] = self._pending_discovery_time
+            self._pending_discovery_time = None
+        return metrics
+    
+    def _select_model(self) -> None:
+        """Choose best available model once the model list is known, and the models to route between."""
+        if self.model not in self.available_models and self.available_models:
+            fallback = preferred_model(self.available_models)
+            if fallback:
+                self.model = fallback
+                logger.info(f"Using fallback model: {self.model}")
+        self.candidate_models = candidate_models(self.model, self.available_models)
+        if self.routing and len(self.candidate_models) > 1:
+            logger.info(f"Routing posts between models: {', '.join(self.candidate_models)}")
+    
+    def _route_model(self, deadline: Optional[Deadline] = None, lane: Optional[str] = None) -> str:
+        """The model for one post: the largest candidate expected to finish in the time it has.
+        
+        lane defaults to the generator's research lane.
+        """
+        if not self.routing or len(self.candidate_models) < 2:
+            return self.model
+        lane = lane or self.research_lane
+        budgets = [
+            budget for budget in (deadline.remaining() if deadline else None, latency_target(lane))
+            if budget is not None
+        ]
+        model, reason = self.model_router.choose(
+            self.candidate_models, GENERATION_TOKENS, min(budgets) if budgets else None, self.backends.load(), lane
+        )
+        logger.info(f"Routed to {model}: {reason}")
+        return model
+    
+    def _ensure_model(self) -> None:
+        """Discover models and pick the best one, once per generator."""
+        if self._models_checked:
+            return
+        with self._model_lock:
+            if self._models_checked:
+                return
+            start_time = time.time()
+            self.available_models = self._get_available_models()
+            self._record_model_discovery(time.time() - start_time)
+            self._select_model()
+            self._models_checked = True
+            logger.info(f"BlogGenerator using model {self.model}")
     
     def _get_available_models(self) -> List[str]:
-        """Get available models once at initialization."""
+        """Get available models from the process-wide registry (probes /api/tags only when needed)."""
+        return self.model_registry.get_models(self.base_url, self.transport)
+            
+    def _research_cache_key(self, query: str, depth: str) -> str:
+        if depth == "deep":
+            return research_cache_key(query, "deep", self.deep_research.cache_tag)
+        return research_cache_key(query, "standard", "sourcedAnswer")
+    
+    def _stages(self) -> List[str]:
+        """Pipeline stages a post goes through, in order, for splitting its deadline."""
+        if self.draft_mode == "sections":
+            return ["research", "outline", "generation"]
+        return ["research", "generation"]
+    
+    def get_research(
+        self,
+        query: str,
+        depth: Optional[str] = None,
+        deadline: Optional[Deadline] = None,
+        refresh: bool = False
+    ) -> Dict[str, Any]:
+        """Get research results, served from the research cache when possible.
+        
+        depth is "standard" (one LinkUp answer) or "deep" (see _fetch_deep_research);
+        it defaults to the generator's research_depth. Research on a
+        near-identical topic is reused from the vector index, or else from a
+        recent post on a closely related topic in the history, and related
+        earlier posts are attached under "related" for the prompt. With a
+        deadline, research gets its share of the time left; past that the post
+        is written without it, while the search finishes in the background and
+        fills the cache. refresh skips the cache and reuse and always searches.
+        """
+        depth = depth or self.research_depth
+        cache_key = self._research_cache_key(query, depth)
+        if refresh:
+            vector = self._embed(query)
+        else:
+            cached = self._read_research_cache(cache_key, query)
+            if cached is not None:
+                return cached
+            cached, vector = self._reuse_research(query, depth)
+            if cached is not None:
+                return self._with_related(cached, vector)
+        
+        # Identical queries already being researched share that one LinkUp call
+        def fetch() -> Dict[str, Any]:
+            if depth == "deep":
+                results = self._fetch_deep_research(query)
+            else:
+                results = self._fetch_research(query)
+            self._write_research_cache(cache_key, results)
+            self._index_research(query, results, vector)
+            return results
+        
+        budget = deadline.budget("research", self._stages()) if deadline else None
+        try:
+            results, shared = run_with_timeout(lambda: RESEARCH_FLIGHTS.do(cache_key, fetch), budget, "research")
+        except TimeoutError:
+            error = f"research took longer than its {budget:.1f}s share of the deadline"
+            logger.warning(f"{error.capitalize()}, writing without it")
+            results = dict(self._research_fallback(query, error), timed_out=True)
+            return self._with_related(results, vector)
+        if shared:
+            results = dict(results, shared=True)
+        return self._with_related(results, vector)
+    
+    def _reuse_research(self, query: str, depth: str) -> Tuple[Optional[Dict[str, Any]], Optional[List[float]]]:
+        """Earlier research worth reusing for query, if any, and the query's embedding."""
+        vector = self._embed(query)
+        research = self._read_index_research(query, depth, vector)
+        if research is None:
+            research = self._read_history_research(query, depth)
+        return research, vector
+    
+    def _read_research_cache(self, cache_key: str, query: str) -> Optional[Dict[str, Any]]:
+        """Look up processed research in the research cache."""
+        if not self.research_cache:
+            return None
         try:
-            headers = {"Content-Type": "application/json"}
-            models_response = requests.get(
-                f"{self.base_url}/api/tags",
-                headers=headers,
-                timeout=10
+            cached = self.research_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"Research cache hit: {query}")
+                cached["cached"] = True
+            return cached
+        except Exception as e:
+            logger.warning(f"Research cache read failed: {str(e)}")
+            return None
+    
+    def _read_history_research(self, query: str, depth: str) -> Optional[Dict[str, Any]]:
+        """Research of a recent post on a closely related topic, if the history has one."""
+        if not self.history or not self.history_reuse:
+            return None
+        try:
+            research = self.history.related_research(
+                query, self.history_similarity, self.history_max_age, require_brief=depth == "deep"
             )
-            if models_response.status_code == 200:
-                available_models = models_response.json().get("models", [])
-                model_names = [model.get('name') for model in available_models if 'name' in model]
-                logger.info(f"Available models: {model_names}")
-                return model_names
         except Exception as e:
-            logger.warning(f"Could not check available models: {str(e)}")
-        return []
-            
-    def get_research(self, query: str) -> Dict[str, Any]:
+            logger.warning(f"History lookup failed: {str(e)}")
+            return None
+        if research is not None:
+            logger.info(f"Reusing research from an earlier post: {research['reused_from']}")
+            research["cached"] = True
+        return research
+    
+    def _embed(self, text: str) -> Optional[List[float]]:
+        """Embedding of text from the local Ollama embeddings endpoint; None without an index or on failure."""
+        if self.vector_index is None or time.time() < self._embed_retry_at:
+            return None
+        try:
+            response = self.transport.post(
+                f"{self.embed_url}/api/embeddings", json=embedding_payload(self.embed_model, text)
+            )
+            if response.status_code == 200:
+                vector = parse_embedding(response.json())
+                if vector:
+                    return vector
+            reason = f"HTTP {response.status_code}"
+        except Exception as e:
+            reason = str(e)
+        self._embedding_failed(reason)
+        return None
+    
+    def _embedding_failed(self, reason: str) -> None:
+        """Stop asking for embeddings for a while after the endpoint failed."""
+        self._embed_retry_at = time.time() + EMBED_RETRY_SECONDS
+        logger.warning(f"Embeddings from {self.embed_model} unavailable, semantic reuse paused: {reason}")
+    
+    def _read_index_research(
+        self,
+        query: str,
+        depth: str,
+        vector: Optional[List[float]]
+    ) -> Optional[Dict[str, Any]]:
+        """Research on a near-identical topic from the vector index, if it has some recent enough."""
+        if vector is None or not self.index_reuse:
+            return None
+        try:
+            matches = self.vector_index.search(
+                vector, "research", limit=5, min_similarity=self.index_similarity, max_age=self.index_max_age
+            )
+        except Exception as e:
+            logger.warning(f"Vector index lookup failed: {str(e)}")
+            return None
+        for similarity, entry in matches:
+            research = entry["research"]
+            if depth == "deep" and not research.get("brief"):
+                continue
+            logger.info(f"Reusing research on a similar topic ({similarity:.2f}): {entry['topic']}")
+            return dict(research, cached=True, reused_from=entry["topic"], similarity=round(similarity, 3))
+        return None
+    
+    def _index_research(self, query: str, results: Dict[str, Any], vector: Optional[List[float]]) -> None:
+        """Add freshly fetched research to the vector index under the query's embedding."""
+        if vector is None or not results.get("summary") or results.get("fallback"):
+            return
+        try:
+            self.vector_index.add("research", query, vector, {"research": self._research_record(results)})
+        except Exception as e:
+            logger.warning(f"Vector index write failed: {str(e)}")
+    
+    def _with_related(self, research_results: Dict[str, Any], vector: Optional[List[float]]) -> Dict[str, Any]:
+        """research_results with openings of the most similar earlier posts attached under "related"."""
+        if vector is None or self.related_posts <= 0:
+            return research_results
+        try:
+            matches = self.vector_index.search(
+                vector, "post", limit=self.related_posts, min_similarity=self.related_similarity
+            )
+        except Exception as e:
+            logger.warning(f"Vector index lookup failed: {str(e)}")
+            return research_results
+        related = [{"topic": entry["topic"], "excerpt": entry["excerpt"]} for _, entry in matches if entry["excerpt"]]
+        return dict(research_results, related=related) if related else research_results
+    
+    def _research_record(self, research_results: Dict[str, Any]) -> Dict[str, Any]:
+        """The parts of research worth keeping with a post or index entry."""
+        return {
+            key: research_results[key]
+            for key in ("summary", "brief", "sources", "subqueries", "depth", "fallback", "reused_from")
+            if key in research_results
+        }
+    
+    def record_post(
+        self,
+        query: str,
+        content: str,
+        research_results: Dict[str, Any],
+        metrics: Optional[PipelineMetrics] = None,
+        partial: bool = False
+    ) -> Optional[int]:
+        """Add a finished post to the history, and a complete one to the vector index; return its history id."""
+        post_id = None
+        if self.history:
+            try:
+                post_id = self.history.add(
+                    query, content, metrics.model if metrics else self.model, self._research_record(research_results),
+                    metrics.to_dict() if metrics else None, partial
+                )
+            except Exception as e:
+                logger.warning(f"History write failed: {str(e)}")
+        if not partial:
+            self._index_post(query, content, post_id)
+        return post_id
+    
+    def _index_post(self, query: str, content: str, post_id: Optional[int]) -> None:
+        if self.vector_index is None:
+            return
+        # The history returns the existing id for a post it already had
+        if post_id is not None and self.vector_index.contains("post", post_id=post_id):
+            return
+        vector = self._embed(post_text(query, content))
+        if vector is None:
+            return
+        try:
+            self.vector_index.add("post", query, vector, {"excerpt": post_excerpt(content), "post_id": post_id})
+        except Exception as e:
+            logger.warning(f"Vector index write failed: {str(e)}")
+    
+    def _write_research_cache(self, cache_key: str, results: Dict[str, Any]) -> None:
+        """Store processed research, skipping the placeholder fallback."""
+        if not self.research_cache or not results.get("summary") or results.get("fallback"):
+            return
+        try:
+            self.research_cache.set(cache_key, results)
+        except Exception as e:
+            logger.warning(f"Research cache write failed: {str(e)}")
+    
+    def _research_fallback(self, query: str, error: str) -> Dict[str, Any]:
+        """Placeholder research for a post written without it; error says why, for the caller to report."""
+        return {"summary": f"Key trends in {query}", "fallback": True, "error": error}
+    
+    def _fetch_research(self, query: str) -> Dict[str, Any]:
         """Get research results from LinkUp API with focused parameters."""
         logger.info(f"Researching: {query}")
         try:
-            client = LinkupClient(api_key=self.api_key)
-            search_response = client.search(
-                query=query,
-                depth="standard",
-                output_type="sourcedAnswer",
-                include_images=False
+            client = self.transport.linkup(self.api_key)
+            search_response = self.linkup_scheduler.call(
+                lambda: client.search(
+                    query=query,
+                    depth="standard",
+                    output_type="sourcedAnswer",
+                    include_images=False
+                ),
+                self.research_lane
             )
             logger.info("Research complete")
+            return self._process_search_response(search_response)
+        except Exception as e:
+            logger.error(f"Research error: {str(e)}")
+            return self._research_fallback(query, str(e))
+    
+    def _fetch_deep_research(self, query: str) -> Dict[str, Any]:
+        """Research a topic from several angles at once and merge the results.
+        
+        Each sub-query asks LinkUp for a sourcedAnswer and the topic itself also
+        gets a searchResults pass; all run concurrently, so wall time tracks the
+        slowest single search. Sources are deduplicated and ranked into a brief.
+        """
+        subqueries = plan_subqueries(query, self.deep_research.subqueries)
+        logger.info(f"Deep research: {len(subqueries)} sub-queries for {query}")
+        try:
+            client = self.transport.linkup(self.api_key)
             
-            # Process the results to extract only what's needed - maximum brevity
-            if isinstance(search_response, str):
-                try:
-                    data = json.loads(search_response)
-                except:
-                    return {"summary": search_response[:200]}
-            else:
-                data = search_response
-                
-            # Extract minimal information - just 2-3 key points
-            processed_results = {"summary": ""}
+            def search(text: str, output_type: str) -> Any:
+                return self.linkup_scheduler.call(
+                    lambda: client.search(query=text, depth="standard", output_type=output_type, include_images=False),
+                    self.research_lane
+                )
             
-            if isinstance(data, dict):
-                if 'answer' in data:
-                    # Extract just first 2 sentences or 200 chars max
-                    answer = data['answer']
-                    sentences = answer.split('. ')
-                    short_answer = '. '.join(sentences[:2])
-                    if len(short_answer) > 200:
-                        short_answer = short_answer[:197] + "..."
-                    processed_results['summary'] = short_answer
+            with ThreadPoolExecutor(max_workers=len(subqueries) + 1, thread_name_prefix="deep-research") as pool:
+                answer_futures = [pool.submit(search, subquery, "sourcedAnswer") for subquery in subqueries]
+                results_future = pool.submit(search, query, "searchResults")
+                responses = [future.exception() or future.result() for future in answer_futures]
+                searched = results_future.exception() or results_future.result()
             
-            return processed_results
+            merged = merge_deep_research(query, subqueries, responses, searched, self.deep_research)
+            if merged is not None:
+                logger.info(f"Deep research complete: {len(merged['sources'])} sources")
+                return merged
+            errors = [str(response) for response in responses + [searched] if isinstance(response, BaseException)]
+            error = errors[0] if errors else "deep research returned nothing usable"
+            logger.error(f"Research error: {error}")
         except Exception as e:
-            logger.error(f"Research error: {str(e)}")
-            return {"summary": f"Key trends in {query}"}
+            error = str(e)
+            logger.error(f"Research error: {error}")
+        return self._research_fallback(query, error)
+    
+    def _process_search_response(self, search_response: Any) -> Dict[str, Any]:
+        """Process the results to extract only what's needed - maximum brevity."""
+        if isinstance(search_response, str):
+            try:
+                data = json.loads(search_response)
+            except:
+                return {"summary": search_response[:200]}
+        elif hasattr(search_response, "model_dump"):
+            data = search_response.model_dump()
+        else:
+            data = search_response
             
-    def generate_blog(self, query: str, research_results: Dict[str, Any]) -> str:
-        """Generate blog content using the LLM with proper prompting."""
-        logger.info("Generating blog content")
+        # Extract minimal information - just 2-3 key points
+        processed_results = {"summary": ""}
+        
+        if isinstance(data, dict):
+            if 'answer' in data:
+                # Extract just first 2 sentences or 200 chars max
+                answer = data['answer']
+                sentences = answer.split('. ')
+                short_answer = '. '.join(sentences[:2])
+                if len(short_answer) > 200:
+                    short_answer = short_answer[:197] + "..."
+                processed_results['summary'] = short_answer
+        
+        return processed_results
+    
+    def _build_prompt(self, query: str, research_results: Dict[str, Any]) -> str:
+        """Build the prompt from the style guides, or a concise built-in one if they are missing."""
+        try:
+            prompt = self.prompt_builder.build(query, research_results)
+            if prompt:
+                return prompt
+        except Exception as e:
+            logger.warning(f"Could not build prompt from style guides: {str(e)}")
         
-        # Create an extremely concise prompt
         summary = research_results.get('summary', '')
-        prompt = f"""Write a short blog post (600 words max) about {query}. 
+        brief = research_results.get('brief')
+        if brief:
+            # Deep research: ground the post in the merged brief and its sources
+            return f"""Write a short blog post (600 words max) about {query}. 
+Style: casual, first-person, practical advice.
+Use these research notes; mention sources by name where they back a claim:
+{brief}
+End with: "Keep being awesome at what you do!"
+Format: title, intro, 2-3 sections, conclusion."""
+        return f"""Write a short blog post (600 words max) about {query}. 
 Style: casual, first-person, practical advice.
 Key point: {summary}
 End with: "Keep being awesome at what you do!"
 Format: title, intro, 2-3 sections, conclusion."""
-
-        try:
-            # Use streaming to avoid timeouts
-            headers = {"Content-Type": "application/json"}
-            payload = {
-                "model": self.model,
-                "prompt": prompt,
-                "stream": True,  # Use streaming to avoid timeout
+    
+    def _build_payload(
+        self,
+        prompt: str,
+        system: Optional[str] = None,
+        context: Optional[List[int]] = None,
+        model: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Build the /api/generate request body (for the generator's model unless model is given)."""
+        payload = {
+            "model": model or self.model,
+            "prompt": prompt,
+            "stream": True,  # Use streaming to avoid timeout
+            "keep_alive": self.keep_alive,
+            # Sampling settings only take effect under "options"
+            "options": {
                 "temperature": 0.7,
-                "num_predict": 500,  # Reduced for faster generation
+                "num_predict": GENERATION_TOKENS,  # Reduced for faster generation
                 "stop": ["# END"]
             }
-            
-            logger.info(f"Sending streaming request to LLM API using model: {self.model}")
-            start_time = time.time()
-            
-            # Stream the response to avoid timeout
-            response = requests.post(
-                f"{self.base_url}/api/generate",
-                headers=headers,
-                json=payload,
-                stream=True,
-                timeout=30  # Initial connection timeout
+        }
+        if context:
+            payload["context"] = context
+        elif system:
+            payload["system"] = system
+        return payload
+    
+    def _build_request(
+        self,
+        query: str,
+        research_results: Dict[str, Any],
+        model: Optional[str] = None
+    ) -> Tuple[Dict[str, Any], str]:
+        """Build the generation payload and its generation cache key.
+        
+        The style guide goes in a fixed system prefix ahead of the per-post
+        prompt, so consecutive posts share it and Ollama can reuse its KV cache.
+        With reuse_context, the prefix is sent once as a precomputed context
+        instead of being re-tokenized on every request.
+        """
+        parts = None
+        try:
+            parts = self.prompt_builder.build_parts(query, research_results)
+        except Exception as e:
+            logger.warning(f"Could not build prompt from style guides: {str(e)}")
+        model = model or self.model
+        if parts is None:
+            payload = self._build_payload(self._build_prompt(query, research_results), model=model)
+            return payload, generation_cache_key(payload)
+        
+        system, prompt = parts
+        context = self._session_context(system, model) if self.reuse_context else None
+        payload = self._build_payload(prompt, system=system, context=context, model=model)
+        # Key on the prefix itself rather than on its token ids
+        identity = dict(payload, context=session_key(model, system)) if context else payload
+        return payload, generation_cache_key(identity)
+    
+    def _part_payload(
+        self,
+        payload: Dict[str, Any],
+        prompt: str,
+        num_predict: int,
+        stop: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Request for one part of a sectioned draft, sharing the post's system prompt or context."""
+        part = dict(payload, prompt=prompt)
+        part["options"] = dict(payload["options"], num_predict=num_predict, stop=stop or PART_STOP)
+        if "system" not in part and "context" not in part:
+            # The built-in prompt carries its style line inline; parts need it too
+            part["system"] = "Style: casual, first-person, practical advice."
+        return part
+    
+    def _outline_request(self, query: str, payload: Dict[str, Any], research_results: Dict[str, Any]) -> Dict[str, Any]:
+        notes = self.prompt_builder.research_notes(research_results)
+        prompt = outline_prompt(query, notes, self.outline_sections)
+        return self._part_payload(payload, prompt, OUTLINE_TOKENS, stop=["# END"])
+    
+    def _part_requests(
+        self,
+        query: str,
+        payload: Dict[str, Any],
+        research_results: Dict[str, Any],
+        outline: Outline
+    ) -> List[Dict[str, Any]]:
+        """Requests for the intro and each section, in post order."""
+        notes = self.prompt_builder.research_notes(research_results)
+        target_words = self.prompt_builder.target_words
+        words = word_split(target_words, len(outline.headings))
+        # Split the single-pass token budget so a sectioned post is about as long
+        post_tokens = payload["options"]["num_predict"]
+        intro_tokens = part_tokens(words["intro"], target_words, post_tokens)
+        section_tokens = part_tokens(words["section"], target_words, post_tokens)
+        requests = [self._part_payload(payload, intro_prompt(query, outline, notes, words["intro"]), intro_tokens)]
+        for index in range(len(outline.headings)):
+            prompt = section_prompt(query, outline, index, notes, words["section"])
+            requests.append(self._part_payload(payload, prompt, section_tokens))
+        return requests
+    
+    def _parse_outline(self, query: str, text: str) -> Optional[Outline]:
+        outline = parse_outline(text, query, self.outline_sections)
+        if outline is None:
+            logger.warning("Outline reply had too few sections, drafting in one pass")
+        else:
+            logger.info(f"Outline: {outline.title} ({len(outline.headings)} sections)")
+        return outline
+    
+    def _draft_outline(
+        self,
+        query: str,
+        payload: Dict[str, Any],
+        research_results: Dict[str, Any],
+        metrics: PipelineMetrics,
+        deadline: Optional[Deadline] = None
+    ) -> Optional[Outline]:
+        """Ask for the title and section headings; None if the reply was unusable or too slow."""
+        request = self._outline_request(query, payload, research_results)
+        timeout_at = deadline.stage_at("outline", ["outline", "generation"]) if deadline else None
+        try:
+            with metrics.stage("outline"):
+                flight, _ = GENERATION_FLIGHTS.stream(
+                    generation_cache_key(request), lambda meta: self._stream_generate(request, meta)
+                )
+                text = "".join(flight.subscribe(timeout_at))
+        except TimeoutError:
+            logger.warning("Outline took longer than its share of the deadline, drafting in one pass")
+            return None
+        except Exception as e:
+            logger.warning(f"Outline generation failed, drafting in one pass: {str(e)}")
+            return None
+        return self._parse_outline(query, text)
+    
+    def _stream_sections(
+        self,
+        query: str,
+        payload: Dict[str, Any],
+        research_results: Dict[str, Any],
+        outline: Outline,
+        cache_key: str,
+        metrics: PipelineMetrics,
+        deadline: Optional[Deadline] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """Draft the intro and sections concurrently and stream them back in post order.
+        
+        Every part starts at once, each on the least loaded backend, so wall time
+        tracks the slowest part rather than the whole post. The part being
+        shown streams live; later ones are buffered until their turn. A part
+        that fails is left out rather than failing the post. At the deadline,
+        unfinished parts are cancelled and the sections so far are returned.
+        """
+        timeout_at = deadline.at if deadline else None
+        requests = self._part_requests(query, payload, research_results, outline)
+        flights = [
+            GENERATION_FLIGHTS.stream(
+                generation_cache_key(request), lambda meta, request=request: self._stream_generate(request, meta)
+            )[0]
+            for request in requests
+        ]
+        metrics.sections = len(outline.headings)
+        
+        parts = [f"# {outline.title}\n\n"]
+        metrics.count_token()
+        yield {"type": "token", "text": parts[0]}
+        drafted = 0
+        with metrics.stage("generation"):
+            for index, flight in enumerate(flights):
+                heading = f"\n\n## {outline.headings[index - 1]}\n\n" if index else ""
+                heading_filter = HeadingFilter()
+                wrote = False
+                try:
+                    for fragment in flight.subscribe(timeout_at):
+                        text = heading_filter.feed(fragment)
+                        if not text:
+                            continue
+                        if not wrote and heading:
+                            text = heading + text
+                        wrote = True
+                        metrics.count_token()
+                        parts.append(text)
+                        yield {"type": "token", "text": text}
+                except TimeoutError:
+                    logger.warning("Deadline reached, returning the sections drafted so far")
+                    metrics.generation_timed_out = True
+                    for pending in flights[index + 1:]:
+                        pending.abandon()
+                    drafted += wrote
+                    break
+                except Exception as e:
+                    logger.warning(f"Draft part {index} failed: {str(e)}")
+                drafted += wrote
+        metrics.record_parallel_stats([flight.meta for flight in flights])
+        
+        if not drafted:
+            metrics.generation_fallback = True
+            yield {"type": "done", "content": self._generate_fallback_content(query), "fallback": True, "cached": False}
+            return
+        yield self._finish_post(query, "".join(parts), cache_key, metrics, partial=metrics.generation_timed_out)
+    
+    def _finish_post(
+        self,
+        query: str,
+        text: str,
+        cache_key: str,
+        metrics: PipelineMetrics,
+        shared: bool = False,
+        partial: bool = False
+    ) -> Dict[str, Any]:
+        """Finalize generated text into the done event, caching it when it is a complete post."""
+        content = self._finalize_content(query, text)
+        fallback = content == self._generate_fallback_content(query)
+        metrics.generation_fallback = fallback
+        if not fallback and not shared and not partial:
+            self._write_generation_cache(cache_key, content)
+        return {"type": "done", "content": content, "fallback": fallback, "cached": False, "partial": partial}
+    
+    def _session_context(self, system: str, model: Optional[str] = None) -> Optional[List[int]]:
+        """Context for the style prefix, warmed once per model and prefix."""
+        model = model or self.model
+        return SESSIONS.get(session_key(model, system), lambda: self._warm_session(system, model))
+    
+    def _warm_session(self, system: str, model: Optional[str] = None) -> Optional[List[int]]:
+        """Run the style prefix through Ollama once and return the resulting context.
+        
+        The prompt is a single newline: an empty prompt only loads the model and
+        returns no context, and a real message would become an extra user turn
+        that every post then follows.
+        """
+        model = model or self.model
+        backend = self.backends.acquire(model=model)
+        if backend is None:
+            return None
+        ok = True
+        try:
+            response = self.transport.post(
+                f"{backend.url}/api/generate",
+                json={
+                    "model": model,
+                    "system": system,
+                    "prompt": "\n",
+                    "stream": False,
+                    "keep_alive": self.keep_alive,
+                    "options": {"num_predict": 1, "temperature": 0}
+                }
             )
+            if response.status_code == 200:
+                context = response.json().get("context")
+                if context:
+                    logger.info(f"Warmed generation session: {len(context)} context tokens on {backend.url}")
+                    return context
+            logger.warning(f"Could not warm generation session: HTTP {response.status_code}")
+        except Exception as e:
+            ok = False
+            logger.warning(f"Could not warm generation session: {str(e)}")
+        finally:
+            self.backends.release(backend, ok)
+        return None
+    
+    def _finalize_content(self, query: str, content: str) -> str:
+        """Add the sign-off, or fall back when the model produced too little."""
+        # Add signature if missing
+        if "Keep being awesome at what you do" not in content:
+            content += "\n\nKeep being awesome at what you do!"
+        
+        # If we got at least some content, return it
+        if len(content) > 50:
+            logger.info(f"Blog generation complete - Length: {len(content)} characters")
+            return content
+        else:
+            # If very little content was generated, use fallback
+            return self._generate_fallback_content(query)
             
-            if response.status_code != 200:
-                logger.error(f"LLM API error: {response.status_code}")
-                return self._generate_fallback_content(query)
+    def _read_generation_cache(self, cache_key: str) -> Optional[str]:
+        """Look up a finished post in the generation cache."""
+        if not self.generation_cache:
+            return None
+        try:
+            cached = self.generation_cache.get(cache_key)
+            if cached is not None:
+                logger.info("Generation cache hit")
+            return cached
+        except Exception as e:
+            logger.warning(f"Generation cache read failed: {str(e)}")
+            return None
+    
+    def _write_generation_cache(self, cache_key: str, content: str) -> None:
+        """Store a finished post in the generation cache."""
+        if not self.generation_cache:
+            return
+        try:
+            self.generation_cache.set(cache_key, content)
+        except Exception as e:
+            logger.warning(f"Generation cache write failed: {str(e)}")
+    
+    def _stream_generate(self, payload: Dict[str, Any], stats: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        """Yield response fragments from the Ollama NDJSON stream as they arrive.
+        
+        The request is routed to the least loaded healthy backend. If a host
+        fails before producing any output, it is marked down and the request
+        fails over to the next one. Ollama's final message (token counts and
+        durations) is copied into stats and, with the measured time to first
+        token, feeds the model router.
+        """
+        import requests
+        
+        model = payload.get("model")
+        tried: List[str] = []
+        while True:
+            backend = self.backends.acquire(model=model, exclude=tried)
+            if backend is None:
+                raise RuntimeError("No healthy LLM backend available")
+            tried.append(backend.url)
+            logger.info(f"Sending streaming request to LLM API at {backend.url} using model: {model}")
             
-            # Collect the streamed response
-            content = ""
+            started = False
+            ok = True
+            sent_at = time.monotonic()
+            first_token_at: Optional[float] = None
             try:
-                for line in response.iter_lines():
-                    if line:
-                        try:
-                            # Process each line of the stream
-                            line_data = json.loads(line)
-                            if 'response' in line_data:
-                                content += line_data['response']
-                        except json.JSONDecodeError:
-                            pass
-            except requests.exceptions.ChunkedEncodingError:
-                logger.warning("Streaming connection broken")
-            except requests.exceptions.Timeout:
-                logger.warning("Streaming connection timed out")
-            
-            generation_time = time.time() - start_time
-            logger.info(f"Generation completed in {generation_time:.2f} seconds")
-            
-            # Add signature if missing
-            if "Keep being awesome at what you do" not in content:
-                content += "\n\nKeep being awesome at what you do!"
-            
-            # If we got at least some content, return it
-            if len(content) > 50:
-                logger.info(f"Blog generation complete - Length: {len(content)} characters")
-                return content
-            else:
-                # If very little content was generated, use fallback
-                return self._generate_fallback_content(query)
-            
+                # Stream the response over the pooled session; the connection goes
+                # back to the pool once the body is consumed or the response closed
+                with self.transport.post(f"{backend.url}/api/generate", json=payload, stream=True) as response:
+                    if response.status_code != 200:
+                        ok = False
+                        if response.status_code >= 500:
+                            self.backends.mark_down(backend, f"HTTP {response.status_code}")
+                        if len(tried) < len(self.backends.backends):
+                            logger.warning(f"LLM API error {response.status_code} from {backend.url}, failing over")
+                            continue
+                        raise RuntimeError(f"LLM API error: {response.status_code}")
+                    
+                    try:
+                        for line in response.iter_lines():
+                            if line:
+                                try:
+                                    # Process each line of the stream
+                                    line_data = json.loads(line)
+                                except json.JSONDecodeError:
+                                    continue
+                                if 'response' in line_data:
+                                    if not started:
+                                        started = True
+                                        first_token_at = time.monotonic()
+                                    yield line_data['response']
+                                if line_data.get('done'):
+                                    if stats is not None:
+                                        stats.update(line_data)
+                                    self.model_router.observe_stats(
+                                        model, backend.url, line_data, first_token_at and first_token_at - sent_at
+                                    )
+                                    break
+                    except requests.exceptions.ChunkedEncodingError:
+                        ok = False
+                        self.backends.mark_down(backend, "stream broken")
+                        logger.warning("Streaming connection broken")
+                    except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+                        ok = False
+                        logger.warning("Streaming connection timed out")
+                
+                if ok or started or len(tried) >= len(self.backends.backends):
+                    return
+                logger.warning(f"No output from {backend.url}, failing over")
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                # Could not even connect: this host is down, try the next one
+                ok = False
+                self.backends.mark_down(backend, str(e))
+                if len(tried) >= len(self.backends.backends):
+                    raise
+            finally:
+                self.backends.release(backend, ok)
+    
+    def stream_blog(
+        self,
+        query: str,
+        research_results: Dict[str, Any],
+        metrics: Optional[PipelineMetrics] = None,
+        deadline: Optional[Deadline] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """Generate blog content, yielding token events and a final done event.
+        
+        When the deadline passes mid-stream, generation is cancelled and the
+        done event carries the partial post with "partial" set.
+        """
+        logger.info("Generating blog content")
+        self._ensure_model()
+        model = self._route_model(deadline)
+        metrics = metrics or PipelineMetrics(query, model)
+        metrics.model = model
+        payload, cache_key = self._build_request(query, research_results, model)
+        if self.draft_mode == "sections":
+            cache_key = generation_cache_key({"request": cache_key, "sections": self.outline_sections})
+        cached = self._read_generation_cache(cache_key)
+        if cached is not None:
+            metrics.generation_cached = True
+            yield {"type": "done", "content": cached, "fallback": False, "cached": True}
+            return
+        
+        if self.draft_mode == "sections":
+            outline = self._draft_outline(query, payload, research_results, metrics, deadline)
+            if outline is not None:
+                yield from self._stream_sections(
+                    query, payload, research_results, outline, cache_key, metrics, deadline
+                )
+                return
+        
+        start_time = time.time()
+        parts: List[str] = []
+        # Concurrent requests with the same payload attach to one Ollama stream
+        flight, shared = GENERATION_FLIGHTS.stream(cache_key, lambda meta: self._stream_generate(payload, meta))
+        metrics.generation_shared = shared
+        try:
+            with metrics.stage("generation"):
+                # Leaving the stream at the deadline cancels the Ollama request once nobody else is reading it
+                for fragment in flight.subscribe(deadline.at if deadline else None):
+                    metrics.count_token()
+                    parts.append(fragment)
+                    yield {"type": "token", "text": fragment}
+        except TimeoutError:
+            logger.warning(f"Deadline reached after {len(parts)} fragments, returning the partial post")
+            metrics.generation_timed_out = True
+            metrics.record_ollama_stats(flight.meta)
+            yield self._finish_post(query, "".join(parts), cache_key, metrics, shared, partial=True)
+            return
         except Exception as e:
             logger.error(f"Blog generation error: {str(e)}")
-            return self._generate_fallback_content(query)
+            metrics.generation_fallback = True
+            yield {"type": "done", "content": self._generate_fallback_content(query), "fallback": True, "cached": False}
+            return
+        
+        generation_time = time.time() - start_time
+        logger.info(f"Generation completed in {generation_time:.2f} seconds")
+        metrics.record_ollama_stats(flight.meta)
+        yield self._finish_post(query, "".join(parts), cache_key, metrics, shared)
+    
+    def generate_blog(
+        self,
+        query: str,
+        research_results: Dict[str, Any],
+        metrics: Optional[PipelineMetrics] = None,
+        deadline: Optional[Deadline] = None
+    ) -> str:
+        """Generate blog content using the LLM with proper prompting."""
+        try:
+            for event in self.stream_blog(query, research_results, metrics, deadline):
+                if event["type"] == "done":
+                    return event["content"]
+        except Exception as e:
+            logger.error(f"Blog generation error: {str(e)}")
+        return self._generate_fallback_content(query)
     
     def _generate_fallback_content(self, query: str) -> str:
         """Generate a simple fallback blog post without using the LLM."""
@@ -207,104 +1089,441 @@ Keep being awesome at what you do!
     
     def create_blog_post(self, query: str) -> str:
         """Complete end-to-end process to create a blog post."""
+        try:
+            content, _ = self.create_blog_post_with_metrics(query)
+            return content
+        except Exception as e:
+            logger.error(f"Blog post creation error: {str(e)}")
+            return self._generate_fallback_content(query)
+    
+    def create_blog_post_with_metrics(self, query: str) -> Tuple[str, PipelineMetrics]:
+        """Create a blog post and return it with its per-stage metrics."""
         logger.info(f"Creating blog post for: {query}")
+        content = ""
+        metrics = None
+        for event in self.stream_blog_post(query):
+            if event["type"] == "done":
+                content = event["content"]
+                metrics = event["metrics"]
+        return content, metrics
+    
+    def _observe_latencies(self, metrics: PipelineMetrics) -> None:
+        """Feed stages that really ran to completion into the model that splits deadlines."""
+        if "research" in metrics.stages and not (
+            metrics.research_cached or metrics.research_shared or metrics.research_fallback
+        ):
+            STAGE_LATENCY.observe("research", metrics.stages["research"])
+        if metrics.sections and "outline" in metrics.stages:
+            STAGE_LATENCY.observe("outline", metrics.stages["outline"])
+        if "generation" in metrics.stages and not (
+            metrics.generation_cached or metrics.generation_shared
+            or metrics.generation_fallback or metrics.generation_timed_out
+        ):
+            STAGE_LATENCY.observe("generation", metrics.stages["generation"])
+    
+    def _record_research(self, metrics: PipelineMetrics, research_results: Dict[str, Any]) -> None:
+        """Copy where the research came from, and why it is missing, into metrics."""
+        metrics.research_cached = bool(research_results.get("cached"))
+        metrics.research_fallback = bool(research_results.get("fallback"))
+        metrics.research_shared = bool(research_results.get("shared"))
+        metrics.research_timed_out = bool(research_results.get("timed_out"))
+        metrics.research_error = research_results.get("error")
+    
+    def stream_blog_post(self, query: str, deadline: Optional[Deadline] = None) -> Iterator[Dict[str, Any]]:
+        """End-to-end blog post creation, yielding stage and token events as they happen.
+        
+        Events are dicts with a "type" of "stage" (research/writing), "research"
+        (the summary used), "token" (a text fragment) and finally "done" with the
+        full post in "content", whether it came from the generation cache in
+        "cached", whether the deadline cut it short in "partial" and the run's
+        PipelineMetrics in "metrics". The deadline defaults to the generator's
+        timeout, counted from now.
+        """
+        logger.info(f"Streaming blog post for: {query}")
+        self._ensure_model()
+        metrics = self._start_metrics(query)
+        deadline = deadline or Deadline(self.timeout)
         
         try:
-            # Get research results
-            research_results = self.get_research(query)
-            
-            # Generate the blog post
-            blog_content = self.generate_blog(query, research_results)
+            yield {"type": "stage", "stage": "research"}
+            with metrics.stage("research"):
+                research_results = self.get_research(query, deadline=deadline)
+            self._record_research(metrics, research_results)
+            yield {
+                "type": "research",
+                "summary": research_results.get("summary", ""),
+                "fallback": metrics.research_fallback,
+                "error": metrics.research_error
+            }
             
-            return blog_content
+            yield {"type": "stage", "stage": "writing"}
+            for event in self.stream_blog(query, research_results, metrics, deadline):
+                if event["type"] == "done":
+                    self._observe_latencies(metrics)
+                    event["metrics"] = metrics.finish()
+                    if not event["fallback"]:
+                        event["history_id"] = self.record_post(
+                            query, event["content"], research_results, metrics, bool(event.get("partial"))
+                        )
+                yield event
             
         except Exception as e:
             logger.error(f"Blog post creation error: {str(e)}")
-            return self._generate_fallback_content(query)
+            metrics.generation_fallback = True
+            yield {
+                "type": "done",
+                "content": self._generate_fallback_content(query),
+                "fallback": True,
+                "cached": False,
+                "metrics": metrics.finish()
+            }
+    
+    def _variant_requests(
+        self,
+        query: str,
+        research_results: Dict[str, Any],
+        count: int,
+        seed: Optional[int] = None,
+        deadline: Optional[Deadline] = None
+    ) -> Tuple[str, List[Tuple[Dict[str, Any], str]]]:
+        """The routed model and a (payload, cache key) pair per draft, differing only in temperature and seed."""
+        model = self._route_model(deadline)
+        payload, cache_key = self._build_request(query, research_results, model)
+        count = max(1, min(count, MAX_VARIANTS))
+        return model, [
+            (request, generation_cache_key({"request": cache_key, "options": request["options"]}))
+            for request in variant_payloads(payload, count, seed)
+        ]
+    
+    def _finish_variant(
+        self,
+        query: str,
+        request: Dict[str, Any],
+        cache_key: str,
+        text: str,
+        partial: bool = False,
+        cached: bool = False
+    ) -> Dict[str, Any]:
+        """Finalize and score one draft, caching it when it is a complete post."""
+        content = text if cached else self._finalize_content(query, text)
+        fallback = content == self._generate_fallback_content(query)
+        if not fallback and not partial and not cached:
+            self._write_generation_cache(cache_key, content)
+        return {
+            "content": content,
+            "temperature": request["options"]["temperature"],
+            "seed": request["options"]["seed"],
+            "scores": score_draft(text, self.prompt_builder.target_words, partial),
+            "partial": partial,
+            "fallback": fallback,
+            "cached": cached
+        }
+    
+    def create_variants(
+        self,
+        query: str,
+        count: int = DEFAULT_VARIANTS,
+        seed: Optional[int] = None,
+        deadline: Optional[Deadline] = None
+    ) -> Tuple[List[Dict[str, Any]], PipelineMetrics]:
+        """Research query once, then write count drafts of it concurrently, ranked best first.
+        
+        Drafts differ only in sampling temperature and seed (consecutive from
+        seed, so a set can be reproduced) and are scored with the cheap
+        heuristics in variants.score_draft. Every request starts at once, so
+        the backends and Ollama's parallel slots (OLLAMA_NUM_PARALLEL) decode
+        them together. At the deadline, unfinished drafts are kept as far as
+        they got and marked partial. Drafts are not recorded in the post
+        history; pass the one that is published to record_post.
+        """
+        logger.info(f"Creating {count} variants for: {query}")
+        self._ensure_model()
+        metrics = self._start_metrics(query)
+        deadline = deadline or Deadline(self.timeout)
+        with metrics.stage("research"):
+            research_results = self.get_research(query, deadline=deadline)
+        self._record_research(metrics, research_results)
+        
+        metrics.model, requests = self._variant_requests(query, research_results, count, seed, deadline)
+        metrics.variants = len(requests)
+        drafts: List[Dict[str, Any]] = []
+        flights = []
+        for request, cache_key in requests:
+            cached = self._read_generation_cache(cache_key)
+            if cached is not None:
+                drafts.append(self._finish_variant(query, request, cache_key, cached, cached=True))
+                continue
+            flight, _ = GENERATION_FLIGHTS.stream(
+                cache_key, lambda meta, request=request: self._stream_generate(request, meta)
+            )
+            flights.append((request, cache_key, flight))
+        metrics.generation_cached = not flights
+        
+        with metrics.stage("generation"):
+            for request, cache_key, flight in flights:
+                partial = False
+                try:
+                    text = "".join(flight.subscribe(deadline.at))
+                except TimeoutError:
+                    # Leaving the stream cancels the request; keep what it had produced
+                    text, partial = "".join(flight.items), True
+                    metrics.generation_timed_out = True
+                except Exception as e:
+                    logger.warning(f"Variant at temperature {request['options']['temperature']} failed: {str(e)}")
+                    text = ""
+                drafts.append(self._finish_variant(query, request, cache_key, text, partial))
+        if metrics.generation_timed_out:
+            logger.warning("Deadline reached, returning unfinished variants as far as they got")
+        metrics.record_parallel_stats([flight.meta for _, _, flight in flights])
+        metrics.generation_fallback = all(draft["fallback"] for draft in drafts)
+        return rank_variants(drafts), metrics.finish()
 
 
-def check_ollama_status() -> tuple[bool, List[str]]:
+def check_ollama_status(transport: Optional[Transport] = None) -> tuple[bool, List[str]]:
     """Check if Ollama is running and which models are available."""
+    load_env()
+    transport = transport or Transport.from_env()
+    base_url = os.getenv("LLM_BASE_URL", "http://localhost:11434")
+    running, model_names = get_model_registry().status(base_url, transport)
+    if running:
+        logger.info(f"Ollama is running with models: {model_names}")
+    else:
+        logger.error("Error checking Ollama status: Ollama is not reachable")
+    return running, model_names
+
+
+def print_stream(events: Iterator[Dict[str, Any]], start_time: float) -> Dict[str, Any]:
+    """Print a stream_blog_post event stream incrementally and return the done event."""
+    streamed = ""
+    done: Dict[str, Any] = {}
+    print("\n--- BLOG POST ---\n")
+    for event in events:
+        if event["type"] == "stage":
+            logger.info(f"Stage: {event['stage']}")
+        elif event["type"] == "research" and event.get("error"):
+            print(f"(research unavailable, writing without it: {event['error']})\n")
+        elif event["type"] == "token":
+            if not streamed:
+                logger.info(f"Time to first token: {time.time() - start_time:.2f} seconds")
+            streamed += event["text"]
+            print(event["text"], end="", flush=True)
+        elif event["type"] == "done":
+            done = event
+            content = event["content"]
+            if event.get("cached"):
+                print("(served from generation cache)\n")
+            if content.startswith(streamed):
+                # Only the sign-off was appended after streaming
+                if event.get("partial"):
+                    print("\n\n--- TIME LIMIT REACHED, POST CUT SHORT ---")
+                print(content[len(streamed):], end="")
+            else:
+                # Generation failed or was too short; show the fallback post instead
+                if streamed:
+                    print("\n\n--- GENERATION FAILED, USING FALLBACK ---\n")
+                print(content, end="")
+    print("\n\n--- END OF BLOG POST ---\n")
+    return done
+
+
+def format_scores(variant: Dict[str, Any]) -> str:
+    """One line describing a ranked draft and its heuristic scores."""
+    scores = ", ".join(f"{name} {value:.2f}" for name, value in variant["scores"].items() if name != "total")
+    flags = [flag for flag in ("partial", "fallback", "cached") if variant.get(flag)]
+    line = (
+        f"#{variant['rank']} score {variant['scores']['total']:.2f} "
+        f"(temperature {variant['temperature']}, seed {variant['seed']}): {scores}"
+    )
+    return line + (f" [{', '.join(flags)}]" if flags else "")
+
+
+def write_variants(variants: List[Dict[str, Any]], output: str) -> List[str]:
+    """Write each ranked draft next to output as <stem>-<rank><ext>; returns the paths."""
+    stem, ext = os.path.splitext(output)
+    paths = []
+    for variant in variants:
+        path = f"{stem}-{variant['rank']}{ext or '.md'}"
+        with open(path, 'w') as f:
+            f.write(variant["content"])
+        paths.append(path)
+    return paths
+
+
+def print_variants(variants: List[Dict[str, Any]]) -> None:
+    """Print ranked drafts, best first, each under its scores."""
+    for variant in variants:
+        print(f"\n--- VARIANT {format_scores(variant)} ---\n")
+        print(variant["content"])
+    print("\n--- END OF VARIANTS ---\n")
+
+
+def run_batch(args: argparse.Namespace, transport: Optional[Transport] = None) -> None:
+    """Run batch generation for every topic in args.batch."""
     try:
-        headers = {"Content-Type": "application/json"}
-        response = requests.get(
-            "http://localhost:11434/api/tags",
-            headers=headers,
-            timeout=10
-        )
-        if response.status_code == 200:
-            models = response.json().get("models", [])
-            model_names = [model.get('name') for model in models if 'name' in model]
-            logger.info(f"Ollama is running with models: {model_names}")
-            return True, model_names
-        else:
-            logger.error(f"Ollama returned status code {response.status_code}")
-            return False, []
+        topics = load_topics(args.batch)
     except Exception as e:
-        logger.error(f"Error checking Ollama status: {str(e)}")
-        return False, []
+        print(f"Error: could not read batch topics: {str(e)}")
+        return
+    if not topics:
+        print("No topics found in batch input.")
+        return
+    
+    print(f"Generating {len(topics)} blog posts into {args.output_dir}")
+    generator = BlogGenerator(
+        use_cache=not args.no_cache,
+        transport=transport,
+        use_generation_cache=args.generation_cache or None,
+        research_depth="deep" if args.deep else None,
+        draft_mode="sections" if args.sections else None,
+        timeout=args.timeout,
+        # Many posts share one style prefix, so reuse its context unless disabled
+        reuse_context=os.getenv("LLM_REUSE_CONTEXT", "1") != "0",
+        # Interactive requests sharing the LinkUp quota in this process go first
+        research_lane="batch"
+    )
+    runner = BatchRunner(
+        generator,
+        output_dir=args.output_dir,
+        research_workers=args.research_workers,
+        llm_workers=args.llm_workers
+    )
+    report = runner.run(topics)
+    print_report(report)
+    
+    if args.profile:
+        print("\n--- PROFILE ---\n")
+        print(REGISTRY.render_prometheus())
+        print(generator.linkup_scheduler.render_prometheus())
+    
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Batch report written to {args.report}")
 
 
 def main():
     """Main function to run the blog generation process."""
     parser = argparse.ArgumentParser(description='Generate a Substack-ready blog post')
-    parser.add_argument('query', help='The topic to write about')
+    parser.add_argument('query', nargs='?', help='The topic to write about')
     parser.add_argument('--output', '-o', help='Output file path (optional)')
     parser.add_argument('--verbose', '-v', action='store_true', help='Enable verbose logging')
     parser.add_argument('--model', '-m', help='Specify the LLM model to use')
     parser.add_argument('--timeout', '-t', type=int, default=90, 
-                       help='Timeout in seconds for LLM generation (default: 90)')
+                       help='Time limit in seconds for the whole post, shared by research and generation; '
+                            'the post is cut short when it runs out (default: 90, 0 for none)')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='Bypass the research cache and always query LinkUp')
+    parser.add_argument('--reuse-context', action='store_true',
+                       help='Send the shared style prefix as a precomputed Ollama context (always on in batch mode)')
+    parser.add_argument('--sections', action='store_true',
+                       help='Draft an outline first, then write its sections concurrently')
+    parser.add_argument('--deep', action='store_true',
+                       help='Deep research: concurrent sub-queries merged into a sourced brief')
+    parser.add_argument('--generation-cache', action='store_true',
+                       help='Reuse finished posts for identical generation requests')
+    parser.add_argument('--profile', action='store_true',
+                       help='Print per-stage timings and pipeline metrics')
+    parser.add_argument('--metrics-file', help='Append per-post metrics as JSON lines to this path')
+    parser.add_argument('--backends',
+                       help='Comma-separated Ollama URLs to load balance over, each optionally suffixed |N for its concurrency cap')
+    parser.add_argument('--batch', '-b', metavar='FILE',
+                       help='Generate one post per topic from a JSONL, CSV or text file (use - for stdin)')
+    parser.add_argument('--output-dir', default='posts',
+                       help='Directory for batch outputs (default: posts)')
+    parser.add_argument('--research-workers', type=int, default=8,
+                       help='Concurrent LinkUp research calls in batch mode (default: 8)')
+    parser.add_argument('--llm-workers', type=int, default=1,
+                       help='Concurrent LLM generations in batch mode (default: 1)')
+    parser.add_argument('--report', help='Write the batch summary report as JSON to this path')
+    parser.add_argument('--variants', type=int, metavar='N',
+                       help=f'Write N drafts from one research pass concurrently and rank them (max {MAX_VARIANTS}); '
+                            'with --output they go to <stem>-<rank>.md')
+    parser.add_argument('--seed', type=int,
+                       help='First sampling seed for --variants, to reproduce a set of drafts')
     
     args = parser.parse_args()
+    if not args.query and not args.batch:
+        parser.error("either a query or --batch FILE is required")
+    
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    load_env()
     
     # Set logging level based on verbosity
     if args.verbose:
         logging.getLogger().setLevel(logging.DEBUG)
     
+    if args.metrics_file:
+        REGISTRY.jsonl_path = args.metrics_file
+    if args.backends:
+        os.environ["LLM_BASE_URLS"] = args.backends
+    
+    # One pooled transport for the whole run
+    transport = Transport.from_env()
+    
     # Check Ollama status
-    ollama_running, available_models = check_ollama_status()
+    ollama_running, available_models = check_ollama_status(transport)
     if not ollama_running:
         print("Error: Ollama is not running. Please start Ollama before running this script.")
         return
     
-    # Set model from argument if provided
+    # A model given on the command line is used for every post; otherwise, with
+    # LLM_MODELS set, each post's model is routed between those (model_router.py)
     if args.model:
         if args.model in available_models:
             os.environ["LLM_MODEL"] = args.model
+            os.environ["LLM_ROUTING"] = "0"
             print(f"Using specified model: {args.model}")
         else:
             print(f"Warning: Model {args.model} is not available. Available models: {available_models}")
-            if available_models:
-                os.environ["LLM_MODEL"] = available_models[0]
-                print(f"Using fallback model: {available_models[0]}")
-    elif available_models:
-        # Set first available model as default if not specified
-        os.environ["LLM_MODEL"] = available_models[0]
-        print(f"Using default model: {available_models[0]}")
+    
+    if args.batch:
+        run_batch(args, transport)
+        return
     
     try:
         print(f"Generating blog post for: {args.query}")
         print("This may take a minute or two depending on your hardware...")
         
         # Initialize the blog generator
-        generator = BlogGenerator()
+        generator = BlogGenerator(
+            use_cache=not args.no_cache,
+            transport=transport,
+            use_generation_cache=args.generation_cache or None,
+            research_depth="deep" if args.deep else None,
+            reuse_context=args.reuse_context or None,
+            draft_mode="sections" if args.sections else None,
+            timeout=args.timeout
+        )
         
         # Generate the blog post with progress indicators
         start_time = time.time()
-        blog_content = generator.create_blog_post(args.query)
-        elapsed_time = time.time() - start_time
         
         # Output the blog content
-        if args.output:
+        if args.variants:
+            variants, metrics = generator.create_variants(args.query, args.variants, args.seed)
+            if metrics.research_error:
+                print(f"(research unavailable, drafts written without it: {metrics.research_error})")
+            if args.output:
+                for variant, path in zip(variants, write_variants(variants, args.output)):
+                    print(f"{path}: {format_scores(variant)}")
+            else:
+                print_variants(variants)
+        elif args.output:
+            blog_content, metrics = generator.create_blog_post_with_metrics(args.query)
             with open(args.output, 'w') as f:
                 f.write(blog_content)
             print(f"Blog post written to {args.output}")
         else:
-            print("\n--- BLOG POST ---\n")
-            print(blog_content)
-            print("\n--- END OF BLOG POST ---\n")
+            metrics = print_stream(generator.stream_blog_post(args.query), start_time).get("metrics")
+        elapsed_time = time.time() - start_time
             
         print(f"Generation completed in {elapsed_time:.2f} seconds")
+        if args.profile and metrics:
+            print("\n--- PROFILE ---\n")
+            print(metrics.format_table())
+        if generator.research_cache:
+            stats = generator.research_cache.stats()
+            logger.debug(f"Research cache stats: {stats}")
             
     except Exception as e:
         logging.error(f"Error in main function: {str(e)}")
@@ -1,5 +1,6 @@
 import streamlit as st
-from agents import BlogGenerator
+from jobs import JobQueue, WorkerPool
+from history import HistoryStore
 import os
 import logging
 import time
@@ -68,27 +69,82 @@ st.markdown("""
 # Initialize session state variables
 if "linkup_api_key" not in st.session_state:
     st.session_state.linkup_api_key = os.getenv("LINKUP_API_KEY", "")
-if "blog_history" not in st.session_state:
-    st.session_state.blog_history = []
-if "generator" not in st.session_state:
-    st.session_state.generator = None
+if "history_page" not in st.session_state:
+    st.session_state.history_page = 0
+# Posts created before this time are hidden from this session's history
+if "history_cleared_at" not in st.session_state:
+    st.session_state.history_cleared_at = 0.0
+if "active_jobs" not in st.session_state:
+    st.session_state.active_jobs = []
+if "use_generation_cache" not in st.session_state:
+    st.session_state.use_generation_cache = False
+if "deep_research" not in st.session_state:
+    st.session_state.deep_research = False
+if "sectioned_drafting" not in st.session_state:
+    st.session_state.sectioned_drafting = False
 
-def initialize_generator():
-    """Initialize the blog generator with API key."""
+@st.cache_resource
+def get_job_queue():
+    """Job queue shared by every browser session of this app."""
+    return JobQueue()
+
+@st.cache_resource
+def get_worker_pool():
+    """Start background workers once per app process (JOB_WORKERS=0 uses external workers)."""
+    workers = int(os.getenv("JOB_WORKERS", "2"))
+    if workers <= 0:
+        return None
+    return WorkerPool(workers).start()
+
+@st.cache_resource
+def get_history_store():
+    """Persistent post history, written by the workers and shared by every session."""
+    return HistoryStore()
+
+@st.cache_resource
+def start_prefetcher():
+    """Warm research and models for the content calendar in PREFETCH_CALENDAR, once per app process."""
+    from agents import BlogGenerator
+    from prefetch import CalendarPrefetcher
     try:
-        if st.session_state.linkup_api_key:
-            os.environ["LINKUP_API_KEY"] = st.session_state.linkup_api_key
-            st.session_state.generator = BlogGenerator()
-            return True
-        return False
+        # The batch lane keeps prefetching out of the way of posts being generated
+        return CalendarPrefetcher.from_env(BlogGenerator(research_lane="batch")).start()
     except Exception as e:
-        logger.error(f"Error initializing generator: {str(e)}")
-        st.error(f"Error initializing generator: {str(e)}")
-        return False
+        logger.warning(f"Calendar prefetch disabled: {str(e)}")
+        return None
+
+@st.cache_resource
+def warn_prefetch_needs_key():
+    """Log once per app process that prefetching waits for a LinkUp API key."""
+    logger.warning("Calendar prefetch is off until a LinkUp API key is configured")
+
+def get_prefetcher():
+    """The running calendar prefetcher, or None when PREFETCH_CALENDAR or the LinkUp API key is missing."""
+    if not os.getenv("PREFETCH_CALENDAR"):
+        return None
+    # Not cached while the key is missing, so entering one in the sidebar starts prefetching
+    if not os.getenv("LINKUP_API_KEY"):
+        warn_prefetch_needs_key()
+        return None
+    return start_prefetcher()
+
+# Posts shown per history page; only the visible page is read from the database
+HISTORY_PAGE_SIZE = 10
 
 def reset_history():
-    """Reset the blog history."""
-    st.session_state.blog_history = []
+    """Hide the posts listed so far from this session; saved posts are kept."""
+    st.session_state.history_cleared_at = time.time()
+    st.session_state.history_page = 0
+
+def delete_all_history():
+    """Delete every saved post, for every session."""
+    get_history_store().clear()
+    st.session_state.history_page = 0
+    st.session_state.confirm_delete_history = False
+
+def reset_history_page():
+    """Start from the first page when the search changes."""
+    st.session_state.history_page = 0
 
 # Sidebar: Configuration
 with st.sidebar:
@@ -121,8 +177,45 @@ with st.sidebar:
         • Emotionally honest tone
         """)
     
+    # Reuse finished posts for identical requests (reruns cost nothing)
+    use_generation_cache = st.checkbox(
+        "⚡ Reuse cached posts",
+        value=st.session_state.use_generation_cache,
+        help="Return a previously generated post instantly when the topic, research and model are identical"
+    )
+    st.session_state.use_generation_cache = use_generation_cache
+    
+    # Fan research out into several concurrent searches merged into a sourced brief
+    st.session_state.deep_research = st.checkbox(
+        "🔬 Deep research",
+        value=st.session_state.deep_research,
+        help="Search several angles of the topic at once and ground the post in the merged sources"
+    )
+    
+    # Outline first, then write the sections side by side (faster on multi-slot Ollama servers)
+    st.session_state.sectioned_drafting = st.checkbox(
+        "🧩 Sectioned drafting",
+        value=st.session_state.sectioned_drafting,
+        help="Plan a title and 2-3 sections, then write the sections concurrently"
+    )
+    
+    # Upcoming calendar topics, and whether they will start at decode speed
+    prefetcher = get_prefetcher()
+    if prefetcher is not None:
+        with st.expander("📅 Upcoming topics"):
+            if not prefetcher.last_report:
+                st.caption("Checking the calendar...")
+            for status in prefetcher.last_report[:10]:
+                when = time.strftime("%a %H:%M", time.localtime(status["start"]))
+                icon = "🔥" if status["warm"] else "❄️"
+                st.markdown(f"{icon} {when} · {status['topic']}")
+    
     # Action buttons
     st.button("🧹 Clear History", on_click=reset_history)
+    with st.expander("🗑️ Delete saved posts"):
+        st.caption("Permanently deletes every saved post for all users of this app.")
+        confirmed = st.checkbox("I understand this cannot be undone", key="confirm_delete_history")
+        st.button("Delete all posts", on_click=delete_all_history, disabled=not confirmed)
     
     # Footer
     st.markdown("---")
@@ -151,77 +244,106 @@ topic = st.text_input(
     help="Be specific about your topic for better results"
 )
 
-# Blog generation
+# Blog generation: queue a job for the background workers, then poll its progress
 if st.button("✨ Generate Blog Post", disabled=not st.session_state.linkup_api_key):
     if not topic:
         st.warning("Please enter a blog topic")
     else:
-        # Initialize generator if needed
-        if not st.session_state.generator:
-            success = initialize_generator()
-            if not success:
-                st.error("Failed to initialize the blog generator. Please check your API key.")
-                st.stop()
+        try:
+            get_worker_pool()
+            job_id = get_job_queue().submit(
+                topic,
+                options={
+                    "use_generation_cache": st.session_state.use_generation_cache,
+                    "research_depth": "deep" if st.session_state.deep_research else "standard",
+                    "draft_mode": "sections" if st.session_state.sectioned_drafting else "single"
+                }
+            )
+            # Identical in-flight topics share one job, possibly started by another user
+            if job_id not in st.session_state.active_jobs:
+                st.session_state.active_jobs.append(job_id)
+        except Exception as e:
+            logger.error(f"Error queueing blog: {str(e)}")
+            st.error(f"Error queueing blog: {str(e)}")
+
+@st.fragment(run_every=1)
+def show_active_jobs():
+    """Poll queued and running jobs; finished posts appear in the history (saved by the workers)."""
+    finished = False
+    for job_id in list(st.session_state.active_jobs):
+        job = get_job_queue().status(job_id)
+        if job is None:
+            st.session_state.active_jobs.remove(job_id)
+            continue
         
-        # Generate blog
-        with st.spinner("🔍 Researching and writing your blog post... (this might take 1-2 minutes)"):
-            try:
-                # Add progress indicators for better UX
-                progress_bar = st.progress(0)
-                status_text = st.empty()
-                
-                # Show research phase
-                status_text.text("Researching your topic...")
-                time.sleep(0.5)
-                progress_bar.progress(25)
-                
-                # Show writing phase
-                status_text.text("Crafting your blog in Alex's style...")
-                time.sleep(0.5)
-                progress_bar.progress(50)
-                
-                # Generate the actual blog
-                blog_content = st.session_state.generator.create_blog_post(topic)
-                
-                # Show formatting phase
-                status_text.text("Formatting for Substack...")
-                time.sleep(0.5)
-                progress_bar.progress(75)
-                
-                # Final step
-                status_text.text("Finalizing your blog post...")
-                time.sleep(0.5)
-                progress_bar.progress(100)
-                
-                # Clear progress indicators
-                time.sleep(0.5)
-                progress_bar.empty()
-                status_text.empty()
-                
-                # Add to history
-                st.session_state.blog_history.append({
-                    "topic": topic,
-                    "content": blog_content,
-                    "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
-                })
-                
-            except Exception as e:
-                logger.error(f"Error generating blog: {str(e)}")
-                st.error(f"Error generating blog: {str(e)}")
+        if job["status"] == "queued":
+            st.info(f"⏳ **{job['topic']}** is queued ({job['queue_position']} ahead)")
+        elif job["status"] == "running":
+            if job["stage"] == "research":
+                st.text("🔍 Researching your topic...")
+            else:
+                st.text("✍️ Crafting your blog in Alex's style...")
+            st.markdown(job["partial"])
+        elif job["status"] == "done":
+            st.session_state.active_jobs.remove(job_id)
+            st.session_state.history_page = 0
+            metrics = job.get("metrics")
+            if metrics and metrics.get("generation_cached"):
+                st.toast("⚡ Served from generation cache")
+            if metrics and metrics.get("generation_timed_out"):
+                st.toast("⏱️ Time limit reached, the post was cut short")
+            if metrics and metrics.get("research_error"):
+                st.toast(f"⚠️ Written without web research: {metrics['research_error']}")
+            finished = True
+        else:
+            st.session_state.active_jobs.remove(job_id)
+            st.error(f"Error generating blog: {job['error']}")
+    
+    # Redraw the whole page so the history below picks up finished posts
+    if finished:
+        st.rerun()
+
+if st.session_state.active_jobs:
+    show_active_jobs()
 
-# Display blog history (most recent first)
-if st.session_state.blog_history:
+# Display blog history (most recent first), one page at a time
+history = get_history_store()
+since = st.session_state.history_cleared_at
+if history.count(since=since):
     st.divider()
     st.subheader("📚 Your Blog Posts")
     
-    for i, blog in enumerate(reversed(st.session_state.blog_history)):
-        with st.expander(f"**{blog['topic']}** - {blog['timestamp']}"):
+    search = st.text_input(
+        "🔎 Search your posts",
+        key="history_search",
+        placeholder="e.g., remote teams",
+        on_change=reset_history_page
+    )
+    total = history.count(search, since=since)
+    pages = max(1, -(-total // HISTORY_PAGE_SIZE))
+    page = min(st.session_state.history_page, pages - 1)
+    posts = history.page(page * HISTORY_PAGE_SIZE, HISTORY_PAGE_SIZE, search, with_content=True, since=since)
+    
+    if not posts:
+        st.info("No posts match your search.")
+    for blog in posts:
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(blog["created_at"]))
+        with st.expander(f"**{blog['topic']}** - {timestamp}"):
             st.markdown(blog["content"])
             
+            sources = (blog.get("research") or {}).get("sources") or []
+            if sources:
+                st.caption("Sources: " + " · ".join(f"[{source['name']}]({source['url']})" for source in sources))
+            stages = (blog.get("metrics") or {}).get("stages") or {}
+            if stages:
+                st.caption(
+                    f"{blog['model']} · " + " · ".join(f"{name} {seconds:.1f}s" for name, seconds in stages.items())
+                )
+            
             # Add copy and download buttons
             col1, col2 = st.columns(2)
             with col1:
-                if st.button(f"📋 Copy to Clipboard", key=f"copy_{i}"):
+                if st.button(f"📋 Copy to Clipboard", key=f"copy_{blog['id']}"):
                     # This uses JavaScript to copy to clipboard
                     st.markdown(
                         f"""
@@ -241,8 +363,25 @@ if st.session_state.blog_history:
                     data=blog['content'],
                     file_name=blog_filename,
                     mime="text/plain",
-                    key=f"download_{i}"
+                    key=f"download_{blog['id']}"
                 )
+    
+    # Pagination
+    if pages > 1:
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col1:
+            if st.button("⬅️ Newer", disabled=page == 0):
+                st.session_state.history_page = page - 1
+                st.rerun()
+        with col2:
+            st.markdown(
+                f"<p style='text-align: center'>Page {page + 1} of {pages} ({total} posts)</p>",
+                unsafe_allow_html=True
+            )
+        with col3:
+            if st.button("Older ➡️", disabled=page >= pages - 1):
+                st.session_state.history_page = page + 1
+                st.rerun()
 else:
     if st.session_state.linkup_api_key:
         st.info("👋 Enter a topic above and click 'Generate Blog Post' to get started!")
@@ -0,0 +1,582 @@
+import json
+import time
+import asyncio
+import logging
+from typing import Dict, List, Any, Optional, AsyncIterator, Awaitable, Tuple, TYPE_CHECKING
+
+from agents import BlogGenerator
+from cache import generation_cache_key
+from transport import Transport
+from metrics import PipelineMetrics
+from model_registry import parse_model_names
+from backends import Backend, BackendPool
+from singleflight import AsyncSingleFlight
+from research import plan_subqueries, merge_deep_research
+from outline import Outline, HeadingFilter
+from deadline import Deadline
+from variants import DEFAULT_VARIANTS, rank_variants
+
+# httpx is imported when the first request is made
+if TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncBlogGenerator(BlogGenerator):
+    """Non-blocking blog generator for the MCP server and web front ends.
+
+    Shares prompting, research processing and caching with BlogGenerator,
+    but talks to Ollama over httpx and to LinkUp via its async client, so a
+    single event loop can serve many concurrent posts.
+    """
+
+    def __init__(
+        self,
+        use_cache: bool = True,
+        transport: Optional[Transport] = None,
+        use_generation_cache: Optional[bool] = None,
+        backends: Optional[BackendPool] = None,
+        research_depth: Optional[str] = None,
+        reuse_context: Optional[bool] = None,
+        draft_mode: Optional[str] = None,
+        timeout: Optional[float] = None,
+        use_history: Optional[bool] = None,
+        use_index: Optional[bool] = None,
+        research_lane: Optional[str] = None
+    ):
+        """Initialize settings; models are discovered on first use."""
+        self._configure(
+            use_cache, transport, use_generation_cache, backends, research_depth, reuse_context, draft_mode, timeout,
+            use_history, use_index, research_lane
+        )
+        self._client: Optional["httpx.AsyncClient"] = None
+        self._models_lock: Optional[asyncio.Lock] = None
+        # Per instance, since asyncio tasks belong to one event loop
+        self._research_flights = AsyncSingleFlight("research")
+        self._generation_flights = AsyncSingleFlight("generation")
+
+        logger.info("AsyncBlogGenerator initialized")
+
+    async def __aenter__(self) -> "AsyncBlogGenerator":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    @property
+    def client(self) -> "httpx.AsyncClient":
+        """Shared async HTTP client for Ollama requests."""
+        if self._client is None:
+            self._client = self.transport.async_client(self.base_url)
+        return self._client
+
+    async def aclose(self) -> None:
+        """Close the underlying HTTP client."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _get_available_models(self) -> List[str]:
+        """Get available models from the shared registry, probing without blocking the event loop."""
+        cached = self.model_registry.peek(self.base_url)
+        if cached is not None:
+            running, models, stale = cached
+            if not stale:
+                return models
+            if running:
+                self.model_registry.refresh_in_background(self.base_url, self.transport)
+                return models
+
+        try:
+            response = await self.client.get("/api/tags", timeout=10)
+            if response.status_code == 200:
+                models = parse_model_names(response.json())
+                logger.info(f"Available models: {models}")
+                self.model_registry.store(self.base_url, True, models)
+                return models
+        except Exception as e:
+            logger.warning(f"Could not check available models: {str(e)}")
+        self.model_registry.store(self.base_url, False, [])
+        return []
+
+    async def _ensure_model(self) -> None:
+        """Discover models and pick the best one, once per generator."""
+        if self._models_checked:
+            return
+        if self._models_lock is None:
+            self._models_lock = asyncio.Lock()
+        async with self._models_lock:
+            if self._models_checked:
+                return
+            start_time = time.time()
+            self.available_models = await self._get_available_models()
+            self._record_model_discovery(time.time() - start_time)
+            self._select_model()
+            self._models_checked = True
+            logger.info(f"AsyncBlogGenerator using model {self.model}")
+
+    async def get_research(
+        self,
+        query: str,
+        depth: Optional[str] = None,
+        deadline: Optional[Deadline] = None,
+        refresh: bool = False
+    ) -> Dict[str, Any]:
+        """Get research results, served from the research cache when possible (see BlogGenerator.get_research)."""
+        depth = depth or self.research_depth
+        cache_key = self._research_cache_key(query, depth)
+        # Cache reads, embeddings and index lookups are short blocking calls
+        if refresh:
+            vector = await asyncio.to_thread(self._embed, query)
+        else:
+            cached = await asyncio.to_thread(self._read_research_cache, cache_key, query)
+            if cached is not None:
+                return cached
+            cached, vector = await asyncio.to_thread(self._reuse_research, query, depth)
+            if cached is not None:
+                return self._with_related(cached, vector)
+
+        # Identical queries already being researched share that one LinkUp call
+        async def fetch() -> Dict[str, Any]:
+            if depth == "deep":
+                results = await self._fetch_deep_research(query)
+            else:
+                results = await self._fetch_research(query)
+            await asyncio.to_thread(self._write_research_cache, cache_key, results)
+            await asyncio.to_thread(self._index_research, query, results, vector)
+            return results
+
+        budget = deadline.budget("research", self._stages()) if deadline else None
+        try:
+            # The flight is shielded, so timing out here leaves the search running to fill the cache
+            results, shared = await asyncio.wait_for(self._research_flights.do(cache_key, fetch), budget)
+        except asyncio.TimeoutError:
+            error = f"research took longer than its {budget:.1f}s share of the deadline"
+            logger.warning(f"{error.capitalize()}, writing without it")
+            results = dict(self._research_fallback(query, error), timed_out=True)
+            return self._with_related(results, vector)
+        if shared:
+            results = dict(results, shared=True)
+        return self._with_related(results, vector)
+
+    async def _fetch_research(self, query: str) -> Dict[str, Any]:
+        """Get research results from the LinkUp async API."""
+        logger.info(f"Researching: {query}")
+        try:
+            client = self.transport.linkup(self.api_key)
+            search_response = await self.linkup_scheduler.call_async(
+                lambda: client.async_search(
+                    query=query,
+                    depth="standard",
+                    output_type="sourcedAnswer",
+                    include_images=False
+                ),
+                self.research_lane
+            )
+            logger.info("Research complete")
+            return self._process_search_response(search_response)
+        except Exception as e:
+            logger.error(f"Research error: {str(e)}")
+            return self._research_fallback(query, str(e))
+
+    async def _fetch_deep_research(self, query: str) -> Dict[str, Any]:
+        """Concurrent sub-query research, merged as in BlogGenerator._fetch_deep_research."""
+        subqueries = plan_subqueries(query, self.deep_research.subqueries)
+        logger.info(f"Deep research: {len(subqueries)} sub-queries for {query}")
+        try:
+            client = self.transport.linkup(self.api_key)
+
+            def search(text: str, output_type: str) -> Awaitable[Any]:
+                return self.linkup_scheduler.call_async(
+                    lambda: client.async_search(
+                        query=text, depth="standard", output_type=output_type, include_images=False
+                    ),
+                    self.research_lane
+                )
+
+            searches = [search(subquery, "sourcedAnswer") for subquery in subqueries]
+            searches.append(search(query, "searchResults"))
+            *responses, searched = await asyncio.gather(*searches, return_exceptions=True)
+
+            merged = merge_deep_research(query, subqueries, responses, searched, self.deep_research)
+            if merged is not None:
+                logger.info(f"Deep research complete: {len(merged['sources'])} sources")
+                return merged
+            errors = [str(response) for response in responses + [searched] if isinstance(response, BaseException)]
+            error = errors[0] if errors else "deep research returned nothing usable"
+            logger.error(f"Research error: {error}")
+        except Exception as e:
+            error = str(e)
+            logger.error(f"Research error: {error}")
+        return self._research_fallback(query, error)
+
+    async def _acquire_backend(self, model: Optional[str], exclude: List[str]) -> Optional[Backend]:
+        """Reserve a backend slot, waiting off the event loop only when every host is full."""
+        backend = self.backends.try_acquire(model=model, exclude=exclude)
+        if backend is None:
+            backend = await asyncio.to_thread(self.backends.acquire, model, exclude)
+        return backend
+
+    async def _stream_generate(
+        self,
+        payload: Dict[str, Any],
+        stats: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[str]:
+        """Yield response fragments from the Ollama NDJSON stream as they arrive.
+
+        Routing and failover follow BlogGenerator._stream_generate.
+        """
+        import httpx
+
+        model = payload.get("model")
+        tried: List[str] = []
+        while True:
+            backend = await self._acquire_backend(model, tried)
+            if backend is None:
+                raise RuntimeError("No healthy LLM backend available")
+            tried.append(backend.url)
+            logger.info(f"Sending streaming request to LLM API at {backend.url} using model: {model}")
+
+            started = False
+            ok = True
+            sent_at = time.monotonic()
+            first_token_at: Optional[float] = None
+            try:
+                async with self.client.stream("POST", f"{backend.url}/api/generate", json=payload) as response:
+                    if response.status_code != 200:
+                        ok = False
+                        if response.status_code >= 500:
+                            self.backends.mark_down(backend, f"HTTP {response.status_code}")
+                        if len(tried) < len(self.backends.backends):
+                            logger.warning(f"LLM API error {response.status_code} from {backend.url}, failing over")
+                            continue
+                        raise RuntimeError(f"LLM API error: {response.status_code}")
+                    try:
+                        async for line in response.aiter_lines():
+                            if not line:
+                                continue
+                            try:
+                                line_data = json.loads(line)
+                            except json.JSONDecodeError:
+                                continue
+                            if 'response' in line_data:
+                                if not started:
+                                    started = True
+                                    first_token_at = time.monotonic()
+                                yield line_data['response']
+                            if line_data.get('done'):
+                                if stats is not None:
+                                    stats.update(line_data)
+                                self.model_router.observe_stats(
+                                    model, backend.url, line_data, first_token_at and first_token_at - sent_at
+                                )
+                                break
+                    except httpx.TransportError as e:
+                        ok = False
+                        self.backends.mark_down(backend, "stream broken")
+                        logger.warning(f"Streaming connection broken: {str(e)}")
+
+                if ok or started or len(tried) >= len(self.backends.backends):
+                    return
+                logger.warning(f"No output from {backend.url}, failing over")
+            except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                # Could not even connect: this host is down, try the next one
+                ok = False
+                self.backends.mark_down(backend, str(e))
+                if len(tried) >= len(self.backends.backends):
+                    raise
+            finally:
+                self.backends.release(backend, ok)
+
+    async def stream_blog(
+        self,
+        query: str,
+        research_results: Dict[str, Any],
+        metrics: Optional[PipelineMetrics] = None,
+        deadline: Optional[Deadline] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Generate blog content, yielding token events and a final done event (partial at the deadline)."""
+        logger.info("Generating blog content")
+        await self._ensure_model()
+        model = self._route_model(deadline)
+        metrics = metrics or PipelineMetrics(query, model)
+        metrics.model = model
+        if self.reuse_context:
+            # Warming a session is a blocking request; keep it off the event loop
+            payload, cache_key = await asyncio.to_thread(self._build_request, query, research_results, model)
+        else:
+            payload, cache_key = self._build_request(query, research_results, model)
+        if self.draft_mode == "sections":
+            cache_key = generation_cache_key({"request": cache_key, "sections": self.outline_sections})
+        cached = await asyncio.to_thread(self._read_generation_cache, cache_key)
+        if cached is not None:
+            metrics.generation_cached = True
+            yield {"type": "done", "content": cached, "fallback": False, "cached": True}
+            return
+
+        if self.draft_mode == "sections":
+            outline = await self._draft_outline(query, payload, research_results, metrics, deadline)
+            if outline is not None:
+                async for event in self._stream_sections(
+                    query, payload, research_results, outline, cache_key, metrics, deadline
+                ):
+                    yield event
+                return
+
+        start_time = time.time()
+        parts: List[str] = []
+        # Concurrent requests with the same payload attach to one Ollama stream
+        flight, shared = self._generation_flights.stream(cache_key, lambda meta: self._stream_generate(payload, meta))
+        metrics.generation_shared = shared
+        try:
+            with metrics.stage("generation"):
+                async for fragment in flight.subscribe(deadline.at if deadline else None):
+                    metrics.count_token()
+                    parts.append(fragment)
+                    yield {"type": "token", "text": fragment}
+        except TimeoutError:
+            logger.warning(f"Deadline reached after {len(parts)} fragments, returning the partial post")
+            metrics.generation_timed_out = True
+            metrics.record_ollama_stats(flight.meta)
+            yield self._finish_post(query, "".join(parts), cache_key, metrics, shared, partial=True)
+            return
+        except Exception as e:
+            logger.error(f"Blog generation error: {str(e)}")
+            metrics.generation_fallback = True
+            yield {"type": "done", "content": self._generate_fallback_content(query), "fallback": True, "cached": False}
+            return
+
+        generation_time = time.time() - start_time
+        logger.info(f"Generation completed in {generation_time:.2f} seconds")
+        metrics.record_ollama_stats(flight.meta)
+        yield self._finish_post(query, "".join(parts), cache_key, metrics, shared)
+
+    async def _draft_outline(
+        self,
+        query: str,
+        payload: Dict[str, Any],
+        research_results: Dict[str, Any],
+        metrics: PipelineMetrics,
+        deadline: Optional[Deadline] = None
+    ) -> Optional[Outline]:
+        """Ask for the title and section headings; None if the reply was unusable or too slow."""
+        request = self._outline_request(query, payload, research_results)
+        timeout_at = deadline.stage_at("outline", ["outline", "generation"]) if deadline else None
+        try:
+            with metrics.stage("outline"):
+                flight, _ = self._generation_flights.stream(
+                    generation_cache_key(request), lambda meta: self._stream_generate(request, meta)
+                )
+                text = "".join([fragment async for fragment in flight.subscribe(timeout_at)])
+        except TimeoutError:
+            logger.warning("Outline took longer than its share of the deadline, drafting in one pass")
+            return None
+        except Exception as e:
+            logger.warning(f"Outline generation failed, drafting in one pass: {str(e)}")
+            return None
+        return self._parse_outline(query, text)
+
+    async def _stream_sections(
+        self,
+        query: str,
+        payload: Dict[str, Any],
+        research_results: Dict[str, Any],
+        outline: Outline,
+        cache_key: str,
+        metrics: PipelineMetrics,
+        deadline: Optional[Deadline] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Concurrent section drafting, as in BlogGenerator._stream_sections."""
+        timeout_at = deadline.at if deadline else None
+        requests = self._part_requests(query, payload, research_results, outline)
+        flights = [
+            self._generation_flights.stream(
+                generation_cache_key(request), lambda meta, request=request: self._stream_generate(request, meta)
+            )[0]
+            for request in requests
+        ]
+        metrics.sections = len(outline.headings)
+
+        parts = [f"# {outline.title}\n\n"]
+        metrics.count_token()
+        yield {"type": "token", "text": parts[0]}
+        drafted = 0
+        with metrics.stage("generation"):
+            for index, flight in enumerate(flights):
+                heading = f"\n\n## {outline.headings[index - 1]}\n\n" if index else ""
+                heading_filter = HeadingFilter()
+                wrote = False
+                try:
+                    async for fragment in flight.subscribe(timeout_at):
+                        text = heading_filter.feed(fragment)
+                        if not text:
+                            continue
+                        if not wrote and heading:
+                            text = heading + text
+                        wrote = True
+                        metrics.count_token()
+                        parts.append(text)
+                        yield {"type": "token", "text": text}
+                except TimeoutError:
+                    logger.warning("Deadline reached, returning the sections drafted so far")
+                    metrics.generation_timed_out = True
+                    for pending in flights[index + 1:]:
+                        pending.abandon()
+                    drafted += wrote
+                    break
+                except Exception as e:
+                    logger.warning(f"Draft part {index} failed: {str(e)}")
+                drafted += wrote
+        metrics.record_parallel_stats([flight.meta for flight in flights])
+
+        if not drafted:
+            metrics.generation_fallback = True
+            yield {"type": "done", "content": self._generate_fallback_content(query), "fallback": True, "cached": False}
+            return
+        yield self._finish_post(query, "".join(parts), cache_key, metrics, partial=metrics.generation_timed_out)
+
+    async def generate_blog(
+        self,
+        query: str,
+        research_results: Dict[str, Any],
+        metrics: Optional[PipelineMetrics] = None,
+        deadline: Optional[Deadline] = None
+    ) -> str:
+        """Generate blog content using the LLM with proper prompting."""
+        try:
+            async for event in self.stream_blog(query, research_results, metrics, deadline):
+                if event["type"] == "done":
+                    return event["content"]
+        except Exception as e:
+            logger.error(f"Blog generation error: {str(e)}")
+        return self._generate_fallback_content(query)
+
+    async def create_blog_post(self, query: str) -> str:
+        """Complete end-to-end process to create a blog post."""
+        try:
+            content, _ = await self.create_blog_post_with_metrics(query)
+            return content
+        except Exception as e:
+            logger.error(f"Blog post creation error: {str(e)}")
+            return self._generate_fallback_content(query)
+
+    async def create_blog_post_with_metrics(self, query: str) -> Tuple[str, PipelineMetrics]:
+        """Create a blog post and return it with its per-stage metrics."""
+        logger.info(f"Creating blog post for: {query}")
+        content = ""
+        metrics = None
+        async for event in self.stream_blog_post(query):
+            if event["type"] == "done":
+                content = event["content"]
+                metrics = event["metrics"]
+        return content, metrics
+
+    async def stream_blog_post(self, query: str, deadline: Optional[Deadline] = None) -> AsyncIterator[Dict[str, Any]]:
+        """End-to-end blog post creation, yielding the same events as BlogGenerator.stream_blog_post."""
+        logger.info(f"Streaming blog post for: {query}")
+        await self._ensure_model()
+        metrics = self._start_metrics(query)
+        deadline = deadline or Deadline(self.timeout)
+
+        try:
+            yield {"type": "stage", "stage": "research"}
+            with metrics.stage("research"):
+                research_results = await self.get_research(query, deadline=deadline)
+            self._record_research(metrics, research_results)
+            yield {
+                "type": "research",
+                "summary": research_results.get("summary", ""),
+                "fallback": metrics.research_fallback,
+                "error": metrics.research_error
+            }
+
+            yield {"type": "stage", "stage": "writing"}
+            async for event in self.stream_blog(query, research_results, metrics, deadline):
+                if event["type"] == "done":
+                    self._observe_latencies(metrics)
+                    event["metrics"] = metrics.finish()
+                    if not event["fallback"]:
+                        event["history_id"] = await asyncio.to_thread(
+                            self.record_post,
+                            query, event["content"], research_results, metrics, bool(event.get("partial"))
+                        )
+                yield event
+
+        except Exception as e:
+            logger.error(f"Blog post creation error: {str(e)}")
+            metrics.generation_fallback = True
+            yield {
+                "type": "done",
+                "content": self._generate_fallback_content(query),
+                "fallback": True,
+                "cached": False,
+                "metrics": metrics.finish()
+            }
+
+    async def _collect_variant(
+        self,
+        query: str,
+        request: Dict[str, Any],
+        cache_key: str,
+        metrics: PipelineMetrics,
+        deadline: Deadline
+    ) -> Dict[str, Any]:
+        """Read one draft's stream to the end, or as far as it got by the deadline."""
+        flight, _ = self._generation_flights.stream(cache_key, lambda meta: self._stream_generate(request, meta))
+        partial = False
+        try:
+            text = "".join([fragment async for fragment in flight.subscribe(deadline.at)])
+        except TimeoutError:
+            text, partial = "".join(flight.items), True
+            metrics.generation_timed_out = True
+        except Exception as e:
+            logger.warning(f"Variant at temperature {request['options']['temperature']} failed: {str(e)}")
+            text = ""
+        return {"text": text, "partial": partial, "meta": flight.meta}
+
+    async def create_variants(
+        self,
+        query: str,
+        count: int = DEFAULT_VARIANTS,
+        seed: Optional[int] = None,
+        deadline: Optional[Deadline] = None
+    ) -> Tuple[List[Dict[str, Any]], PipelineMetrics]:
+        """Concurrent drafts from one research pass, as in BlogGenerator.create_variants."""
+        logger.info(f"Creating {count} variants for: {query}")
+        await self._ensure_model()
+        metrics = self._start_metrics(query)
+        deadline = deadline or Deadline(self.timeout)
+        with metrics.stage("research"):
+            research_results = await self.get_research(query, deadline=deadline)
+        self._record_research(metrics, research_results)
+
+        if self.reuse_context:
+            metrics.model, requests = await asyncio.to_thread(
+                self._variant_requests, query, research_results, count, seed, deadline
+            )
+        else:
+            metrics.model, requests = self._variant_requests(query, research_results, count, seed, deadline)
+        metrics.variants = len(requests)
+        # SQLite reads block; keep them off the event loop
+        cached = await asyncio.gather(
+            *(asyncio.to_thread(self._read_generation_cache, cache_key) for _, cache_key in requests)
+        )
+        drafts = [
+            self._finish_variant(query, request, cache_key, content, cached=True)
+            for (request, cache_key), content in zip(requests, cached) if content is not None
+        ]
+        pending = [pair for pair, content in zip(requests, cached) if content is None]
+        metrics.generation_cached = not pending
+
+        with metrics.stage("generation"):
+            results = await asyncio.gather(*[
+                self._collect_variant(query, request, cache_key, metrics, deadline) for request, cache_key in pending
+            ])
+        if metrics.generation_timed_out:
+            logger.warning("Deadline reached, returning unfinished variants as far as they got")
+        metrics.record_parallel_stats([result["meta"] for result in results])
+        for (request, cache_key), result in zip(pending, results):
+            drafts.append(self._finish_variant(query, request, cache_key, result["text"], result["partial"]))
+        metrics.generation_fallback = all(draft["fallback"] for draft in drafts)
+        return rank_variants(drafts), metrics.finish()
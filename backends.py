@@ -0,0 +1,248 @@
+import os
+import time
+import logging
+import threading
+from typing import Dict, List, Any, Optional, Iterable
+
+from model_registry import ModelRegistry, get_model_registry
+from transport import Transport
+
+logger = logging.getLogger(__name__)
+
+
+class Backend:
+    """One Ollama host with its concurrency cap and live load."""
+
+    def __init__(self, url: str, max_concurrency: int = 4):
+        self.url = url.rstrip("/")
+        self.max_concurrency = max(1, max_concurrency)
+        self.outstanding = 0
+        self.completed = 0
+        self.failures = 0
+        self.healthy = True
+        self.down_since: Optional[float] = None
+        self.checking = False
+
+    @property
+    def has_capacity(self) -> bool:
+        return self.outstanding < self.max_concurrency
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "max_concurrency": self.max_concurrency,
+            "completed": self.completed,
+            "failures": self.failures,
+        }
+
+
+def parse_backends(spec: str, default_concurrency: int) -> List[Backend]:
+    """Parse "http://a:11434,http://b:11434|8" into backends; |N sets a host's cap."""
+    backends = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        url, _, cap = item.partition("|")
+        backends.append(Backend(url, int(cap) if cap else default_concurrency))
+    return backends
+
+
+class BackendPool:
+    """Least-outstanding-requests router over several Ollama hosts.
+
+    Each request goes to the healthy host with the fewest in-flight requests
+    (ties broken by fewest completed), never exceeding a host's cap; callers
+    wait when every host is full. A host that fails is taken out of rotation
+    and re-probed via /api/tags after recheck_interval seconds.
+    """
+
+    def __init__(
+        self,
+        backends: List[Backend],
+        transport: Transport,
+        registry: Optional[ModelRegistry] = None,
+        recheck_interval: float = 15
+    ):
+        """Create a pool over backends, using transport for health checks."""
+        if not backends:
+            raise ValueError("BackendPool needs at least one backend")
+        self.backends = backends
+        self.transport = transport
+        self.registry = registry or get_model_registry()
+        self.recheck_interval = recheck_interval
+        self._condition = threading.Condition()
+        # Requests waiting for a slot because every eligible host is full
+        self.waiting = 0
+
+    @classmethod
+    def from_env(cls, default_url: str, transport: Transport) -> "BackendPool":
+        """Build a pool from LLM_BASE_URLS, falling back to the single default_url."""
+        default_concurrency = int(os.getenv("LLM_BACKEND_CONCURRENCY", "4"))
+        spec = os.getenv("LLM_BASE_URLS") or default_url
+        return cls(
+            parse_backends(spec, default_concurrency),
+            transport,
+            recheck_interval=float(os.getenv("LLM_BACKEND_RECHECK", "15"))
+        )
+
+    def _serves_model(self, backend: Backend, model: Optional[str]) -> bool:
+        """Skip hosts known not to have the model installed."""
+        if not model:
+            return True
+        cached = self.registry.peek(backend.url)
+        if cached is None or not cached[0] or not cached[1]:
+            return True
+        return model in cached[1]
+
+    def _pick(self, model: Optional[str], exclude: Iterable[str]) -> Optional[Backend]:
+        """Choose the least loaded eligible backend; caller holds the condition."""
+        excluded = set(exclude)
+        candidates = [
+            backend for backend in self.backends
+            if backend.healthy and backend.has_capacity and backend.url not in excluded
+            and self._serves_model(backend, model)
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda b: (b.outstanding / b.max_concurrency, b.outstanding, b.completed))
+
+    def _any_usable(self, model: Optional[str], exclude: Iterable[str]) -> bool:
+        excluded = set(exclude)
+        return any(
+            backend.healthy and backend.url not in excluded and self._serves_model(backend, model)
+            for backend in self.backends
+        )
+
+    def try_acquire(self, model: Optional[str] = None, exclude: Iterable[str] = ()) -> Optional[Backend]:
+        """Reserve a slot without waiting, or return None."""
+        self._recheck_down_backends(model, exclude)
+        with self._condition:
+            backend = self._pick(model, exclude)
+            if backend is not None:
+                backend.outstanding += 1
+            return backend
+
+    def acquire(
+        self,
+        model: Optional[str] = None,
+        exclude: Iterable[str] = (),
+        timeout: Optional[float] = None
+    ) -> Optional[Backend]:
+        """Reserve a slot, waiting for capacity; None if no healthy host can serve the request."""
+        exclude = list(exclude)
+        deadline = None if timeout is None else time.time() + timeout
+        self._recheck_down_backends(model, exclude)
+        with self._condition:
+            while True:
+                backend = self._pick(model, exclude)
+                if backend is not None:
+                    backend.outstanding += 1
+                    return backend
+                if not self._any_usable(model, exclude):
+                    return None
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return None
+                # Wake periodically so recovered hosts are noticed too
+                self.waiting += 1
+                try:
+                    self._condition.wait(timeout=min(remaining or self.recheck_interval, self.recheck_interval))
+                finally:
+                    self.waiting -= 1
+
+    def release(self, backend: Backend, ok: bool = True) -> None:
+        """Return a slot and record the outcome."""
+        with self._condition:
+            backend.outstanding = max(0, backend.outstanding - 1)
+            if ok:
+                backend.completed += 1
+            self._condition.notify_all()
+
+    def mark_down(self, backend: Backend, reason: str = "") -> None:
+        """Take a failed host out of rotation until a health check passes."""
+        with self._condition:
+            backend.failures += 1
+            if backend.healthy:
+                logger.warning(f"LLM backend {backend.url} marked down: {reason}")
+            backend.healthy = False
+            backend.down_since = time.time()
+            self._condition.notify_all()
+
+    def health_check(self, backend: Backend) -> bool:
+        """Probe /api/tags on one host and restore it if it answers."""
+        running, _ = self.registry.probe(backend.url, self.transport)
+        with self._condition:
+            backend.checking = False
+            if running:
+                if not backend.healthy:
+                    logger.info(f"LLM backend {backend.url} is healthy again")
+                backend.healthy = True
+                backend.down_since = None
+                self._condition.notify_all()
+            else:
+                backend.down_since = time.time()
+        return running
+
+    def _recheck_down_backends(self, model: Optional[str] = None, exclude: Iterable[str] = ()) -> None:
+        """Start background health checks for hosts that have been down long enough.
+
+        If no host is usable at all, probe the down ones synchronously instead of
+        failing the request outright.
+        """
+        with self._condition:
+            all_down = not self._any_usable(model, exclude)
+        if all_down:
+            excluded = set(exclude)
+            for backend in self.backends:
+                if not backend.healthy and backend.url not in excluded and not backend.checking:
+                    with self._condition:
+                        backend.checking = True
+                    self.health_check(backend)
+            return
+
+        now = time.time()
+        with self._condition:
+            due = [
+                backend for backend in self.backends
+                if not backend.healthy and not backend.checking
+                and backend.down_since is not None and now - backend.down_since >= self.recheck_interval
+            ]
+            for backend in due:
+                backend.checking = True
+        for backend in due:
+            threading.Thread(target=self.health_check, args=(backend,), daemon=True).start()
+
+    def load(self, model: Optional[str] = None) -> Dict[str, Any]:
+        """In-flight and waiting requests against the capacity of the healthy hosts that serve model."""
+        with self._condition:
+            hosts = [
+                backend for backend in self.backends
+                if backend.healthy and self._serves_model(backend, model)
+            ]
+            return {
+                "outstanding": sum(backend.outstanding for backend in hosts),
+                "waiting": self.waiting,
+                "capacity": sum(backend.max_concurrency for backend in hosts),
+                "hosts": [backend.url for backend in hosts],
+            }
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Per-host load and health snapshot."""
+        with self._condition:
+            return [backend.to_dict() for backend in self.backends]
+
+
+_pool: Optional[BackendPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_backend_pool(default_url: str, transport: Transport) -> BackendPool:
+    """Return the process-wide backend pool so in-flight counts are shared by every generator."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BackendPool.from_env(default_url, transport)
+        return _pool
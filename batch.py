@@ -0,0 +1,216 @@
+import os
+import re
+import csv
+import sys
+import json
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, List, Any, Optional, TextIO
+
+from metrics import PipelineMetrics
+from deadline import Deadline
+
+logger = logging.getLogger(__name__)
+
+
+def slugify(text: str, max_length: int = 60) -> str:
+    """Turn a topic into a filesystem-safe file name stem."""
+    slug = re.sub(r"[^a-z0-9]+", "_", text.lower()).strip("_")
+    return slug[:max_length] or "topic"
+
+
+def _parse_topics(stream: TextIO, fmt: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Parse topics from JSONL, CSV or plain text (one topic per line)."""
+    text = stream.read()
+    lines = [line for line in text.splitlines() if line.strip()]
+    if not lines:
+        return []
+
+    if fmt is None:
+        if lines[0].lstrip().startswith("{"):
+            fmt = "jsonl"
+        elif "," in lines[0] and lines[0].split(",")[0].strip().lower() in ("topic", "query", "id"):
+            fmt = "csv"
+        else:
+            fmt = "txt"
+
+    items = []
+    if fmt == "jsonl":
+        for line in lines:
+            record = json.loads(line)
+            if isinstance(record, str):
+                record = {"topic": record}
+            items.append(record)
+    elif fmt == "csv":
+        for row in csv.DictReader(lines):
+            items.append({key.strip().lower(): (value or "").strip() for key, value in row.items() if key})
+    else:
+        items = [{"topic": line.strip()} for line in lines]
+
+    topics = []
+    for index, item in enumerate(items):
+        topic = item.get("topic") or item.get("query")
+        if not topic:
+            logger.warning(f"Skipping batch entry {index + 1}: no topic")
+            continue
+        topics.append({
+            "id": str(item.get("id") or index + 1),
+            "topic": topic,
+            "output": item.get("output"),
+        })
+    return topics
+
+
+def load_topics(path: str) -> List[Dict[str, Any]]:
+    """Load batch topics from a file path, or stdin when path is '-'."""
+    if path == "-":
+        return _parse_topics(sys.stdin)
+
+    ext = os.path.splitext(path)[1].lower()
+    fmt = {".jsonl": "jsonl", ".ndjson": "jsonl", ".csv": "csv"}.get(ext)
+    with open(path, "r", newline="") as f:
+        return _parse_topics(f, fmt)
+
+
+class BatchRunner:
+    """Runs many blog posts with separate research and generation worker pools."""
+
+    def __init__(self, generator, output_dir: str, research_workers: int = 8, llm_workers: int = 1):
+        """Set up the runner around an initialized BlogGenerator."""
+        self.generator = generator
+        self.output_dir = output_dir
+        self.research_workers = max(1, research_workers)
+        self.llm_workers = max(1, llm_workers)
+        self._results: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def _output_path(self, item: Dict[str, Any]) -> str:
+        """Resolve where the post for a batch item is written."""
+        if item.get("output"):
+            return os.path.join(self.output_dir, item["output"])
+        return os.path.join(self.output_dir, f"{item['id']}_{slugify(item['topic'])}.md")
+
+    def _research(self, item: Dict[str, Any], result: Dict[str, Any], metrics: PipelineMetrics) -> Dict[str, Any]:
+        """Research stage, run on the research pool."""
+        start_time = time.time()
+        with metrics.stage("research"):
+            research = self.generator.get_research(item["topic"], deadline=Deadline(self.generator.timeout))
+        result["research_time"] = time.time() - start_time
+        metrics.research_cached = bool(research.get("cached"))
+        metrics.research_fallback = bool(research.get("fallback"))
+        metrics.research_shared = bool(research.get("shared"))
+        metrics.research_timed_out = bool(research.get("timed_out"))
+        metrics.research_error = research.get("error")
+        if research.get("fallback"):
+            result["warnings"].append(f"research unavailable: {research.get('error', 'no usable results')}")
+        return research
+
+    def _generate(
+        self,
+        item: Dict[str, Any],
+        research: Dict[str, Any],
+        result: Dict[str, Any],
+        metrics: PipelineMetrics
+    ) -> None:
+        """Generation stage, run on the bounded LLM pool."""
+        start_time = time.time()
+        # Time spent queued for an LLM slot is the batch's doing, so the post's clock excludes it
+        timeout = self.generator.timeout
+        deadline = Deadline(None if timeout is None else max(0.0, timeout - result["research_time"]))
+        content = self.generator.generate_blog(item["topic"], research, metrics, deadline)
+        result["generation_time"] = time.time() - start_time
+        result["metrics"] = metrics.finish().to_dict()
+
+        if metrics.generation_fallback:
+            result["warnings"].append("generation fallback used")
+        if metrics.generation_timed_out:
+            result["warnings"].append("time limit reached, post cut short")
+        if not metrics.generation_fallback:
+            self.generator.record_post(item["topic"], content, research, metrics, metrics.generation_timed_out)
+
+        path = self._output_path(item)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+        result["output"] = path
+        result["characters"] = len(content)
+
+    def _finish(self, result: Dict[str, Any], started: float, error: Optional[BaseException] = None) -> None:
+        """Record the final status and timing of a batch item."""
+        result["total_time"] = time.time() - started
+        if error is not None:
+            result["status"] = "failed"
+            result["error"] = str(error)
+            logger.error(f"Batch item {result['id']} failed: {str(error)}")
+        else:
+            result["status"] = "degraded" if result["warnings"] else "ok"
+            logger.info(f"Batch item {result['id']} finished in {result['total_time']:.2f} seconds")
+        with self._lock:
+            self._results.append(result)
+
+    def run(self, topics: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Run every topic and return a summary report."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._results = []
+        start_time = time.time()
+
+        with ThreadPoolExecutor(max_workers=self.llm_workers, thread_name_prefix="llm") as llm_pool, \
+                ThreadPoolExecutor(max_workers=self.research_workers, thread_name_prefix="research") as research_pool:
+
+            def on_research_done(future: Future, item: Dict[str, Any], result: Dict[str, Any], started: float,
+                                 metrics: PipelineMetrics):
+                error = future.exception()
+                if error is not None:
+                    self._finish(result, started, error)
+                    return
+                generation = llm_pool.submit(self._generate, item, future.result(), result, metrics)
+                generation.add_done_callback(lambda f: self._finish(result, started, f.exception()))
+
+            for item in topics:
+                result = {"id": item["id"], "topic": item["topic"], "warnings": []}
+                started = time.time()
+                metrics = self.generator._start_metrics(item["topic"])
+                research = research_pool.submit(self._research, item, result, metrics)
+                research.add_done_callback(
+                    lambda f, item=item, result=result, started=started, metrics=metrics:
+                        on_research_done(f, item, result, started, metrics)
+                )
+
+            # Wait until every research future has chained its generation step
+            research_pool.shutdown(wait=True)
+
+        elapsed_time = time.time() - start_time
+        order = {item["id"]: index for index, item in enumerate(topics)}
+        results = sorted(self._results, key=lambda r: order.get(r["id"], 0))
+        succeeded = [r for r in results if r["status"] != "failed"]
+
+        return {
+            "total": len(topics),
+            "succeeded": len(succeeded),
+            "degraded": sum(1 for r in results if r["status"] == "degraded"),
+            "failed": sum(1 for r in results if r["status"] == "failed"),
+            "elapsed_time": elapsed_time,
+            "throughput_per_minute": len(succeeded) / elapsed_time * 60 if elapsed_time else 0.0,
+            "research_workers": self.research_workers,
+            "llm_workers": self.llm_workers,
+            "items": results,
+        }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    """Print a human-readable batch summary."""
+    print("\n--- BATCH SUMMARY ---\n")
+    for item in report["items"]:
+        line = f"[{item['status']:>8}] {item['id']}: {item['topic']} ({item['total_time']:.2f}s)"
+        if item.get("error"):
+            line += f" - {item['error']}"
+        elif item.get("warnings"):
+            line += f" - {', '.join(item['warnings'])}"
+        print(line)
+    print(
+        f"\n{report['succeeded']}/{report['total']} succeeded "
+        f"({report['degraded']} degraded, {report['failed']} failed) "
+        f"in {report['elapsed_time']:.2f} seconds"
+    )
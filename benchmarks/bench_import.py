@@ -0,0 +1,122 @@
+"""Cold-start import benchmark for the CLI, MCP server and worker modules.
+
+Runs `python -X importtime -c "import <module>"` in fresh interpreters, reports
+the median cumulative import time per module and its slowest dependencies,
+and fails when a module exceeds its budget or eagerly imports a dependency
+that should only load on first use.
+
+    python benchmarks/bench_import.py
+    python benchmarks/bench_import.py --module agents --budget agents=40 --runs 9
+"""
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+from typing import Dict, List, Any, Optional, Tuple
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Milliseconds of cumulative import time allowed per module
+DEFAULT_BUDGETS_MS = {
+    "agents": 80.0,
+    "async_agents": 150.0,
+    "jobs": 60.0,
+    "server": 400.0,
+}
+
+# Dependencies that must only be imported when first used
+LAZY_MODULES = ("requests", "urllib3", "httpx", "linkup", "pydantic", "dotenv", "multiprocessing", "numpy")
+LAZY_CHECKED = ("agents", "async_agents", "jobs")
+
+
+def parse_importtime(stderr: str) -> List[Tuple[int, int, int, str]]:
+    """Parse -X importtime lines into (self_us, cumulative_us, depth, module)."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        except ValueError:
+            continue
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        rows.append((int(self_us), int(cumulative_us), depth, name.strip()))
+    return rows
+
+
+def measure(module: str) -> Optional[Dict[str, Any]]:
+    """Import module once in a fresh interpreter; None if the import fails."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_DIR, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()
+        print(f"{module}: import failed: {error[-1] if error else result.returncode}")
+        return None
+
+    rows = parse_importtime(result.stderr)
+    # The target is the last top-level entry; everything it pulled in precedes it
+    target_index = max(index for index, row in enumerate(rows) if row[2] == 0 and row[3] == module)
+    start = target_index
+    while start > 0 and rows[start - 1][2] > 0:
+        start -= 1
+    subtree = rows[start:target_index + 1]
+    return {
+        "cumulative_ms": rows[target_index][1] / 1000,
+        "modules": {row[3] for row in subtree},
+        "slowest": sorted(subtree[:-1], key=lambda row: row[0], reverse=True),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Import-time benchmark with per-module budgets")
+    parser.add_argument("--module", action="append", help="Module to measure (repeatable; default: all budgeted)")
+    parser.add_argument("--budget", action="append", default=[], metavar="MODULE=MS",
+                        help="Override a module's budget in milliseconds")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per module (median is reported)")
+    parser.add_argument("--top", type=int, default=5, help="Slowest dependencies to list per module")
+    args = parser.parse_args()
+
+    budgets = dict(DEFAULT_BUDGETS_MS)
+    for item in args.budget:
+        name, _, value = item.partition("=")
+        budgets[name] = float(value)
+
+    failures = []
+    for module in args.module or list(DEFAULT_BUDGETS_MS):
+        runs = []
+        for _ in range(max(1, args.runs)):
+            run = measure(module)
+            if run is None:
+                break
+            runs.append(run)
+        if len(runs) < max(1, args.runs):
+            failures.append(f"{module}: could not be imported")
+            continue
+
+        median_ms = statistics.median(run["cumulative_ms"] for run in runs)
+        budget = budgets.get(module)
+        verdict = "" if budget is None else ("ok" if median_ms <= budget else "OVER BUDGET")
+        print(f"{module:<14} {median_ms:>8.1f} ms  budget {budget or '-':>6}  {verdict}")
+        for self_us, cumulative_us, depth, name in runs[0]["slowest"][:args.top]:
+            print(f"    {name:<32} self {self_us / 1000:>6.1f} ms  cumulative {cumulative_us / 1000:>6.1f} ms")
+
+        if budget is not None and median_ms > budget:
+            failures.append(f"{module}: {median_ms:.1f} ms exceeds budget of {budget:.1f} ms")
+        if module in LAZY_CHECKED:
+            eager = sorted(name for name in LAZY_MODULES if name in runs[0]["modules"])
+            if eager:
+                failures.append(f"{module}: eagerly imports {', '.join(eager)}")
+
+    if failures:
+        print("Import budget check failed:")
+        for line in failures:
+            print(f"  {line}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
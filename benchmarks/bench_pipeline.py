@@ -0,0 +1,213 @@
+"""Offline throughput/latency benchmark for BlogGenerator.create_blog_post.
+
+Starts local fake Ollama and LinkUp servers, runs the real pipeline against
+them at several concurrency levels and appends the results to a JSON history
+file, comparing each run with the previous one so regressions stand out.
+
+    python benchmarks/bench_pipeline.py --concurrency 1 4 8 --posts 16
+"""
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import logging
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from fake_servers import FakeOllama, FakeLinkup
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RESULTS = os.path.join(BENCH_DIR, "results.json")
+REGRESSION_THRESHOLD = 0.10
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def git_revision() -> Optional[str]:
+    """Short hash of the checked-out commit, if available."""
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def run_level(generator, concurrency: int, posts: int) -> Dict[str, Any]:
+    """Generate posts with the given number of concurrent callers."""
+    topics = [f"benchmark topic {concurrency}-{index}" for index in range(posts)]
+    latencies: List[float] = []
+    first_tokens: List[float] = []
+    fallbacks = 0
+    research_errors: List[str] = []
+
+    def one(topic: str) -> None:
+        nonlocal fallbacks
+        start_time = time.perf_counter()
+        _, metrics = generator.create_blog_post_with_metrics(topic)
+        latencies.append(time.perf_counter() - start_time)
+        if metrics is not None:
+            if "time_to_first_token" in metrics.stages:
+                first_tokens.append(metrics.stages["time_to_first_token"])
+            if metrics.generation_fallback or metrics.research_fallback:
+                fallbacks += 1
+            if metrics.research_fallback:
+                research_errors.append(metrics.research_error or "no usable results")
+
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, topics))
+    elapsed = time.perf_counter() - start_time
+
+    return {
+        "concurrency": concurrency,
+        "posts": posts,
+        "elapsed_seconds": round(elapsed, 4),
+        "throughput_per_second": round(posts / elapsed, 4) if elapsed else 0.0,
+        "latency_p50": round(percentile(latencies, 50), 4),
+        "latency_p90": round(percentile(latencies, 90), 4),
+        "latency_p99": round(percentile(latencies, 99), 4),
+        "ttft_p50": round(percentile(first_tokens, 50), 4),
+        "ttft_p90": round(percentile(first_tokens, 90), 4),
+        "fallbacks": fallbacks,
+        "research_fallbacks": len(research_errors),
+        "research_error": research_errors[0] if research_errors else None,
+    }
+
+
+def compare(current: Dict[str, Any], previous: Optional[Dict[str, Any]]) -> List[str]:
+    """Describe regressions of more than REGRESSION_THRESHOLD against the previous run."""
+    if not previous or previous.get("config") != current["config"]:
+        return []
+    before = {level["concurrency"]: level for level in previous["levels"]}
+    regressions = []
+    for level in current["levels"]:
+        old = before.get(level["concurrency"])
+        if not old:
+            continue
+        if old["latency_p50"] and level["latency_p50"] > old["latency_p50"] * (1 + REGRESSION_THRESHOLD):
+            regressions.append(
+                f"c={level['concurrency']}: p50 latency {old['latency_p50']:.3f}s -> {level['latency_p50']:.3f}s"
+            )
+        if old["throughput_per_second"] and \
+                level["throughput_per_second"] < old["throughput_per_second"] * (1 - REGRESSION_THRESHOLD):
+            regressions.append(
+                f"c={level['concurrency']}: throughput {old['throughput_per_second']:.2f}/s -> "
+                f"{level['throughput_per_second']:.2f}/s"
+            )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Offline benchmark for the blog generation pipeline")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--posts", type=int, default=16, help="Posts per concurrency level")
+    parser.add_argument("--tokens", type=int, default=200, help="Tokens the fake model emits per post")
+    parser.add_argument("--token-rate", type=float, default=200.0, help="Fake decode speed in tokens/sec")
+    parser.add_argument("--first-token-latency", type=float, default=0.05)
+    parser.add_argument("--search-latency", type=float, default=0.3)
+    parser.add_argument("--prefill-rate", type=float, default=0.0,
+                        help="Fake prompt processing speed in tokens/sec (0 means free)")
+    parser.add_argument("--reuse-context", action="store_true",
+                        help="Send the style prefix as a precomputed context")
+    parser.add_argument("--output", default=DEFAULT_RESULTS, help="JSON history file to append to")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    ollama = FakeOllama(tokens=args.tokens, token_rate=args.token_rate,
+                        first_token_latency=args.first_token_latency,
+                        prefill_rate=args.prefill_rate).start()
+    linkup = FakeLinkup(latency=args.search_latency).start()
+
+    os.environ["LLM_BASE_URL"] = ollama.url
+    os.environ["LINKUP_BASE_URL"] = linkup.base_url
+    os.environ.setdefault("LINKUP_API_KEY", "benchmark")
+    os.environ["LLM_POOL_SIZE"] = str(max(args.concurrency) * 2)
+    # The fake LinkUp has no quota; the client-side scheduler must not throttle the benchmark
+    os.environ["LINKUP_RATE"] = "10000"
+    os.environ["LINKUP_BURST"] = "10000"
+
+    from agents import BlogGenerator
+
+    config = {
+        "tokens": args.tokens,
+        "token_rate": args.token_rate,
+        "first_token_latency": args.first_token_latency,
+        "search_latency": args.search_latency,
+        "prefill_rate": args.prefill_rate,
+        "reuse_context": args.reuse_context,
+        "posts": args.posts,
+    }
+    try:
+        generator = BlogGenerator(use_cache=False, use_generation_cache=False,
+                                  reuse_context=args.reuse_context, use_history=False,
+                                  use_index=False)
+        levels = []
+        for concurrency in args.concurrency:
+            level = run_level(generator, concurrency, args.posts)
+            levels.append(level)
+            print(
+                f"c={concurrency:<3} {level['throughput_per_second']:>7.2f} posts/s  "
+                f"p50 {level['latency_p50']:.3f}s  p90 {level['latency_p90']:.3f}s  "
+                f"p99 {level['latency_p99']:.3f}s  ttft p50 {level['ttft_p50']:.3f}s  "
+                f"fallbacks {level['fallbacks']}"
+            )
+    finally:
+        ollama.stop()
+        linkup.stop()
+
+    broken = [level for level in levels if level["posts"] and level["research_fallbacks"] == level["posts"]]
+    if broken:
+        # Every post was written from placeholder research, so the numbers describe the fallback path
+        print(
+            f"ERROR: every research call fell back at c={', c='.join(str(level['concurrency']) for level in broken)} "
+            f"({broken[0]['research_error']}); results not recorded",
+            file=sys.stderr
+        )
+        return 2
+
+    run = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "revision": git_revision(),
+        "config": config,
+        "levels": levels,
+    }
+
+    history: List[Dict[str, Any]] = []
+    if os.path.exists(args.output):
+        with open(args.output) as f:
+            history = json.load(f)
+    regressions = compare(run, history[-1] if history else None)
+    history.append(run)
+    with open(args.output, "w") as f:
+        json.dump(history, f, indent=2)
+    print(f"Results appended to {args.output}")
+
+    if regressions:
+        print("Regressions against previous run:")
+        for line in regressions:
+            print(f"  {line}")
+        if args.fail_on_regression:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,243 @@
+"""Local stand-ins for Ollama and LinkUp so benchmarks run with no network."""
+import sys
+import json
+import time
+import random
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+WORDS = (
+    "honestly the best part about this is that you can start small today and keep "
+    "building momentum one practical step at a time without overthinking it"
+).split()
+
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    """Request handler that logs at debug level instead of stderr."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug(format % args)
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length) if length else b""
+        try:
+            return json.loads(body) if body else {}
+        except json.JSONDecodeError:
+            return {}
+
+    def _send_json(self, status: int, body: Any) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class _QuietServer(ThreadingHTTPServer):
+    """Threading server that does not print tracebacks when a client drops its connection."""
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address) -> None:
+        error = sys.exc_info()[1]
+        if isinstance(error, (ConnectionResetError, BrokenPipeError)):
+            logger.debug(f"Client {client_address[0]}:{client_address[1]} disconnected: {error}")
+            return
+        super().handle_error(request, client_address)
+
+
+class FakeServer:
+    """Runs a handler class on a background ThreadingHTTPServer bound to localhost."""
+
+    handler_class = _QuietHandler
+
+    def __init__(self, port: int = 0, **settings):
+        """Bind to port (0 picks a free one); settings are exposed to the handler."""
+        handler = type(self.handler_class.__name__, (self.handler_class,), {"settings": settings})
+        self.server = _QuietServer(("127.0.0.1", port), handler)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeServer":
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "FakeServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+class _OllamaHandler(_QuietHandler):
+    settings: Dict[str, Any] = {}
+
+    def do_GET(self) -> None:
+        if self.path == "/api/tags":
+            models = [{"name": name} for name in self.settings.get("models", ["llama3:latest"])]
+            self._send_json(200, {"models": models})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self) -> None:
+        payload = self._read_json()
+        if self.path != "/api/generate":
+            self._send_json(404, {"error": "not found"})
+            return
+
+        options = payload.get("options", {})
+        tokens = int(options.get("num_predict", payload.get("num_predict", self.settings["tokens"])))
+        tokens = min(tokens, self.settings["tokens"])
+        rate = self.settings["token_rate"]
+        started = time.time()
+
+        # Prompt processing / model load before the first token. A request that
+        # passes a context skips prefilling its system prompt, as Ollama does.
+        prefill_tokens = len(payload.get("prompt", "").split())
+        if not payload.get("context"):
+            prefill_tokens += len(payload.get("system", "").split())
+        prefill_rate = self.settings["prefill_rate"]
+        time.sleep(self.settings["first_token_latency"] + (prefill_tokens / prefill_rate if prefill_rate else 0))
+
+        if payload.get("stream") is False:
+            if not payload.get("prompt"):
+                # Like Ollama, a request without a prompt only loads the model
+                self._send_json(200, {"model": payload.get("model"), "response": "", "done": True,
+                                      "done_reason": "load"})
+                return
+            self._send_json(200, {
+                "model": payload.get("model"),
+                "response": "OK",
+                "done": True,
+                "context": list(range(prefill_tokens + 1)),
+                "prompt_eval_count": prefill_tokens,
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        rng = random.Random(payload.get("prompt", ""))
+        eval_started = time.time()
+        for index in range(tokens):
+            text = ("# A Fake Post\n\n" if index == 0 else "") + rng.choice(WORDS) + " "
+            self._write_chunk({"model": payload.get("model"), "response": text, "done": False})
+            if rate:
+                time.sleep(1.0 / rate)
+
+        eval_duration = time.time() - eval_started
+        self._write_chunk({
+            "model": payload.get("model"),
+            "response": "",
+            "done": True,
+            "context": [1, 2, 3],
+            "eval_count": tokens,
+            "eval_duration": int(eval_duration * 1e9),
+            "prompt_eval_count": prefill_tokens,
+            "total_duration": int((time.time() - started) * 1e9),
+        })
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, body: Dict[str, Any]) -> None:
+        data = (json.dumps(body) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+class FakeOllama(FakeServer):
+    """Emulates Ollama's /api/tags and /api/generate (streaming, or one JSON body with stream false)."""
+
+    handler_class = _OllamaHandler
+
+    def __init__(
+        self,
+        port: int = 0,
+        models: Optional[List[str]] = None,
+        tokens: int = 200,
+        token_rate: float = 200.0,
+        first_token_latency: float = 0.05,
+        prefill_rate: float = 0.0
+    ):
+        """token_rate and prefill_rate are tokens per second per request (0 means unthrottled)."""
+        super().__init__(
+            port,
+            models=models or ["llama3:latest"],
+            tokens=tokens,
+            token_rate=token_rate,
+            first_token_latency=first_token_latency,
+            prefill_rate=prefill_rate
+        )
+
+
+class _LinkupHandler(_QuietHandler):
+    settings: Dict[str, Any] = {}
+
+    def do_POST(self) -> None:
+        payload = self._read_json()
+        if not self.path.endswith("/search"):
+            self._send_json(404, {"error": "not found"})
+            return
+
+        time.sleep(self.settings["latency"])
+        query = payload.get("q", "")
+        # Every field the SDK's response models require, or it rejects the response
+        pages = [
+            {
+                "name": f"Source {index} on {query}",
+                "url": f"https://example.com/{index}/{abs(hash(query)) % 10000}",
+                "favicon": "https://example.com/favicon.ico",
+                "text": f"Snippet {index} about {query}.",
+            }
+            for index in range(self.settings["sources"])
+        ]
+        if payload.get("outputType") == "searchResults":
+            results = [
+                {"type": "text", "name": page["name"], "url": page["url"], "content": page["text"],
+                 "favicon": page["favicon"]}
+                for page in pages
+            ]
+            self._send_json(200, {"results": results})
+        else:
+            answer = (
+                f"{query} is changing quickly. Most teams start with one workflow and expand. "
+                "The tools matter less than consistent habits."
+            )
+            sources = [
+                {"name": page["name"], "url": page["url"], "snippet": page["text"], "favicon": page["favicon"]}
+                for page in pages
+            ]
+            self._send_json(200, {"answer": answer, "sources": sources})
+
+
+class FakeLinkup(FakeServer):
+    """Emulates the LinkUp /v1/search endpoint for sourcedAnswer and searchResults."""
+
+    handler_class = _LinkupHandler
+
+    def __init__(self, port: int = 0, latency: float = 0.3, sources: int = 3):
+        """latency is the simulated search time in seconds."""
+        super().__init__(port, latency=latency, sources=sources)
+
+    @property
+    def base_url(self) -> str:
+        """Value for LINKUP_BASE_URL."""
+        return f"{self.url}/v1"
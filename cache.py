@@ -0,0 +1,174 @@
+import os
+import re
+import json
+import hashlib
+import time
+import sqlite3
+import logging
+import threading
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.getenv("BLOG_CACHE_DIR", ".cache")
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a topic so trivially different spellings share a cache entry."""
+    query = query.strip().lower()
+    query = re.sub(r"\s+", " ", query)
+    return query.rstrip("?!. ")
+
+
+def research_cache_key(query: str, depth: str, output_type: str) -> str:
+    """Build the research cache key from the normalized query and search parameters."""
+    return f"{depth}|{output_type}|{normalize_query(query)}"
+
+
+def generation_cache_key(payload: Dict[str, Any]) -> str:
+    """Hash the exact /api/generate payload into a content address."""
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class DiskCache:
+    """SQLite-backed key/value cache with TTL and size-based LRU eviction."""
+
+    def __init__(self, path: str, ttl: float = 86400, max_bytes: int = 50 * 1024 * 1024):
+        """Open (or create) the cache database at path."""
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache(accessed_at)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None if missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            value, created_at = row
+            if self.ttl and now - created_at > self.ttl:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._conn.commit()
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+
+        return json.loads(value)
+
+    def age(self, key: str) -> Optional[float]:
+        """Seconds since key was stored, or None if missing or expired; does not count as a lookup."""
+        with self._lock:
+            row = self._conn.execute("SELECT created_at FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        age = time.time() - row[0]
+        return None if self.ttl and age > self.ttl else age
+
+    def set(self, key: str, value: Any) -> None:
+        """Store a JSON-serializable value under key and evict if over budget."""
+        encoded = json.dumps(value)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, encoded, len(encoded), now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        """Drop expired entries, then least recently used ones until under max_bytes."""
+        if self.ttl:
+            self._conn.execute("DELETE FROM cache WHERE created_at < ?", (now - self.ttl,))
+
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = self._conn.execute("SELECT key, size FROM cache ORDER BY accessed_at ASC").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            total -= size
+            logger.debug(f"Evicted cache entry: {key}")
+
+    def clear(self) -> None:
+        """Remove every entry from the cache."""
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current size."""
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": total,
+        }
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+def get_research_cache() -> DiskCache:
+    """Create the research cache from environment configuration."""
+    return DiskCache(
+        path=os.getenv("RESEARCH_CACHE_PATH", os.path.join(DEFAULT_CACHE_DIR, "research.sqlite3")),
+        ttl=float(os.getenv("RESEARCH_CACHE_TTL", "86400")),
+        max_bytes=int(os.getenv("RESEARCH_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+    )
+
+
+def get_generation_cache() -> DiskCache:
+    """Create the generation cache from environment configuration."""
+    return DiskCache(
+        path=os.getenv("GENERATION_CACHE_PATH", os.path.join(DEFAULT_CACHE_DIR, "generations.sqlite3")),
+        ttl=float(os.getenv("GENERATION_CACHE_TTL", str(7 * 86400))),
+        max_bytes=int(os.getenv("GENERATION_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+    )
+
+
+def generation_cache_enabled() -> bool:
+    """Whether the opt-in generation cache is switched on via GENERATION_CACHE."""
+    return os.getenv("GENERATION_CACHE", "").lower() in ("1", "true", "yes", "on")
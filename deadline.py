@@ -0,0 +1,126 @@
+import os
+import time
+import logging
+import threading
+from typing import Dict, List, Any, Optional, Callable
+
+logger = logging.getLogger(__name__)
+
+# Typical stage latencies in seconds, used until real ones have been observed
+DEFAULT_STAGE_SECONDS = {
+    "research": 3.0,
+    "outline": 5.0,
+    "generation": 45.0,
+}
+# A stage gets at least this multiple of its typical latency when time allows...
+STAGE_SLACK = 1.5
+# ...but never more than this share of what is left, so later stages are not starved
+MAX_STAGE_SHARE = 0.5
+
+
+def default_timeout() -> Optional[float]:
+    """Per-post time limit from BLOG_TIMEOUT in seconds (default 300; 0 means no limit)."""
+    seconds = float(os.getenv("BLOG_TIMEOUT", "300"))
+    return seconds if seconds > 0 else None
+
+
+class LatencyModel:
+    """Moving averages of recent stage latencies, used to split a deadline between stages."""
+
+    def __init__(self, alpha: float = 0.3, defaults: Optional[Dict[str, float]] = None):
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self._estimates: Dict[str, float] = dict(defaults or DEFAULT_STAGE_SECONDS)
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """Record how long a stage took when it ran to completion."""
+        with self._lock:
+            previous = self._estimates.get(stage)
+            if previous is None:
+                self._estimates[stage] = seconds
+            else:
+                self._estimates[stage] = previous + self.alpha * (seconds - previous)
+
+    def estimate(self, stage: str) -> float:
+        with self._lock:
+            return self._estimates.get(stage, 1.0)
+
+    def allocate(self, stage: str, stages: List[str], remaining: float) -> float:
+        """Seconds to give stage out of remaining, where stages are it and the stages after it.
+
+        Time is shared in proportion to typical latency; the last stage gets
+        whatever is left.
+        """
+        if stage == stages[-1]:
+            return remaining
+        estimates = {name: self.estimate(name) for name in stages}
+        share = remaining * estimates[stage] / sum(estimates.values())
+        floor = min(estimates[stage] * STAGE_SLACK, remaining * MAX_STAGE_SHARE)
+        return max(share, floor)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return {stage: round(seconds, 3) for stage, seconds in self._estimates.items()}
+
+
+# Process-wide so every generator learns from every post
+STAGE_LATENCY = LatencyModel()
+
+
+class Deadline:
+    """The time by which one post must be finished, shared by every stage that works on it.
+
+    Times are time.monotonic() values; a Deadline created with no seconds
+    never expires.
+    """
+
+    def __init__(self, seconds: Optional[float] = None):
+        self.at: Optional[float] = None if seconds is None else time.monotonic() + seconds
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left (never negative), or None without a limit."""
+        if self.at is None:
+            return None
+        return max(0.0, self.at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.at is not None and time.monotonic() >= self.at
+
+    def budget(self, stage: str, stages: List[str], model: Optional[LatencyModel] = None) -> Optional[float]:
+        """Seconds allotted to stage out of the time left; None without a limit."""
+        remaining = self.remaining()
+        if remaining is None:
+            return None
+        return (model or STAGE_LATENCY).allocate(stage, stages, remaining)
+
+    def stage_at(self, stage: str, stages: List[str], model: Optional[LatencyModel] = None) -> Optional[float]:
+        """Monotonic time at which stage should give up; None without a limit."""
+        budget = self.budget(stage, stages, model)
+        return None if budget is None else time.monotonic() + budget
+
+
+def run_with_timeout(fn: Callable[[], Any], timeout: Optional[float], name: str = "deadline") -> Any:
+    """Call fn, waiting at most timeout seconds for it, and raise TimeoutError if it takes longer.
+
+    fn runs on a daemon thread. When the wait times out, it is left to finish
+    in the background, so work such as filling a cache is not wasted.
+    """
+    if timeout is None:
+        return fn()
+    outcome: Dict[str, Any] = {}
+    done = threading.Event()
+
+    def run() -> None:
+        try:
+            outcome["result"] = fn()
+        except BaseException as e:
+            outcome["error"] = e
+        finally:
+            done.set()
+
+    threading.Thread(target=run, name=name, daemon=True).start()
+    if not done.wait(timeout):
+        raise TimeoutError(f"{name} did not finish within {timeout:.1f}s")
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"]
@@ -0,0 +1,333 @@
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import argparse
+import threading
+from typing import Dict, List, Any, Optional, Tuple
+
+from cache import DEFAULT_CACHE_DIR, normalize_query
+
+logger = logging.getLogger(__name__)
+
+# Words ignored when deciding whether two topics are about the same thing
+STOP_WORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "best", "by", "for", "from", "how", "in", "is", "it",
+    "of", "on", "or", "the", "to", "what", "why", "with", "your", "you", "guide",
+}
+
+SUMMARY_COLUMNS = "id, topic, model, created_at, characters, partial"
+
+
+def default_history_path() -> str:
+    return os.getenv("HISTORY_PATH", os.path.join(DEFAULT_CACHE_DIR, "history.sqlite3"))
+
+
+def topic_terms(topic: str) -> List[str]:
+    """Distinct meaningful words of a topic, in order."""
+    terms: List[str] = []
+    for word in re.findall(r"\w+", normalize_query(topic)):
+        if word not in STOP_WORDS and word not in terms:
+            terms.append(word)
+    return terms
+
+
+def topic_similarity(first: str, second: str) -> float:
+    """Jaccard similarity of two topics' meaningful words (1.0 means the same words)."""
+    a, b = set(topic_terms(first)), set(topic_terms(second))
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def fts_query(text: str, any_term: bool = False) -> str:
+    """Turn free text into a safe FTS5 query: every word as a quoted prefix, ANDed (or ORed)."""
+    words = re.findall(r"\w+", text.lower())
+    return (" OR " if any_term else " ").join(f'"{word}"*' for word in words)
+
+
+class HistoryStore:
+    """Persistent record of finished posts with full-text search over topics and content.
+
+    Each post keeps its model, stage timings and the research it was written
+    from, so the history doubles as a retrieval source: get_research can reuse
+    a recent post's research for a closely related topic instead of searching
+    again. Search uses SQLite FTS5 when available and LIKE otherwise.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """Open (or create) the history database."""
+        self.path = path or default_history_path()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS posts (
+                id INTEGER PRIMARY KEY,
+                topic TEXT NOT NULL,
+                normalized_topic TEXT NOT NULL,
+                content TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                characters INTEGER NOT NULL,
+                model TEXT NOT NULL DEFAULT '',
+                research TEXT,
+                metrics TEXT,
+                partial INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_posts_created ON posts(created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_posts_topic ON posts(normalized_topic, content_hash)")
+        self.fts = self._create_fts()
+
+    def _create_fts(self) -> bool:
+        """Create the FTS5 index and the triggers that keep it in sync; False if FTS5 is unavailable."""
+        try:
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5("
+                "topic, content, content='posts', content_rowid='id', tokenize='porter unicode61')"
+            )
+        except sqlite3.OperationalError as e:
+            logger.warning(f"SQLite FTS5 unavailable, history search falls back to LIKE: {str(e)}")
+            return False
+        self._conn.executescript(
+            """
+            CREATE TRIGGER IF NOT EXISTS posts_ai AFTER INSERT ON posts BEGIN
+                INSERT INTO posts_fts(rowid, topic, content) VALUES (new.id, new.topic, new.content);
+            END;
+            CREATE TRIGGER IF NOT EXISTS posts_ad AFTER DELETE ON posts BEGIN
+                INSERT INTO posts_fts(posts_fts, rowid, topic, content) VALUES ('delete', old.id, old.topic, old.content);
+            END;
+            """
+        )
+        return True
+
+    def add(
+        self,
+        topic: str,
+        content: str,
+        model: str = "",
+        research: Optional[Dict[str, Any]] = None,
+        metrics: Optional[Dict[str, Any]] = None,
+        partial: bool = False
+    ) -> int:
+        """Record a finished post and return its id; the same post for the same topic is stored once."""
+        normalized = normalize_query(topic)
+        content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        with self._lock:
+            existing = self._conn.execute(
+                "SELECT id FROM posts WHERE normalized_topic = ? AND content_hash = ?", (normalized, content_hash)
+            ).fetchone()
+            if existing is not None:
+                return existing["id"]
+            cursor = self._conn.execute(
+                "INSERT INTO posts (topic, normalized_topic, content, content_hash, characters, model, research, "
+                "metrics, partial, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    topic, normalized, content, content_hash, len(content), model,
+                    json.dumps(research) if research else None,
+                    json.dumps(metrics) if metrics else None,
+                    int(partial), time.time()
+                )
+            )
+            return cursor.lastrowid
+
+    def get(self, post_id: int) -> Optional[Dict[str, Any]]:
+        """A post with its content, research and metrics."""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM posts WHERE id = ?", (post_id,)).fetchone()
+        return self._row_to_post(row) if row else None
+
+    def _row_to_post(self, row: sqlite3.Row) -> Dict[str, Any]:
+        post = dict(row)
+        for key in ("research", "metrics"):
+            if key in post:
+                post[key] = json.loads(post[key]) if post[key] else None
+        if "partial" in post:
+            post["partial"] = bool(post["partial"])
+        return post
+
+    def _search_clause(self, query: Optional[str], since: Optional[float] = None) -> Tuple[str, tuple]:
+        """WHERE clause and parameters restricting posts to a search and/or an age; empty for neither."""
+        conditions: List[str] = []
+        params: List[Any] = []
+        if query and re.search(r"\w", query):
+            if self.fts:
+                conditions.append("id IN (SELECT rowid FROM posts_fts WHERE posts_fts MATCH ?)")
+                params.append(fts_query(query))
+            else:
+                pattern = f"%{query.strip()}%"
+                conditions.append("(topic LIKE ? OR content LIKE ?)")
+                params.extend([pattern, pattern])
+        if since:
+            conditions.append("created_at > ?")
+            params.append(since)
+        if not conditions:
+            return "", ()
+        return "WHERE " + " AND ".join(conditions), tuple(params)
+
+    def count(self, query: Optional[str] = None, since: Optional[float] = None) -> int:
+        """Number of posts, or of posts matching a search; since skips posts created before that time."""
+        where, params = self._search_clause(query, since)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM posts {where}", params).fetchone()[0]
+
+    def page(
+        self,
+        offset: int = 0,
+        limit: int = 10,
+        query: Optional[str] = None,
+        with_content: bool = False,
+        since: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """One page of posts, newest first, optionally matching a search or newer than since.
+
+        Without with_content only the summary columns are read, so listing
+        thousands of posts stays cheap.
+        """
+        where, params = self._search_clause(query, since)
+        columns = "*" if with_content else SUMMARY_COLUMNS
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {columns} FROM posts {where} ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?",
+                params + (limit, offset)
+            ).fetchall()
+        return [self._row_to_post(row) for row in rows]
+
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Best matches for a search, most relevant first, with a highlighted snippet."""
+        if not re.search(r"\w", query or ""):
+            return []
+        if not self.fts:
+            return self.page(limit=limit, query=query)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join('posts.' + column.strip() for column in SUMMARY_COLUMNS.split(','))}, "
+                "snippet(posts_fts, 1, '**', '**', '...', 16) AS snippet "
+                "FROM posts_fts JOIN posts ON posts.id = posts_fts.rowid "
+                "WHERE posts_fts MATCH ? ORDER BY bm25(posts_fts, 5.0, 1.0) LIMIT ?",
+                (fts_query(query), limit)
+            ).fetchall()
+        return [self._row_to_post(row) for row in rows]
+
+    def related_research(
+        self,
+        topic: str,
+        min_similarity: float = 0.75,
+        max_age: float = 3 * 86400,
+        require_brief: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """Research from a recent post on a closely related topic, or None.
+
+        Candidates come from an FTS match on the topic's words; the best one is
+        used if its topic is at least min_similarity alike (see topic_similarity)
+        and it was written within max_age seconds from real, not fallback,
+        research. require_brief asks for research from a deep research pass.
+        """
+        terms = topic_terms(topic)
+        if not terms:
+            return None
+        since = time.time() - max_age
+        with self._lock:
+            if self.fts:
+                rows = self._conn.execute(
+                    "SELECT posts.id, posts.topic, posts.research FROM posts_fts "
+                    "JOIN posts ON posts.id = posts_fts.rowid "
+                    "WHERE posts_fts MATCH ? AND posts.created_at >= ? AND posts.research IS NOT NULL "
+                    "ORDER BY bm25(posts_fts) LIMIT 20",
+                    (f"topic : ({fts_query(' '.join(terms), any_term=True)})", since)
+                ).fetchall()
+            else:
+                rows = self._conn.execute(
+                    "SELECT id, topic, research FROM posts WHERE created_at >= ? AND research IS NOT NULL "
+                    "ORDER BY created_at DESC LIMIT 200",
+                    (since,)
+                ).fetchall()
+
+        best: Optional[Dict[str, Any]] = None
+        best_score = min_similarity
+        for row in rows:
+            score = topic_similarity(topic, row["topic"])
+            if score < best_score:
+                continue
+            research = json.loads(row["research"])
+            # Research that was itself reused is skipped, so reuse never outlives max_age
+            if research.get("fallback") or research.get("reused_from") or not research.get("summary"):
+                continue
+            if require_brief and not research.get("brief"):
+                continue
+            best, best_score = dict(research, reused_from=row["topic"], reused_post=row["id"]), score
+        return best
+
+    def delete(self, post_id: int) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM posts WHERE id = ?", (post_id,))
+
+    def clear(self) -> None:
+        """Delete every post."""
+        with self._lock:
+            self._conn.execute("DELETE FROM posts")
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+def history_enabled() -> bool:
+    """Whether finished posts are recorded (BLOG_HISTORY, on by default)."""
+    return os.getenv("BLOG_HISTORY", "1").lower() not in ("0", "false", "no", "off")
+
+
+def get_history_store() -> HistoryStore:
+    """Create the history store from environment configuration."""
+    return HistoryStore(default_history_path())
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Browse and search past blog posts")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = subparsers.add_parser("list", help="Most recent posts")
+    list_parser.add_argument("--limit", type=int, default=20)
+    list_parser.add_argument("--offset", type=int, default=0)
+
+    search_parser = subparsers.add_parser("search", help="Full-text search over topics and content")
+    search_parser.add_argument("query")
+    search_parser.add_argument("--limit", type=int, default=10)
+
+    show_parser = subparsers.add_parser("show", help="Print one post")
+    show_parser.add_argument("post_id", type=int)
+    args = parser.parse_args()
+
+    store = get_history_store()
+    if args.command == "show":
+        post = store.get(args.post_id)
+        if post is None:
+            print(f"No post {args.post_id}")
+            return 1
+        print(post["content"])
+        return 0
+
+    posts = store.page(args.offset, args.limit) if args.command == "list" else store.search(args.query, args.limit)
+    for post in posts:
+        created = time.strftime("%Y-%m-%d %H:%M", time.localtime(post["created_at"]))
+        print(f"{post['id']:>6}  {created}  {post['topic']}")
+        if post.get("snippet"):
+            print(f"        {post['snippet']}")
+    if not posts:
+        print("No posts found.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
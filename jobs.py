@@ -0,0 +1,435 @@
+import os
+import sys
+import json
+import time
+import uuid
+import signal
+import sqlite3
+import logging
+import argparse
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Any, Iterator, Optional
+
+from cache import DEFAULT_CACHE_DIR, normalize_query
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Running jobs whose worker has not sent a heartbeat for this long are requeued
+DEFAULT_STALE_AFTER = 120.0
+# A job that has been claimed this many times without finishing is failed rather than requeued
+DEFAULT_MAX_ATTEMPTS = 3
+
+
+def default_queue_path() -> str:
+    """Location of the job database, shared by every process on this machine."""
+    return os.getenv("JOB_QUEUE_PATH", os.path.join(DEFAULT_CACHE_DIR, "jobs.sqlite3"))
+
+
+class JobQueue:
+    """SQLite-backed queue of blog generation jobs.
+
+    Any number of processes can open the same database: the UI and MCP server
+    submit and poll, worker processes claim jobs and stream progress back.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        stale_after: Optional[float] = None,
+        max_attempts: Optional[int] = None
+    ):
+        """Open (or create) the queue.
+
+        Running jobs without a heartbeat for stale_after seconds (JOB_STALE_AFTER)
+        are requeued, or failed once they have been claimed max_attempts times
+        (JOB_MAX_ATTEMPTS).
+        """
+        self.path = path or default_queue_path()
+        self.stale_after = stale_after if stale_after is not None else float(
+            os.getenv("JOB_STALE_AFTER", str(DEFAULT_STALE_AFTER))
+        )
+        self.max_attempts = max(1, max_attempts if max_attempts is not None else int(
+            os.getenv("JOB_MAX_ATTEMPTS", str(DEFAULT_MAX_ATTEMPTS))
+        ))
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                topic TEXT NOT NULL,
+                options TEXT NOT NULL DEFAULT '{}',
+                priority INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL,
+                stage TEXT,
+                partial TEXT NOT NULL DEFAULT '',
+                result TEXT,
+                metrics TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                heartbeat_at REAL,
+                finished_at REAL
+            )"""
+        )
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "dedupe_key" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN dedupe_key TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs(status, priority, created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_dedupe ON jobs(dedupe_key, status)")
+
+    def submit(
+        self,
+        topic: str,
+        priority: int = 0,
+        options: Optional[Dict[str, Any]] = None,
+        dedupe: bool = True
+    ) -> str:
+        """Queue a topic and return its job id; lower priority values run first.
+
+        With dedupe, a topic (same normalized text and options) that is already
+        queued or running returns the existing job's id instead of a new job.
+        """
+        options_json = json.dumps(options or {}, sort_keys=True)
+        dedupe_key = f"{normalize_query(topic)}\n{options_json}"
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                existing = None
+                if dedupe:
+                    existing = self._conn.execute(
+                        "SELECT id FROM jobs WHERE dedupe_key = ? AND status IN (?, ?) ORDER BY created_at LIMIT 1",
+                        (dedupe_key, QUEUED, RUNNING)
+                    ).fetchone()
+                if existing is None:
+                    job_id = uuid.uuid4().hex
+                    self._conn.execute(
+                        "INSERT INTO jobs (id, topic, options, priority, status, created_at, dedupe_key) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (job_id, topic, options_json, priority, QUEUED, time.time(), dedupe_key)
+                    )
+                else:
+                    job_id = existing["id"]
+                    # A more urgent duplicate promotes the queued job
+                    self._conn.execute(
+                        "UPDATE jobs SET priority = MIN(priority, ?) WHERE id = ? AND status = ?",
+                        (priority, job_id, QUEUED)
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if existing is None:
+            logger.info(f"Queued job {job_id}: {topic}")
+        else:
+            logger.info(f"Attached to in-flight job {job_id}: {topic}")
+        return job_id
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return the job as a dict, including partial content while it runs."""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["options"] = json.loads(job["options"] or "{}")
+        job["metrics"] = json.loads(job["metrics"]) if job["metrics"] else None
+        if job["status"] == QUEUED:
+            job["queue_position"] = self._queue_position(job)
+        return job
+
+    def _queue_position(self, job: Dict[str, Any]) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = ? AND (priority < ? OR (priority = ? AND created_at < ?))",
+                (QUEUED, job["priority"], job["priority"], job["created_at"])
+            ).fetchone()[0]
+
+    def result(self, job_id: str, timeout: Optional[float] = None, poll_interval: float = 0.5) -> Optional[Dict[str, Any]]:
+        """Wait until the job finishes (or timeout passes) and return its final status."""
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            job = self.status(job_id)
+            if job is None or job["status"] in (DONE, FAILED):
+                return job
+            if deadline is not None and time.time() >= deadline:
+                return job
+            time.sleep(poll_interval)
+
+    def list_jobs(self, limit: int = 50, statuses: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Most recent jobs first, without their content."""
+        query = "SELECT id, topic, status, stage, priority, error, created_at, started_at, finished_at FROM jobs"
+        params: List[Any] = []
+        if statuses:
+            query += f" WHERE status IN ({','.join('?' for _ in statuses)})"
+            params.extend(statuses)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(query, params).fetchall()]
+
+    def claim(self, worker: str) -> Optional[Dict[str, Any]]:
+        """Atomically take the next queued job for worker."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Requeue jobs whose worker stopped sending heartbeats, unless they keep killing workers
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, finished_at = ? "
+                    "WHERE status = ? AND heartbeat_at < ? AND attempts >= ?",
+                    (FAILED, f"Worker stopped responding on all {self.max_attempts} attempts", now,
+                     RUNNING, now - self.stale_after, self.max_attempts)
+                )
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, worker = NULL WHERE status = ? AND heartbeat_at < ?",
+                    (QUEUED, RUNNING, now - self.stale_after)
+                )
+                row = self._conn.execute(
+                    "SELECT * FROM jobs WHERE status = ? ORDER BY priority, created_at LIMIT 1", (QUEUED,)
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, worker = ?, stage = NULL, partial = '', attempts = attempts + 1, "
+                    "started_at = ?, heartbeat_at = ? WHERE id = ?",
+                    (RUNNING, worker, now, now, row["id"])
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        job = dict(row)
+        job["options"] = json.loads(job["options"] or "{}")
+        return job
+
+    def update_progress(self, job_id: str, stage: Optional[str] = None, partial: Optional[str] = None) -> None:
+        """Record the current stage and/or partial content, doubling as a heartbeat."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET stage = COALESCE(?, stage), partial = COALESCE(?, partial), heartbeat_at = ? "
+                "WHERE id = ?",
+                (stage, partial, time.time(), job_id)
+            )
+
+    def heartbeat(self, job_id: str, worker: str) -> bool:
+        """Mark a running job as alive; False if it is no longer held by worker."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND worker = ? AND status = ?",
+                (time.time(), job_id, worker, RUNNING)
+            )
+        return cursor.rowcount > 0
+
+    @contextmanager
+    def keep_alive(self, job_id: str, worker: str, interval: Optional[float] = None) -> Iterator[None]:
+        """Send heartbeats from a background thread while the block runs.
+
+        Progress events also count as heartbeats, but a single long stage
+        (research, model load, a slow first token) can outlast stale_after.
+        """
+        interval = interval if interval is not None else max(0.1, self.stale_after / 4)
+        stopped = threading.Event()
+
+        def beat() -> None:
+            while not stopped.wait(interval):
+                try:
+                    self.heartbeat(job_id, worker)
+                except Exception as e:
+                    logger.warning(f"Heartbeat for job {job_id} failed: {str(e)}")
+
+        thread = threading.Thread(target=beat, name=f"heartbeat-{job_id}", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stopped.set()
+            thread.join()
+
+    def complete(self, job_id: str, worker: str, content: str, metrics: Optional[Dict[str, Any]] = None) -> bool:
+        """Store the finished post; False if the job is no longer held by worker (it went stale)."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, partial = '', metrics = ?, stage = 'done', finished_at = ? "
+                "WHERE id = ? AND worker = ? AND status = ?",
+                (DONE, content, json.dumps(metrics) if metrics else None, time.time(), job_id, worker, RUNNING)
+            )
+        return cursor.rowcount > 0
+
+    def fail(self, job_id: str, worker: str, error: str) -> bool:
+        """Mark the job as failed; False if the job is no longer held by worker."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ? AND worker = ? AND status = ?",
+                (FAILED, error, time.time(), job_id, worker, RUNNING)
+            )
+        return cursor.rowcount > 0
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs per status."""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+
+def run_worker(queue_path: str, worker: str, poll_interval: float = 1.0, progress_interval: float = 0.5) -> None:
+    """Worker process loop: claim jobs and run them through BlogGenerator.stream_blog_post."""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    from agents import BlogGenerator
+
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+
+    queue = JobQueue(queue_path)
+    generators: Dict[Any, Any] = {}
+    logger.info(f"Worker {worker} started")
+
+    while not stopping.is_set():
+        job = queue.claim(worker)
+        if job is None:
+            stopping.wait(poll_interval)
+            continue
+
+        logger.info(f"Worker {worker} running job {job['id']}: {job['topic']}")
+        try:
+            with queue.keep_alive(job["id"], worker):
+                # Created per option set on first use, so a missing API key fails the job, not the worker
+                options = job["options"]
+                key = (options.get("use_generation_cache"), options.get("research_depth"), options.get("draft_mode"))
+                if key not in generators:
+                    generators[key] = BlogGenerator(
+                        use_generation_cache=key[0], research_depth=key[1], draft_mode=key[2]
+                    )
+                generator = generators[key]
+
+                parts: List[str] = []
+                last_flush = 0.0
+                done: Dict[str, Any] = {}
+                for event in generator.stream_blog_post(job["topic"]):
+                    if event["type"] == "stage":
+                        queue.update_progress(job["id"], stage=event["stage"])
+                    elif event["type"] == "token":
+                        parts.append(event["text"])
+                        if time.time() - last_flush >= progress_interval:
+                            queue.update_progress(job["id"], partial="".join(parts))
+                            last_flush = time.time()
+                    elif event["type"] == "done":
+                        done = event
+            metrics = done.get("metrics")
+            if not queue.complete(job["id"], worker, done.get("content", ""), metrics.to_dict() if metrics else None):
+                logger.warning(f"Job {job['id']} was handed to another worker, discarding this result")
+        except Exception as e:
+            logger.error(f"Job {job['id']} failed: {str(e)}")
+            queue.fail(job["id"], worker, str(e))
+
+    logger.info(f"Worker {worker} stopped")
+
+
+class WorkerPool:
+    """A set of worker processes draining one JobQueue."""
+
+    def __init__(self, workers: int = 2, queue_path: Optional[str] = None):
+        """Configure the pool; call start() to launch the processes."""
+        self.workers = max(1, workers)
+        self.queue_path = queue_path or default_queue_path()
+        self.processes: List[Any] = []
+
+    def start(self) -> "WorkerPool":
+        """Launch the worker processes."""
+        import multiprocessing
+
+        # Make sure the schema exists before workers race to create it
+        JobQueue(self.queue_path)
+        for index in range(self.workers):
+            name = f"{os.getpid()}-{index}"
+            process = multiprocessing.Process(
+                target=run_worker, args=(self.queue_path, name), name=f"blog-worker-{index}", daemon=True
+            )
+            process.start()
+            self.processes.append(process)
+        logger.info(f"Started {self.workers} blog workers on {self.queue_path}")
+        return self
+
+    def alive(self) -> int:
+        """Number of worker processes still running."""
+        return sum(1 for process in self.processes if process.is_alive())
+
+    def stop(self, timeout: float = 10) -> None:
+        """Ask workers to finish their current job and exit."""
+        for process in self.processes:
+            if process.is_alive():
+                process.terminate()
+        for process in self.processes:
+            process.join(timeout)
+        self.processes = []
+
+
+def main():
+    """Command-line entry point: run workers, submit jobs or inspect them."""
+    parser = argparse.ArgumentParser(description='Blog generation job queue')
+    parser.add_argument('--queue', default=None, help='Path to the job database')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    worker_parser = subparsers.add_parser('worker', help='Run worker processes until interrupted')
+    worker_parser.add_argument('--workers', '-w', type=int, default=2)
+
+    submit_parser = subparsers.add_parser('submit', help='Queue a topic')
+    submit_parser.add_argument('topic')
+    submit_parser.add_argument('--priority', type=int, default=0)
+    submit_parser.add_argument('--wait', action='store_true', help='Wait for the result and print it')
+
+    status_parser = subparsers.add_parser('status', help='Show a job, or recent jobs')
+    status_parser.add_argument('job_id', nargs='?')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.command == 'worker':
+        pool = WorkerPool(args.workers, args.queue).start()
+        try:
+            while pool.alive():
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            pool.stop()
+        return
+
+    queue = JobQueue(args.queue)
+    if args.command == 'submit':
+        job_id = queue.submit(args.topic, priority=args.priority)
+        print(job_id)
+        if args.wait:
+            job = queue.result(job_id)
+            if job["status"] == DONE:
+                print(job["result"])
+            else:
+                print(f"Error: {job.get('error')}")
+                sys.exit(1)
+    elif args.job_id:
+        job = queue.status(args.job_id)
+        if job is None:
+            print(f"Unknown job {args.job_id}")
+            sys.exit(1)
+        print(json.dumps({key: value for key, value in job.items() if key != 'partial'}, indent=2))
+    else:
+        for job in queue.list_jobs():
+            print(f"{job['id']}  {job['status']:<8} {job['stage'] or '':<9} {job['topic']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+import os
+import re
+import time
+import heapq
+import logging
+import itertools
+import threading
+from typing import Dict, List, Any, Optional, Callable, Awaitable, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Requests are served strictly in lane order: a waiting interactive search
+# (Streamlit, MCP) always goes before a waiting batch one
+LANES = ("interactive", "batch")
+# Pause used after a 429 that did not say how long to wait; doubles per retry
+DEFAULT_RETRY_AFTER = 2.0
+MAX_RETRY_AFTER = 60.0
+# How often an async waiter that is not first in line checks again
+POLL_INTERVAL = 0.05
+
+_RETRY_AFTER_TEXT = re.compile(r"retry[\s_-]*after\D{0,10}(\d+(?:\.\d+)?)", re.IGNORECASE)
+
+
+class ResearchUnavailable(RuntimeError):
+    """A LinkUp search that failed for good, after any retries the error allowed."""
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    """Whether error is LinkUp (or its HTTP layer) saying the quota was exceeded."""
+    if _status_code(error) == 429 or "TooManyRequests" in type(error).__name__:
+        return True
+    message = str(error).lower()
+    return "429" in message or "rate limit" in message or "too many requests" in message
+
+
+def is_transient(error: BaseException) -> bool:
+    """Whether retrying the same search later could succeed."""
+    if is_rate_limited(error):
+        return True
+    status = _status_code(error)
+    if status is not None:
+        return status >= 500
+    name = type(error).__name__
+    return isinstance(error, (TimeoutError, ConnectionError)) or "Timeout" in name or "Connect" in name
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Seconds the server asked us to wait, from a Retry-After header or the error message."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    value = headers.get("Retry-After") or headers.get("retry-after")
+    if value is None:
+        match = _RETRY_AFTER_TEXT.search(str(error))
+        value = match.group(1) if match else None
+    try:
+        return min(float(value), MAX_RETRY_AFTER) if value is not None else None
+    except ValueError:
+        return None
+
+
+class TokenBucket:
+    """rate tokens per second, holding at most burst; a search spends one."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available (0 if one is now)."""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+    def available(self, now: float) -> float:
+        self._refill(now)
+        return self.tokens
+
+
+class LinkupScheduler:
+    """Client-side rate limiting for LinkUp searches, shared by every generator in the process.
+
+    Searches wait in priority lanes for a token from one bucket, so bursts
+    are smoothed to the configured quota instead of being rejected. A 429
+    pauses every lane for the server's Retry-After (or an exponential
+    backoff) and the search is retried; other transient errors are retried
+    with backoff. A search that still fails raises ResearchUnavailable, so
+    callers can say why research is missing rather than quietly writing
+    without it.
+    """
+
+    def __init__(self, rate: float = 5.0, burst: float = 10.0, max_retries: int = 3):
+        self.bucket = TokenBucket(rate, burst)
+        self.max_retries = max_retries
+        self._condition = threading.Condition()
+        self._waiting: List[Tuple[int, int]] = []
+        self._sequence = itertools.count()
+        self._paused_until = 0.0
+        self._in_flight = 0
+        self._counters: Dict[str, int] = {"searches": 0, "retries": 0, "rate_limited": 0, "failures": 0}
+        self._lane_counts: Dict[str, int] = {lane: 0 for lane in LANES}
+        self._wait_sum: Dict[str, float] = {lane: 0.0 for lane in LANES}
+        self._wait_count: Dict[str, int] = {lane: 0 for lane in LANES}
+
+    @classmethod
+    def from_env(cls) -> "LinkupScheduler":
+        """Build from LINKUP_RATE (searches per second), LINKUP_BURST and LINKUP_MAX_RETRIES."""
+        return cls(
+            rate=float(os.getenv("LINKUP_RATE", "5")),
+            burst=float(os.getenv("LINKUP_BURST", "10")),
+            max_retries=int(os.getenv("LINKUP_MAX_RETRIES", "3"))
+        )
+
+    def _lane_rank(self, lane: str) -> int:
+        return LANES.index(lane) if lane in LANES else 0
+
+    def _enter(self, lane: str) -> Tuple[int, int]:
+        ticket = (self._lane_rank(lane), next(self._sequence))
+        with self._condition:
+            heapq.heappush(self._waiting, ticket)
+            self._lane_counts[LANES[ticket[0]]] += 1
+        return ticket
+
+    def _leave(self, ticket: Tuple[int, int]) -> None:
+        """Give up a place in line (the waiter timed out or was cancelled)."""
+        with self._condition:
+            if ticket in self._waiting:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._lane_counts[LANES[ticket[0]]] -= 1
+                self._condition.notify_all()
+
+    def _poll(self, ticket: Tuple[int, int], entered: float) -> Optional[float]:
+        """Take a token for ticket if it is first in line; otherwise the seconds to wait (None: until notified).
+
+        Called with the condition held.
+        """
+        if self._waiting[0] != ticket:
+            return None
+        now = time.monotonic()
+        wait = max(self._paused_until - now, self.bucket.wait_time(now))
+        if wait > 0:
+            return wait
+        self.bucket.take()
+        heapq.heappop(self._waiting)
+        lane = LANES[ticket[0]]
+        self._lane_counts[lane] -= 1
+        self._wait_sum[lane] += now - entered
+        self._wait_count[lane] += 1
+        self._in_flight += 1
+        self._condition.notify_all()
+        return 0.0
+
+    def acquire(self, lane: str = "interactive") -> None:
+        """Wait for this lane's turn and a token."""
+        entered = time.monotonic()
+        ticket = self._enter(lane)
+        try:
+            with self._condition:
+                while True:
+                    wait = self._poll(ticket, entered)
+                    if wait == 0:
+                        return
+                    self._condition.wait(wait)
+        except BaseException:
+            self._leave(ticket)
+            raise
+
+    async def acquire_async(self, lane: str = "interactive") -> None:
+        """acquire without blocking the event loop."""
+        import asyncio
+
+        entered = time.monotonic()
+        ticket = self._enter(lane)
+        try:
+            while True:
+                with self._condition:
+                    wait = self._poll(ticket, entered)
+                if wait == 0:
+                    return
+                await asyncio.sleep(POLL_INTERVAL if wait is None else min(wait, MAX_RETRY_AFTER))
+        except BaseException:
+            self._leave(ticket)
+            raise
+
+    def _finished(self, error: Optional[BaseException], attempt: int) -> Optional[float]:
+        """Record the outcome of one attempt; the delay before retrying, or None to stop."""
+        with self._condition:
+            self._in_flight -= 1
+            self._counters["searches"] += 1
+            if error is None:
+                return None
+            if not is_transient(error) or attempt >= self.max_retries:
+                self._counters["failures"] += 1
+                return None
+            self._counters["retries"] += 1
+            delay = min(DEFAULT_RETRY_AFTER * 2 ** attempt, MAX_RETRY_AFTER)
+            if is_rate_limited(error):
+                self._counters["rate_limited"] += 1
+                delay = retry_after(error) or delay
+                # Everyone waits out a rate limit, not just the search that hit it
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                self._condition.notify_all()
+                return 0.0
+            return delay
+
+    def call(self, fn: Callable[[], Any], lane: str = "interactive", name: str = "search") -> Any:
+        """Run one LinkUp call under the quota, retrying transient failures."""
+        attempt = 0
+        while True:
+            self.acquire(lane)
+            try:
+                result = fn()
+            except Exception as e:
+                delay = self._finished(e, attempt)
+                if delay is None:
+                    raise ResearchUnavailable(f"LinkUp {name} failed: {str(e)}") from e
+                logger.warning(f"LinkUp {name} failed ({str(e)}), retry {attempt + 1} of {self.max_retries}")
+                attempt += 1
+                time.sleep(delay)
+                continue
+            self._finished(None, attempt)
+            return result
+
+    async def call_async(
+        self,
+        fn: Callable[[], Awaitable[Any]],
+        lane: str = "interactive",
+        name: str = "search"
+    ) -> Any:
+        """call for coroutine functions."""
+        import asyncio
+
+        attempt = 0
+        while True:
+            await self.acquire_async(lane)
+            try:
+                result = await fn()
+            except asyncio.CancelledError:
+                self._finished(None, attempt)
+                raise
+            except Exception as e:
+                delay = self._finished(e, attempt)
+                if delay is None:
+                    raise ResearchUnavailable(f"LinkUp {name} failed: {str(e)}") from e
+                logger.warning(f"LinkUp {name} failed ({str(e)}), retry {attempt + 1} of {self.max_retries}")
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            self._finished(None, attempt)
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth per lane, searches in flight, counters and mean queue wait per lane."""
+        with self._condition:
+            now = time.monotonic()
+            return {
+                "queued": dict(self._lane_counts),
+                "in_flight": self._in_flight,
+                "tokens": round(self.bucket.available(now), 2),
+                "paused_for": round(max(0.0, self._paused_until - now), 2),
+                "mean_wait": {
+                    lane: round(self._wait_sum[lane] / self._wait_count[lane], 4) if self._wait_count[lane] else 0.0
+                    for lane in LANES
+                },
+                **self._counters,
+            }
+
+    def render_prometheus(self) -> str:
+        """The scheduler's queue depths and counters in the Prometheus text exposition format."""
+        with self._condition:
+            lines = [
+                "# HELP linkup_queue_depth LinkUp searches waiting for quota, by lane.",
+                "# TYPE linkup_queue_depth gauge",
+            ]
+            lines += [f'linkup_queue_depth{{lane="{lane}"}} {self._lane_counts[lane]}' for lane in LANES]
+            lines += [
+                "# HELP linkup_in_flight LinkUp searches currently running.",
+                "# TYPE linkup_in_flight gauge",
+                f"linkup_in_flight {self._in_flight}",
+                "# HELP linkup_queue_wait_seconds Time searches waited for quota, by lane.",
+                "# TYPE linkup_queue_wait_seconds summary",
+            ]
+            for lane in LANES:
+                lines.append(f'linkup_queue_wait_seconds_sum{{lane="{lane}"}} {self._wait_sum[lane]:.6f}')
+                lines.append(f'linkup_queue_wait_seconds_count{{lane="{lane}"}} {self._wait_count[lane]}')
+            lines.append("# HELP linkup_events_total LinkUp searches, retries, rate limits and failures.")
+            lines.append("# TYPE linkup_events_total counter")
+            for event in sorted(self._counters):
+                lines.append(f'linkup_events_total{{event="{event}"}} {self._counters[event]}')
+        return "\n".join(lines) + "\n"
+
+
+_scheduler: Optional[LinkupScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_linkup_scheduler() -> LinkupScheduler:
+    """The process-wide scheduler, configured from the environment on first use."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LinkupScheduler.from_env()
+        return _scheduler
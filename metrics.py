@@ -0,0 +1,217 @@
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Any, Optional, Iterator
+
+logger = logging.getLogger(__name__)
+
+STAGES = ["model_discovery", "research", "outline", "time_to_first_token", "generation", "total"]
+FLAGS = (
+    "research_cached", "research_fallback", "research_shared",
+    "generation_cached", "generation_fallback", "generation_shared",
+    "research_timed_out", "generation_timed_out",
+)
+
+
+class PipelineMetrics:
+    """Per-post timings and counters for one run through the pipeline."""
+
+    def __init__(self, query: str, model: str = ""):
+        """Start timing a post for query."""
+        self.query = query
+        self.model = model
+        self.started_at = time.time()
+        self.stages: Dict[str, float] = {}
+        self.tokens = 0
+        self._first_token_at: Optional[float] = None
+        self._last_token_at: Optional[float] = None
+        self.eval_tokens: Optional[int] = None
+        self.eval_seconds: Optional[float] = None
+        self.prompt_tokens: Optional[int] = None
+        self.load_seconds: Optional[float] = None
+        self.research_cached = False
+        self.research_fallback = False
+        self.generation_cached = False
+        self.generation_fallback = False
+        # Set when the work was joined from an identical in-flight request
+        self.research_shared = False
+        self.generation_shared = False
+        # Set when a stage ran out of its share of the post's deadline
+        self.research_timed_out = False
+        self.generation_timed_out = False
+        # Sections drafted concurrently in outline-then-expand mode (0 for a single pass)
+        self.sections = 0
+        # Drafts generated concurrently for one research pass (0 for a single post)
+        self.variants = 0
+        # Why research was unavailable when the post was written without it
+        self.research_error: Optional[str] = None
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time a block of work as the named stage."""
+        start_time = time.time()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.time() - start_time
+
+    def count_token(self) -> None:
+        """Count a streamed fragment, recording time to first token from the start of the post."""
+        now = time.time()
+        if self._first_token_at is None:
+            self._first_token_at = now
+            self.stages["time_to_first_token"] = now - self.started_at
+        self._last_token_at = now
+        self.tokens += 1
+
+    def record_ollama_stats(self, stats: Dict[str, Any]) -> None:
+        """Copy token counts and durations from Ollama's final stream message."""
+        if "eval_count" in stats:
+            self.eval_tokens = stats["eval_count"]
+        if stats.get("eval_duration"):
+            self.eval_seconds = stats["eval_duration"] / 1e9
+        if "prompt_eval_count" in stats:
+            self.prompt_tokens = stats["prompt_eval_count"]
+        if stats.get("load_duration"):
+            self.load_seconds = stats["load_duration"] / 1e9
+
+    def record_parallel_stats(self, stats_list: List[Dict[str, Any]]) -> None:
+        """Combine the final stats of concurrently generated parts.
+
+        Counts and eval time are summed, so tokens_per_second stays the
+        per-stream decode speed; load time is the longest single load.
+        """
+        totals: Dict[str, Any] = {}
+        for stats in stats_list:
+            for key in ("eval_count", "eval_duration", "prompt_eval_count"):
+                if key in stats:
+                    totals[key] = totals.get(key, 0) + stats[key]
+            if stats.get("load_duration"):
+                totals["load_duration"] = max(totals.get("load_duration", 0), stats["load_duration"])
+        self.record_ollama_stats(totals)
+
+    @property
+    def tokens_per_second(self) -> float:
+        """Decode speed, preferring Ollama's own eval timings when available."""
+        if self.eval_tokens and self.eval_seconds:
+            return self.eval_tokens / self.eval_seconds
+        if self.tokens > 1 and self._last_token_at > self._first_token_at:
+            return (self.tokens - 1) / (self._last_token_at - self._first_token_at)
+        return 0.0
+
+    def finish(self) -> "PipelineMetrics":
+        """Close the total stage and record the run in the process-wide registry."""
+        self.stages["total"] = time.time() - self.started_at
+        REGISTRY.observe(self)
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return a JSON-serializable snapshot."""
+        return {
+            "timestamp": self.started_at,
+            "query": self.query,
+            "model": self.model,
+            "stages": {name: round(seconds, 4) for name, seconds in self.stages.items()},
+            "tokens": self.eval_tokens if self.eval_tokens is not None else self.tokens,
+            "prompt_tokens": self.prompt_tokens,
+            "tokens_per_second": round(self.tokens_per_second, 2),
+            "load_seconds": self.load_seconds,
+            "research_cached": self.research_cached,
+            "research_fallback": self.research_fallback,
+            "generation_cached": self.generation_cached,
+            "generation_fallback": self.generation_fallback,
+            "research_shared": self.research_shared,
+            "generation_shared": self.generation_shared,
+            "research_timed_out": self.research_timed_out,
+            "generation_timed_out": self.generation_timed_out,
+            "sections": self.sections,
+            "variants": self.variants,
+            "research_error": self.research_error,
+        }
+
+    def format_table(self) -> str:
+        """Render a short human-readable profile."""
+        lines = ["Stage                   Seconds"]
+        for name in STAGES:
+            if name in self.stages:
+                lines.append(f"{name:<22} {self.stages[name]:>8.2f}")
+        lines.append(f"{'tokens':<22} {self.to_dict()['tokens']:>8}")
+        lines.append(f"{'tokens/sec':<22} {self.tokens_per_second:>8.2f}")
+        flags = [name for name in FLAGS if getattr(self, name)]
+        if flags:
+            lines.append(f"flags: {', '.join(flags)}")
+        if self.research_error:
+            lines.append(f"research error: {self.research_error}")
+        return "\n".join(lines)
+
+
+class MetricsRegistry:
+    """Process-wide aggregates with Prometheus text exposition and a JSONL sink."""
+
+    def __init__(self, jsonl_path: Optional[str] = None):
+        """Create an empty registry, optionally appending every run to jsonl_path."""
+        self.jsonl_path = jsonl_path
+        self._lock = threading.Lock()
+        self._posts = 0
+        self._tokens = 0
+        self._stage_sum: Dict[str, float] = {}
+        self._stage_count: Dict[str, int] = {}
+        self._flags: Dict[str, int] = {}
+
+    def observe(self, metrics: PipelineMetrics) -> None:
+        """Fold one finished run into the aggregates."""
+        snapshot = metrics.to_dict()
+        with self._lock:
+            self._posts += 1
+            self._tokens += snapshot["tokens"] or 0
+            for name, seconds in metrics.stages.items():
+                # Model discovery is recorded once via observe_stage, not per post
+                if name == "model_discovery":
+                    continue
+                self._stage_sum[name] = self._stage_sum.get(name, 0.0) + seconds
+                self._stage_count[name] = self._stage_count.get(name, 0) + 1
+            for flag in FLAGS:
+                if snapshot[flag]:
+                    self._flags[flag] = self._flags.get(flag, 0) + 1
+            path = self.jsonl_path
+
+        if path:
+            try:
+                with open(path, "a") as f:
+                    f.write(json.dumps(snapshot) + "\n")
+            except OSError as e:
+                logger.warning(f"Could not write metrics to {path}: {str(e)}")
+
+    def observe_stage(self, name: str, seconds: float) -> None:
+        """Record a stage that happens outside a single post, such as model discovery."""
+        with self._lock:
+            self._stage_sum[name] = self._stage_sum.get(name, 0.0) + seconds
+            self._stage_count[name] = self._stage_count.get(name, 0) + 1
+
+    def render_prometheus(self) -> str:
+        """Render the aggregates in the Prometheus text exposition format."""
+        with self._lock:
+            lines = [
+                "# HELP blog_posts_total Blog posts produced by the pipeline.",
+                "# TYPE blog_posts_total counter",
+                f"blog_posts_total {self._posts}",
+                "# HELP blog_tokens_total Tokens generated by the LLM.",
+                "# TYPE blog_tokens_total counter",
+                f"blog_tokens_total {self._tokens}",
+                "# HELP blog_stage_seconds Time spent per pipeline stage.",
+                "# TYPE blog_stage_seconds summary",
+            ]
+            for name in sorted(self._stage_sum):
+                lines.append(f'blog_stage_seconds_sum{{stage="{name}"}} {self._stage_sum[name]:.6f}')
+                lines.append(f'blog_stage_seconds_count{{stage="{name}"}} {self._stage_count[name]}')
+            lines.append("# HELP blog_events_total Cache hits, shared in-flight work, fallbacks and timeouts by kind.")
+            lines.append("# TYPE blog_events_total counter")
+            for flag in sorted(self._flags):
+                lines.append(f'blog_events_total{{event="{flag}"}} {self._flags[flag]}')
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry(jsonl_path=os.getenv("METRICS_JSONL") or None)
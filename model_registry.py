@@ -0,0 +1,140 @@
+import os
+import time
+import logging
+import threading
+from typing import Dict, List, Any, Optional, Tuple
+
+from transport import Transport
+
+logger = logging.getLogger(__name__)
+
+
+def parse_model_names(tags: Dict[str, Any]) -> List[str]:
+    """Extract model names from an /api/tags response body."""
+    available_models = tags.get("models", [])
+    return [model.get('name') for model in available_models if 'name' in model]
+
+
+class _Entry:
+    """Last known /api/tags result for one Ollama host."""
+
+    def __init__(self, running: bool, models: List[str]):
+        self.running = running
+        self.models = models
+        self.fetched_at = time.time()
+
+
+class ModelRegistry:
+    """Process-wide, lazily populated cache of installed Ollama models per host.
+
+    The first lookup for a host probes /api/tags synchronously. After that the
+    cached list is served immediately; once it is older than ttl, a background
+    thread refreshes it (stale-while-revalidate), so callers never wait on a
+    probe that has already succeeded once.
+    """
+
+    def __init__(self, ttl: float = 300, failure_ttl: float = 10):
+        """Create an empty registry; failed probes are retried after failure_ttl."""
+        self.ttl = ttl
+        self.failure_ttl = failure_ttl
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+        self._host_locks: Dict[str, threading.Lock] = {}
+        self._refreshing: Dict[str, bool] = {}
+
+    def _host_lock(self, base_url: str) -> threading.Lock:
+        with self._lock:
+            return self._host_locks.setdefault(base_url, threading.Lock())
+
+    def _is_stale(self, entry: _Entry) -> bool:
+        ttl = self.ttl if entry.running else self.failure_ttl
+        return time.time() - entry.fetched_at > ttl
+
+    def probe(self, base_url: str, transport: Transport) -> Tuple[bool, List[str]]:
+        """Hit /api/tags now and store the result."""
+        try:
+            response = transport.get(f"{base_url}/api/tags", read_timeout=10)
+            if response.status_code == 200:
+                models = parse_model_names(response.json())
+                logger.info(f"Available models at {base_url}: {models}")
+                self.store(base_url, True, models)
+                return True, models
+            logger.error(f"Ollama returned status code {response.status_code}")
+        except Exception as e:
+            logger.warning(f"Could not check available models: {str(e)}")
+        self.store(base_url, False, [])
+        return False, []
+
+    def store(self, base_url: str, running: bool, models: List[str]) -> None:
+        """Record a probe result, e.g. one made by the async generator."""
+        with self._lock:
+            self._entries[base_url] = _Entry(running, models)
+
+    def peek(self, base_url: str) -> Optional[Tuple[bool, List[str], bool]]:
+        """Return (running, models, stale) without probing, or None if never probed."""
+        with self._lock:
+            entry = self._entries.get(base_url)
+        if entry is None:
+            return None
+        return entry.running, list(entry.models), self._is_stale(entry)
+
+    def status(self, base_url: str, transport: Transport) -> Tuple[bool, List[str]]:
+        """Return (running, models), probing only on first use or after a failure expired."""
+        cached = self.peek(base_url)
+        if cached is not None:
+            running, models, stale = cached
+            if not stale:
+                return running, models
+            if running:
+                # Serve the last good list and refresh behind the caller's back
+                self.refresh_in_background(base_url, transport)
+                return running, models
+
+        with self._host_lock(base_url):
+            # Another thread may have probed while we waited
+            cached = self.peek(base_url)
+            if cached is not None and not cached[2]:
+                return cached[0], cached[1]
+            return self.probe(base_url, transport)
+
+    def get_models(self, base_url: str, transport: Transport) -> List[str]:
+        """Return the installed models for base_url (empty if Ollama is unreachable)."""
+        return self.status(base_url, transport)[1]
+
+    def refresh_in_background(self, base_url: str, transport: Transport) -> None:
+        """Start at most one background refresh per host."""
+        with self._lock:
+            if self._refreshing.get(base_url):
+                return
+            self._refreshing[base_url] = True
+
+        def refresh():
+            try:
+                with self._host_lock(base_url):
+                    self.probe(base_url, transport)
+            finally:
+                with self._lock:
+                    self._refreshing[base_url] = False
+
+        threading.Thread(target=refresh, name="model-registry-refresh", daemon=True).start()
+
+    def invalidate(self, base_url: Optional[str] = None) -> None:
+        """Forget cached results for one host, or all hosts."""
+        with self._lock:
+            if base_url is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(base_url, None)
+
+
+_registry: Optional[ModelRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    """Return the process-wide model registry shared by CLI, Streamlit and MCP."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ModelRegistry(ttl=float(os.getenv("MODEL_REGISTRY_TTL", "300")))
+        return _registry
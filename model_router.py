@@ -0,0 +1,202 @@
+import os
+import re
+import logging
+import threading
+from typing import Dict, List, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Model families tried, in order, when the configured model is not installed
+PREFERRED_FAMILIES = ["llama3", "llama2", "mistral", "gemma"]
+# Assumed for an 8B model until a model has been observed; scaled by parameter count
+DEFAULT_SIZE_B = 8.0
+PRIOR_TOKENS_PER_SECOND = 25.0
+PRIOR_TTFT = 1.5
+
+_SIZE_TAG = re.compile(r"(\d+(?:\.\d+)?)\s*b\b", re.IGNORECASE)
+
+
+def model_family(name: str) -> str:
+    """The model's family: llama3 for llama3:8b-instruct, llama3.1:latest or llama3."""
+    return re.split(r"[:.]", name, maxsplit=1)[0].lower()
+
+
+def model_size(name: str) -> float:
+    """Parameter count in billions from the model's tag ("llama3:70b" is 70), or DEFAULT_SIZE_B."""
+    tag = name.partition(":")[2] or name
+    match = _SIZE_TAG.search(tag)
+    return float(match.group(1)) if match else DEFAULT_SIZE_B
+
+
+def preferred_model(installed: List[str]) -> Optional[str]:
+    """The model to fall back on when the configured one is not installed."""
+    generative = [name for name in installed if is_generative(name)]
+    for family in PREFERRED_FAMILIES:
+        for name in generative:
+            if model_family(name) == family:
+                return name
+    return generative[0] if generative else None
+
+
+def is_generative(name: str) -> bool:
+    """Leave out embedding models, which cannot write posts."""
+    return "embed" not in name.lower()
+
+
+def candidate_models(default_model: str, installed: List[str]) -> List[str]:
+    """Models the router may choose from, largest first.
+
+    Routing is opt-in: the candidates are the installed models listed in
+    LLM_MODELS (comma-separated). Without it the default model (LLM_MODEL) is
+    the only candidate, so an explicitly configured model is never overridden.
+    """
+    configured = [name.strip() for name in os.getenv("LLM_MODELS", "").split(",") if name.strip()]
+    candidates = [name for name in configured if is_generative(name) and (not installed or name in installed)]
+    unique = list(dict.fromkeys(candidates)) or [default_model]
+    return sorted(unique, key=model_size, reverse=True)
+
+
+class _Speed:
+    """Moving averages of one model's decode speed and time to first token (on one host, or all)."""
+
+    def __init__(self):
+        self.tokens_per_second: Optional[float] = None
+        self.ttft: Optional[float] = None
+        self.samples = 0
+
+    def observe(self, alpha: float, tokens_per_second: Optional[float], ttft: Optional[float]) -> None:
+        if tokens_per_second:
+            previous = self.tokens_per_second
+            self.tokens_per_second = tokens_per_second if previous is None else previous + alpha * (
+                tokens_per_second - previous
+            )
+        if ttft is not None:
+            self.ttft = ttft if self.ttft is None else self.ttft + alpha * (ttft - self.ttft)
+        self.samples += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "tokens_per_second": round(self.tokens_per_second, 2) if self.tokens_per_second else None,
+            "ttft": round(self.ttft, 3) if self.ttft is not None else None,
+            "samples": self.samples,
+        }
+
+
+class ModelRouter:
+    """Picks the model for each post from observed speed, the time it has and the backend queue.
+
+    Decode speed and time to first token are tracked per model and per host.
+    A request takes the largest candidate predicted to finish within its
+    latency budget, counting the wait for a backend slot when the queue is
+    deep; if none fits, the fastest. Interactive requests also step down a
+    size when requests are already queueing, while batch requests keep the
+    largest model that fits their (usually generous) budget.
+    """
+
+    def __init__(self, alpha: float = 0.3):
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self._models: Dict[str, _Speed] = {}
+        self._hosts: Dict[Tuple[str, str], _Speed] = {}
+
+    def observe(
+        self,
+        model: str,
+        host: str,
+        tokens_per_second: Optional[float] = None,
+        ttft: Optional[float] = None
+    ) -> None:
+        """Record one finished generation of model on host."""
+        with self._lock:
+            self._models.setdefault(model, _Speed()).observe(self.alpha, tokens_per_second, ttft)
+            self._hosts.setdefault((model, host), _Speed()).observe(self.alpha, tokens_per_second, ttft)
+
+    def observe_stats(self, model: str, host: str, stats: Dict[str, Any], ttft: Optional[float] = None) -> None:
+        """Record a generation from Ollama's final stream message and the measured time to first token."""
+        tokens_per_second = None
+        if stats.get("eval_count") and stats.get("eval_duration"):
+            tokens_per_second = stats["eval_count"] / (stats["eval_duration"] / 1e9)
+        if tokens_per_second or ttft is not None:
+            self.observe(model, host, tokens_per_second, ttft)
+
+    def _speed(self, model: str, hosts: Optional[List[str]] = None) -> Tuple[float, float]:
+        """(tokens/sec, ttft) for model on its fastest observed host, else across hosts, else from its size."""
+        scale = model_size(model) / DEFAULT_SIZE_B
+        prior_speed, prior_ttft = PRIOR_TOKENS_PER_SECOND / scale, PRIOR_TTFT * scale
+        with self._lock:
+            observed = [self._hosts[(model, host)] for host in hosts or [] if (model, host) in self._hosts]
+            if not observed and model in self._models:
+                observed = [self._models[model]]
+            estimates = [
+                (speed.tokens_per_second or prior_speed, prior_ttft if speed.ttft is None else speed.ttft)
+                for speed in observed
+            ]
+        if not estimates:
+            return prior_speed, prior_ttft
+        return max(estimates, key=lambda estimate: estimate[0])
+
+    def predict(self, model: str, tokens: int, hosts: Optional[List[str]] = None) -> float:
+        """Seconds for model to produce tokens, once it has a backend slot."""
+        tokens_per_second, ttft = self._speed(model, hosts)
+        return ttft + tokens / tokens_per_second
+
+    def choose(
+        self,
+        candidates: List[str],
+        tokens: int,
+        budget: Optional[float] = None,
+        load: Optional[Dict[str, Any]] = None,
+        lane: str = "interactive"
+    ) -> Tuple[str, str]:
+        """(model, reason) for a request of tokens that should finish within budget seconds.
+
+        candidates are ordered largest first; load is BackendPool.load().
+        """
+        if len(candidates) < 2:
+            return candidates[0], "only candidate"
+        load = load or {}
+        hosts = load.get("hosts")
+        capacity = max(1, load.get("capacity", 1))
+        # Requests ahead of this one that have no slot yet, counting itself
+        queued = max(0, load.get("outstanding", 0) + load.get("waiting", 0) - capacity + 1)
+        predictions = {}
+        for model in candidates:
+            service = self.predict(model, tokens, hosts)
+            predictions[model] = service + service * queued / capacity
+
+        eligible = candidates
+        if lane != "batch" and load.get("waiting", 0) >= capacity:
+            # A deep queue: interactive requests give up the largest model
+            eligible = candidates[1:]
+        for model in eligible:
+            if budget is None or predictions[model] <= budget:
+                reason = "no deadline" if budget is None else f"{predictions[model]:.1f}s predicted of {budget:.1f}s"
+                if eligible is not candidates:
+                    reason += f", {load.get('waiting', 0)} queued"
+                return model, reason
+        fastest = min(candidates, key=lambda model: predictions[model])
+        return fastest, f"none fits {budget:.1f}s, fastest predicted {predictions[fastest]:.1f}s"
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Observed speeds per model and per model and host."""
+        with self._lock:
+            return {
+                "models": {model: speed.to_dict() for model, speed in self._models.items()},
+                "hosts": {f"{model}@{host}": speed.to_dict() for (model, host), speed in self._hosts.items()},
+            }
+
+
+# Process-wide so every generator learns from every generation
+MODEL_ROUTER = ModelRouter()
+
+
+def routing_enabled() -> bool:
+    """Whether each post's model is chosen by the router among LLM_MODELS (LLM_ROUTING, on by default)."""
+    return os.getenv("LLM_ROUTING", "1").lower() not in ("0", "false", "no", "off")
+
+
+def latency_target(lane: str) -> Optional[float]:
+    """Latency target in seconds for a lane (LLM_LATENCY_TARGET, LLM_BATCH_LATENCY_TARGET; unset or 0 for none)."""
+    name = "LLM_BATCH_LATENCY_TARGET" if lane == "batch" else "LLM_LATENCY_TARGET"
+    seconds = float(os.getenv(name, "0"))
+    return seconds if seconds > 0 else None
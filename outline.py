@@ -0,0 +1,136 @@
+import os
+import re
+import logging
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MIN_SECTIONS = 2
+MAX_SECTIONS = 3
+# Enough for a title and three short headings
+OUTLINE_TOKENS = 80
+# Headroom over a part's share of the post's tokens, so parts are not cut mid-sentence
+PART_TOKEN_HEADROOM = 40
+# Keeps a part from running on into the next section or a new post
+PART_STOP = ["# END", "\n## ", "\n# "]
+
+_TITLE_LINE = re.compile(r"^\s*(?:#+\s*)?\**title\**\s*[:\-]\s*(.+)$", re.IGNORECASE)
+_HEADING_LINE = re.compile(r"^\s*(?:\d+\s*[.)]|[-*]|#{2,})\s*(.+)$")
+
+
+class Outline:
+    """A post's title and the section headings it will be drafted under."""
+
+    def __init__(self, title: str, headings: List[str]):
+        self.title = title
+        self.headings = headings
+
+    def numbered(self) -> str:
+        return "\n".join(f"{index}. {heading}" for index, heading in enumerate(self.headings, 1))
+
+
+def section_count() -> int:
+    """Sections per outline (BLOG_SECTIONS, clamped to 2-3)."""
+    return max(MIN_SECTIONS, min(int(os.getenv("BLOG_SECTIONS", str(MAX_SECTIONS))), MAX_SECTIONS))
+
+
+def part_tokens(words: int, target_words: int, post_tokens: int) -> int:
+    """num_predict for a part: its share of the single-pass post's num_predict."""
+    return int(post_tokens * words / max(target_words, 1)) + PART_TOKEN_HEADROOM
+
+
+def word_split(target_words: int, sections: int) -> Dict[str, int]:
+    """Share the post's target length between the intro and each section."""
+    intro = max(60, target_words // (sections + 1) // 2)
+    return {"intro": intro, "section": max(80, (target_words - intro) // sections)}
+
+
+def _research_part(notes: str) -> str:
+    return f"\n\nResearch:\n{notes}" if notes else ""
+
+
+def outline_prompt(query: str, notes: str, sections: int) -> str:
+    """Ask for a title and section headings in a fixed, parseable format."""
+    numbered = "\n".join(f"{index}. <section heading>" for index in range(1, sections + 1))
+    return (
+        f"Plan a conversational blog post about {query}.\n"
+        f"Reply in exactly this format and nothing else:\n"
+        f"Title: <catchy title>\n{numbered}"
+        f"{_research_part(notes)}"
+    )
+
+
+def parse_outline(text: str, query: str, sections: int) -> Optional[Outline]:
+    """Read the title and headings from an outline reply; None if fewer than MIN_SECTIONS came back."""
+    title = ""
+    bare_title = ""
+    headings: List[str] = []
+    for line in text.splitlines():
+        match = _TITLE_LINE.match(line)
+        if match and not title:
+            title = match.group(1)
+            continue
+        match = _HEADING_LINE.match(line)
+        if match:
+            headings.append(match.group(1))
+        elif line.strip() and not headings and not bare_title and not line.rstrip().endswith(":"):
+            # Without a "Title:" line, a bare line before the headings is the title
+            bare_title = line.lstrip("# ")
+    headings = [_clean(heading) for heading in headings]
+    headings = [heading for heading in headings if heading][:sections]
+    if len(headings) < MIN_SECTIONS:
+        return None
+    return Outline(_clean(title or bare_title) or query, headings)
+
+
+def _clean(text: str) -> str:
+    return text.strip().strip("*_\"'`").strip()
+
+
+def intro_prompt(query: str, outline: Outline, notes: str, words: int) -> str:
+    return (
+        f'Write only the opening of the blog post "{outline.title}" about {query}: '
+        f"about {words} words that hook the reader and preview what is coming:\n{outline.numbered()}\n"
+        f"Do not add a title or headings and do not sign off."
+        f"{_research_part(notes)}"
+    )
+
+
+def section_prompt(query: str, outline: Outline, index: int, notes: str, words: int) -> str:
+    """Prompt for the body of section index (0-based) of the outline."""
+    heading = outline.headings[index]
+    last = index == len(outline.headings) - 1
+    closing = " Finish with a one-line takeaway." if last else ""
+    return (
+        f'You are writing one section of the blog post "{outline.title}" about {query}.\n'
+        f"Outline:\n{outline.numbered()}\n"
+        f'Write only the body of section {index + 1}, "{heading}", in about {words} words.{closing}\n'
+        f"Do not repeat the heading, add a title or introduction, or sign off."
+        f"{_research_part(notes)}"
+    )
+
+
+class HeadingFilter:
+    """Strips leading whitespace and a heading line the model added anyway from a streamed part.
+
+    Feed fragments in order; each call returns the text to pass on (possibly empty).
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._passing = False
+
+    def feed(self, fragment: str) -> str:
+        if self._passing:
+            return fragment
+        self._buffer = (self._buffer + fragment).lstrip()
+        while self._buffer.startswith("#"):
+            if "\n" not in self._buffer:
+                return ""
+            # Drop the heading line and keep skipping whitespace after it
+            self._buffer = self._buffer.split("\n", 1)[1].lstrip()
+        if not self._buffer:
+            return ""
+        self._passing = True
+        text, self._buffer = self._buffer, ""
+        return text
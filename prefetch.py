@@ -0,0 +1,401 @@
+import os
+import re
+import csv
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+from datetime import datetime
+from typing import Dict, List, Any, Optional, TextIO, Tuple
+
+from deadline import Deadline
+
+logger = logging.getLogger(__name__)
+
+# A calendar entry with a time opens a window this long; a date alone covers the whole day
+DEFAULT_WINDOW = 3600.0
+# Models are loaded this long before a window opens
+DEFAULT_LEAD = 900.0
+# Local hours ("start-end", may wrap past midnight) when research is fetched in bulk
+DEFAULT_OFF_PEAK = "1-6"
+# How far ahead research is fetched at most; the research cache TTL caps it further
+DEFAULT_HORIZON = 2 * 86400.0
+# Longest pause between passes of the background scheduler
+POLL_INTERVAL = 300.0
+
+_TEXT_LINE = re.compile(r"^(\d{4}-\d{2}-\d{2}(?:[ T]\d{2}:\d{2}(?::\d{2})?)?)\s+(.+)$")
+_NANOSECONDS = re.compile(r"(\.\d{6})\d+")
+
+
+def parse_when(value: str) -> Tuple[float, bool]:
+    """Epoch seconds for an ISO date or date and time (local unless it has an offset), and whether it had a time."""
+    value = value.strip()
+    return datetime.fromisoformat(value).timestamp(), len(value) > 10
+
+
+def parse_hours(spec: str) -> Optional[Tuple[int, int]]:
+    """(start, end) hours from "1-6"; None for an empty spec, meaning any time."""
+    if not spec.strip():
+        return None
+    start, _, end = spec.partition("-")
+    return int(start) % 24, int(end or start) % 24
+
+
+def in_hours(spec: str, moment: datetime) -> bool:
+    """Whether moment falls within the hours spec (end exclusive; "22-6" wraps past midnight)."""
+    hours = parse_hours(spec)
+    if hours is None:
+        return True
+    start, end = hours
+    if start <= end:
+        return start <= moment.hour < end
+    return moment.hour >= start or moment.hour < end
+
+
+def _parse_expiry(value: Optional[str]) -> Optional[float]:
+    """Epoch seconds from Ollama's expires_at, which may carry nanoseconds."""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(_NANOSECONDS.sub(r"\1", value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def _parse_calendar(stream: TextIO, fmt: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Parse calendar entries from JSONL, CSV or text lines of "2025-06-02 09:00 topic"."""
+    lines = [line for line in stream.read().splitlines() if line.strip() and not line.lstrip().startswith("#")]
+    if not lines:
+        return []
+
+    if fmt is None:
+        if lines[0].lstrip().startswith("{"):
+            fmt = "jsonl"
+        elif "," in lines[0] and lines[0].split(",")[0].strip().lower() in ("topic", "query", "id", "date", "at"):
+            fmt = "csv"
+        else:
+            fmt = "txt"
+
+    items = []
+    if fmt == "jsonl":
+        items = [json.loads(line) for line in lines]
+    elif fmt == "csv":
+        for row in csv.DictReader(lines):
+            items.append({key.strip().lower(): (value or "").strip() for key, value in row.items() if key})
+    else:
+        for line in lines:
+            match = _TEXT_LINE.match(line.strip())
+            items.append({"at": match.group(1), "topic": match.group(2)} if match else {"topic": line.strip()})
+
+    entries = []
+    for index, item in enumerate(items):
+        topic = item.get("topic") or item.get("query")
+        when = item.get("at") or item.get("date")
+        if when and item.get("time"):
+            when = f"{when} {item['time']}"
+        if not topic or not when:
+            logger.warning(f"Skipping calendar entry {index + 1}: it needs a topic and a date")
+            continue
+        try:
+            start, timed = parse_when(str(when))
+        except ValueError:
+            logger.warning(f"Skipping calendar entry {index + 1}: unrecognised date {when!r}")
+            continue
+        window = float(item["window"]) * 60 if item.get("window") else DEFAULT_WINDOW if timed else 86400.0
+        entries.append({
+            "id": str(item.get("id") or index + 1),
+            "topic": topic,
+            "start": start,
+            "end": start + window,
+            "model": item.get("model") or None,
+            "depth": item.get("depth") or None,
+        })
+    return sorted(entries, key=lambda entry: entry["start"])
+
+
+def load_calendar(path: str) -> List[Dict[str, Any]]:
+    """Load a content calendar (topic and date per entry, optionally time, window minutes, model and depth)."""
+    ext = os.path.splitext(path)[1].lower()
+    fmt = {".jsonl": "jsonl", ".ndjson": "jsonl", ".csv": "csv"}.get(ext)
+    with open(path, "r", newline="") as f:
+        return _parse_calendar(f, fmt)
+
+
+class CalendarPrefetcher:
+    """Warms research and models ahead of the posts on a content calendar.
+
+    During off-peak hours, research for every topic due within the horizon is
+    fetched into the research cache through the batch lane, so it is still
+    fresh when its window opens. Outside them only topics about to open are
+    fetched, as a last chance. Shortly before a window opens, the model the
+    post would be routed to is loaded on every backend with a keep_alive that
+    lasts until the window closes. The calendar is re-read when it changes.
+    """
+
+    def __init__(
+        self,
+        generator,
+        calendar_path: str,
+        off_peak: str = DEFAULT_OFF_PEAK,
+        lead: float = DEFAULT_LEAD,
+        horizon: float = DEFAULT_HORIZON,
+        poll_interval: float = POLL_INTERVAL
+    ):
+        """Set up around a BlogGenerator, ideally one whose research_lane is "batch"."""
+        self.generator = generator
+        self.calendar_path = calendar_path
+        self.off_peak = off_peak
+        self.lead = lead
+        self.horizon = horizon
+        self.poll_interval = poll_interval
+        self.last_report: List[Dict[str, Any]] = []
+        self._entries: List[Dict[str, Any]] = []
+        self._mtime: Optional[float] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if generator.research_cache is None:
+            logger.warning("The research cache is off, so prefetched research will not be kept")
+
+    @classmethod
+    def from_env(cls, generator, calendar_path: Optional[str] = None) -> "CalendarPrefetcher":
+        """Build from PREFETCH_CALENDAR, PREFETCH_OFF_PEAK, PREFETCH_LEAD, PREFETCH_HORIZON and PREFETCH_INTERVAL."""
+        return cls(
+            generator,
+            calendar_path or os.getenv("PREFETCH_CALENDAR", "calendar.jsonl"),
+            off_peak=os.getenv("PREFETCH_OFF_PEAK", DEFAULT_OFF_PEAK),
+            lead=float(os.getenv("PREFETCH_LEAD", str(DEFAULT_LEAD))),
+            horizon=float(os.getenv("PREFETCH_HORIZON", str(DEFAULT_HORIZON))),
+            poll_interval=float(os.getenv("PREFETCH_INTERVAL", str(POLL_INTERVAL)))
+        )
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """Calendar entries, re-read when the file changes."""
+        try:
+            mtime = os.path.getmtime(self.calendar_path)
+        except OSError as e:
+            logger.warning(f"Calendar unavailable: {str(e)}")
+            return self._entries
+        if mtime != self._mtime:
+            try:
+                self._entries = load_calendar(self.calendar_path)
+                self._mtime = mtime
+                logger.info(f"Loaded {len(self._entries)} calendar entries from {self.calendar_path}")
+            except Exception as e:
+                logger.warning(f"Could not read calendar {self.calendar_path}: {str(e)}")
+        return self._entries
+
+    def upcoming(self, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Entries whose window has not closed yet, soonest first."""
+        now = now or time.time()
+        return [entry for entry in self.entries() if entry["end"] > now]
+
+    def _cache_key(self, entry: Dict[str, Any]) -> str:
+        return self.generator._research_cache_key(entry["topic"], entry["depth"] or self.generator.research_depth)
+
+    def _research_horizon(self) -> float:
+        cache = self.generator.research_cache
+        return min(self.horizon, cache.ttl) if cache is not None and cache.ttl else self.horizon
+
+    def research_state(self, entry: Dict[str, Any], now: Optional[float] = None) -> Tuple[str, Optional[float]]:
+        """("warm", "stale" or "cold", when the cached research expires) for an entry.
+
+        Research is warm when it is cached and will still be fresh when the
+        entry's window opens, and stale when it expires before then.
+        """
+        cache = self.generator.research_cache
+        if cache is None:
+            return "cold", None
+        now = now or time.time()
+        age = cache.age(self._cache_key(entry))
+        if age is None:
+            return "cold", None
+        fresh_until = now - age + cache.ttl if cache.ttl else None
+        if fresh_until is None or fresh_until >= entry["start"]:
+            return "warm", fresh_until
+        return "stale", fresh_until
+
+    def warm_research(self, entry: Dict[str, Any], refresh: bool = False) -> bool:
+        """Research an entry's topic into the research cache; False if research failed."""
+        depth = entry["depth"] or self.generator.research_depth
+        try:
+            results = self.generator.get_research(entry["topic"], depth, refresh=refresh)
+        except Exception as e:
+            logger.warning(f"Prefetching research for {entry['topic']} failed: {str(e)}")
+            return False
+        if results.get("fallback"):
+            logger.warning(f"Prefetching research for {entry['topic']} failed: {results.get('error')}")
+            return False
+        if results.get("reused_from"):
+            # Research reused from a similar topic is not yet cached under this one
+            self.generator._write_research_cache(self._cache_key(entry), self.generator._research_record(results))
+        logger.info(f"Prefetched research for {entry['topic']}")
+        return True
+
+    def target_model(self, entry: Dict[str, Any]) -> str:
+        """The entry's model, or the one an interactive post would be routed to now."""
+        if entry["model"]:
+            return entry["model"]
+        self.generator._ensure_model()
+        return self.generator._route_model(Deadline(self.generator.timeout), lane="interactive")
+
+    def loaded_until(self, model: str) -> Dict[str, Optional[float]]:
+        """Hosts that have model loaded, with when Ollama will unload it (None if it did not say)."""
+        loaded: Dict[str, Optional[float]] = {}
+        for url in self.generator.backends.load(model)["hosts"]:
+            try:
+                response = self.generator.transport.get(f"{url}/api/ps")
+                if response.status_code != 200:
+                    continue
+                for item in response.json().get("models", []):
+                    if model in (item.get("name"), item.get("model")):
+                        loaded[url] = _parse_expiry(item.get("expires_at"))
+            except Exception as e:
+                logger.warning(f"Could not list loaded models on {url}: {str(e)}")
+        return loaded
+
+    def warm_model(self, model: str, until: float) -> List[str]:
+        """Load model on every backend that serves it, kept until the given time; returns the hosts it is on."""
+        loaded = self.loaded_until(model)
+        hosts = self.generator.backends.load(model)["hosts"]
+        for url in hosts:
+            if url in loaded and (loaded[url] is None or loaded[url] >= until):
+                continue
+            keep = max(60, int(until - time.time()))
+            try:
+                # A request without a prompt only loads the model
+                response = self.generator.transport.post(
+                    f"{url}/api/generate", json={"model": model, "keep_alive": f"{keep}s", "stream": False}
+                )
+                if response.status_code == 200:
+                    loaded[url] = time.time() + keep
+                    logger.info(f"Loaded {model} on {url} for {keep}s")
+                else:
+                    logger.warning(f"Could not load {model} on {url}: HTTP {response.status_code}")
+            except Exception as e:
+                logger.warning(f"Could not load {model} on {url}: {str(e)}")
+        return [url for url in hosts if url in loaded]
+
+    def run_once(self, now: Optional[float] = None, act: bool = True) -> List[Dict[str, Any]]:
+        """One pass over the calendar; returns what is warm. With act False, only reports."""
+        with self._lock:
+            now = now or time.time()
+            off_peak = in_hours(self.off_peak, datetime.fromtimestamp(now))
+            horizon = self._research_horizon()
+            report = []
+            for entry in self.upcoming(now):
+                due = entry["start"] - now
+                research, fresh_until = self.research_state(entry, now)
+                cacheable = self.generator.research_cache is not None
+                if act and cacheable and research != "warm" and due <= horizon and (off_peak or due <= self.lead):
+                    if self.warm_research(entry, refresh=research == "stale"):
+                        research, fresh_until = self.research_state(entry)
+                status = {
+                    "id": entry["id"],
+                    "topic": entry["topic"],
+                    "start": entry["start"],
+                    "research": research,
+                    "research_fresh_until": fresh_until,
+                    "model": None,
+                    "model_hosts": [],
+                }
+                if due <= self.lead:
+                    model = self.target_model(entry)
+                    status["model"] = model
+                    status["model_hosts"] = (
+                        self.warm_model(model, entry["end"]) if act else list(self.loaded_until(model))
+                    )
+                # A model is only expected to be loaded once the window is near
+                status["warm"] = research == "warm" and (status["model"] is None or bool(status["model_hosts"]))
+                report.append(status)
+            self.last_report = report
+            return report
+
+    def _next_wait(self, now: float) -> float:
+        """Seconds until the next pass: the poll interval, or sooner when a model is due to be loaded."""
+        wait = self.poll_interval
+        for entry in self.upcoming(now):
+            preload_at = entry["start"] - self.lead
+            if preload_at > now:
+                wait = min(wait, preload_at - now)
+                break
+        return max(1.0, wait)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.warning(f"Prefetch pass failed: {str(e)}")
+            self._stop.wait(self._next_wait(time.time()))
+
+    def start(self) -> "CalendarPrefetcher":
+        """Run passes on a background thread until stop."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="prefetch", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 10) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+def format_report(report: List[Dict[str, Any]]) -> str:
+    """One line per upcoming topic: when it is due and what is warm."""
+    if not report:
+        return "No upcoming topics."
+    lines = []
+    for status in report:
+        when = datetime.fromtimestamp(status["start"]).strftime("%Y-%m-%d %H:%M")
+        model = ""
+        if status["model"]:
+            model = f", {status['model']} loaded on {len(status['model_hosts'])} host(s)"
+        label = "warm" if status["warm"] else "cold"
+        lines.append(f"[{label:>4}] {when} {status['topic']} (research {status['research']}{model})")
+    return "\n".join(lines)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Warm research and models ahead of a content calendar")
+    parser.add_argument("calendar", nargs="?", help="Calendar file (JSONL, CSV or text; default PREFETCH_CALENDAR)")
+    parser.add_argument("--once", action="store_true", help="Run one pass, print what is warm and exit")
+    parser.add_argument("--status", action="store_true", help="Only report what is warm, changing nothing")
+    parser.add_argument("--off-peak", help=f"Local hours for bulk research, e.g. 22-6 (default {DEFAULT_OFF_PEAK})")
+    parser.add_argument(
+        "--lead", type=float, help=f"Seconds before a window to load its model (default {DEFAULT_LEAD:.0f})"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    from agents import BlogGenerator, load_env
+
+    load_env()
+    # Prefetching must never hold up a search someone is waiting for
+    generator = BlogGenerator(research_lane="batch", use_generation_cache=False)
+    prefetcher = CalendarPrefetcher.from_env(generator, args.calendar)
+    if args.off_peak is not None:
+        prefetcher.off_peak = args.off_peak
+    if args.lead is not None:
+        prefetcher.lead = args.lead
+
+    if args.status or args.once:
+        print(format_report(prefetcher.run_once(act=not args.status)))
+        return 0
+    prefetcher.start()
+    try:
+        while True:
+            time.sleep(prefetcher.poll_interval)
+            print(format_report(prefetcher.last_report), flush=True)
+    except KeyboardInterrupt:
+        prefetcher.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
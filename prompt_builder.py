@@ -0,0 +1,273 @@
+import os
+import re
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PROMPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts")
+STYLE_GUIDE = "alex-voice-style-guide.md"
+BLOG_PROMPT = "alex-personalized-blog-prompt.md"
+SIGN_OFF = "Keep being awesome at what you do!"
+# Budget held back for the per-post task line and sign-off
+TASK_RESERVE_TOKENS = 60
+
+# Sections worth including, most important first, as (file, heading path prefix).
+# Anything not listed (other platforms, the generic content request) is never used.
+SECTION_PRIORITY: List[Tuple[str, str]] = [
+    (BLOG_PROMPT, "AI Collective - Personalized Blog Generation Prompt"),
+    (BLOG_PROMPT, "Voice & Style Guidelines"),
+    (BLOG_PROMPT, "Structure"),
+    (STYLE_GUIDE, "Platform-Specific Adaptations > Blog Posts"),
+    (BLOG_PROMPT, "Formatting Notes"),
+    (BLOG_PROMPT, "Phrases to naturally incorporate"),
+    (STYLE_GUIDE, "Core Voice Attributes > 1."),
+    (STYLE_GUIDE, "Core Voice Attributes > 3."),
+    (STYLE_GUIDE, "Core Voice Attributes > 2."),
+    (STYLE_GUIDE, "Core Voice Attributes > 4."),
+    (STYLE_GUIDE, "Core Voice Attributes > 5."),
+    (STYLE_GUIDE, "Core Voice Attributes > 6."),
+    (BLOG_PROMPT, "Example Voice"),
+    (STYLE_GUIDE, "Vocabulary Preferences > Transition Elements"),
+    (STYLE_GUIDE, "Punctuation & Formatting"),
+    (STYLE_GUIDE, "Vocabulary Preferences > Words to Emphasize"),
+]
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough BPE token count: one per word or symbol, plus one per extra 6 letters of long words."""
+    return sum(1 + (len(piece) - 1) // 6 for piece in _TOKEN_PATTERN.findall(text))
+
+
+class Section:
+    """One heading of a markdown guide, with a full and a compact rendering."""
+
+    def __init__(self, path: str, level: int, body: str):
+        self.path = path
+        self.title = path.split(" > ")[-1]
+        self.level = level
+        self.body = body.strip()
+        self.full = f"{'#' * min(level, 3)} {self.title}\n{self.body}" if self.body else ""
+        self.compact = self._compact()
+        self.full_tokens = estimate_tokens(self.full)
+        self.compact_tokens = estimate_tokens(self.compact)
+        self.digest = hashlib.sha1(re.sub(r"\W+", "", self.body.lower()).encode("utf-8")).hexdigest()
+
+    def _compact(self) -> str:
+        """First paragraph plus the positive examples; drops "NOT THIS" counterexamples."""
+        if not self.body:
+            return ""
+        kept: List[str] = []
+        skipping = False
+        for line in self.body.splitlines():
+            marker = line.strip().strip("*").strip().upper()
+            if marker.startswith("NOT THIS"):
+                skipping = True
+                continue
+            if marker.startswith("DO THIS"):
+                skipping = False
+                continue
+            if not skipping:
+                kept.append(line)
+        text = "\n".join(kept).strip()
+        paragraphs = [paragraph for paragraph in re.split(r"\n\s*\n", text) if paragraph.strip()]
+        compact = "\n".join(paragraphs[:2])
+        return f"{self.title}: {compact}" if compact else ""
+
+
+def parse_sections(text: str) -> List[Section]:
+    """Split markdown into sections keyed by their heading path ("Parent > Child")."""
+    sections: List[Section] = []
+    stack: List[Tuple[int, str]] = []
+    body: List[str] = []
+    level = 0
+
+    def flush() -> None:
+        if stack:
+            # A document's single # title is not part of its children's paths
+            titles = [title for depth, title in stack if depth > 1] or [stack[-1][1]]
+            sections.append(Section(" > ".join(titles), level, "\n".join(body)))
+
+    for line in text.splitlines():
+        match = re.match(r"^(#{1,6})\s+(.*)$", line)
+        if not match:
+            body.append(line)
+            continue
+        flush()
+        body = []
+        level = len(match.group(1))
+        while stack and stack[-1][0] >= level:
+            stack.pop()
+        stack.append((level, match.group(2).strip()))
+    flush()
+    return sections
+
+
+class StyleGuideLibrary:
+    """Parsed prompt files, re-read only when a file's mtime or size changes."""
+
+    def __init__(self, directory: str = PROMPTS_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._files: Dict[str, Tuple[Tuple[int, int], List[Section]]] = {}
+
+    def sections(self, name: str) -> List[Section]:
+        """Sections of prompts/<name>, or [] if the file is missing."""
+        path = os.path.join(self.directory, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return []
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._files.get(name)
+            if cached is not None and cached[0] == signature:
+                return cached[1]
+        with open(path, encoding="utf-8") as f:
+            parsed = parse_sections(f.read())
+        logger.info(f"Loaded {len(parsed)} prompt sections from {name}")
+        with self._lock:
+            self._files[name] = (signature, parsed)
+        return parsed
+
+    def find(self, name: str, prefix: str) -> List[Section]:
+        """Sections of a file whose heading path starts with prefix (the section and its children)."""
+        return [section for section in self.sections(name) if section.path.startswith(prefix)]
+
+
+_library: Optional[StyleGuideLibrary] = None
+_library_lock = threading.Lock()
+
+
+def get_style_library() -> StyleGuideLibrary:
+    """Process-wide library so every generator shares one parse of the prompt files."""
+    global _library
+    with _library_lock:
+        if _library is None:
+            _library = StyleGuideLibrary(os.getenv("PROMPTS_DIR", PROMPTS_DIR))
+        return _library
+
+
+class PromptBuilder:
+    """Assembles the generation prompt from the style guides and research under a token budget.
+
+    The task line, research notes and sign-off are always included; research
+    gets up to research_share of the budget, filled line by line. Style
+    sections then fill what is left in SECTION_PRIORITY order, each in its
+    full form if it fits, otherwise in its compact form, otherwise skipped.
+    """
+
+    def __init__(
+        self,
+        library: Optional[StyleGuideLibrary] = None,
+        budget_tokens: int = 1200,
+        research_share: float = 0.35,
+        target_words: int = 600
+    ):
+        self.library = library or get_style_library()
+        self.budget_tokens = budget_tokens
+        self.research_share = research_share
+        self.target_words = target_words
+
+    @classmethod
+    def from_env(cls) -> "PromptBuilder":
+        """Read PROMPT_TOKEN_BUDGET, PROMPT_RESEARCH_SHARE and BLOG_TARGET_WORDS."""
+        return cls(
+            budget_tokens=int(os.getenv("PROMPT_TOKEN_BUDGET", "1200")),
+            research_share=float(os.getenv("PROMPT_RESEARCH_SHARE", "0.35")),
+            target_words=int(os.getenv("BLOG_TARGET_WORDS", "600"))
+        )
+
+    def _research_block(self, research: Dict[str, Any], budget: int) -> str:
+        """Research notes, then openings of related earlier posts, trimmed line by line to budget tokens."""
+        text = research.get("brief") or research.get("summary") or ""
+        if research.get("related"):
+            earlier = "\n".join(f"- {post['topic']}: {post['excerpt']}" for post in research["related"])
+            text = f"{text}\nFrom our earlier posts (build on them, do not repeat them):\n{earlier}"
+        lines: List[str] = []
+        used = 0
+        for line in text.splitlines():
+            cost = estimate_tokens(line) + 1
+            if used + cost > budget:
+                # Keep the start of an oversized line rather than dropping it
+                words: List[str] = []
+                for word in line.split():
+                    word_cost = estimate_tokens(word)
+                    if used + word_cost + 1 > budget:
+                        break
+                    words.append(word)
+                    used += word_cost
+                if words:
+                    lines.append(" ".join(words) + " ...")
+                    used += 1
+                continue
+            lines.append(line)
+            used += cost
+        return "\n".join(lines).strip()
+
+    def research_notes(self, research: Dict[str, Any]) -> str:
+        """Research notes trimmed to the research share of the budget."""
+        return self._research_block(research, int(self.budget_tokens * self.research_share))
+
+    def _fit_length(self, text: str) -> str:
+        """Drop the guides' per-section word counts, which assume a much longer post."""
+        return re.sub(r"\s*\(\d[\d,]*\s*[-–]\s*\d[\d,]*\s*words\)", "", text)
+
+    def style_prefix(self) -> str:
+        """Style sections that fit the budget left after research and the task lines.
+
+        The selection depends only on the guides and the budget, never on the
+        topic or research, so every post shares this exact text. That lets
+        Ollama reuse its KV cache for it across posts.
+        """
+        reserved = int(self.budget_tokens * self.research_share) + TASK_RESERVE_TOKENS
+        remaining = self.budget_tokens - reserved
+        chosen: List[str] = []
+        seen = set()
+        dropped: List[str] = []
+        for name, prefix in SECTION_PRIORITY:
+            for section in self.library.find(name, prefix):
+                if not section.body or section.digest in seen:
+                    continue
+                full = self._fit_length(section.full)
+                full_tokens = estimate_tokens(full)
+                if full_tokens <= remaining:
+                    chosen.append(full)
+                    remaining -= full_tokens
+                elif section.compact and section.compact_tokens <= remaining:
+                    chosen.append(self._fit_length(section.compact))
+                    remaining -= section.compact_tokens
+                else:
+                    dropped.append(section.path)
+                    continue
+                seen.add(section.digest)
+
+        if dropped:
+            logger.debug(f"Prompt budget {self.budget_tokens} tokens; dropped sections: {dropped}")
+        return "\n\n".join(chosen)
+
+    def build_parts(self, query: str, research: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+        """Return (style prefix, per-post prompt), or None when the style guides are unavailable."""
+        if not self.library.sections(BLOG_PROMPT) and not self.library.sections(STYLE_GUIDE):
+            return None
+
+        head = (
+            f"Write a conversational, approachable blog post of about {self.target_words} words "
+            f"about {query}, following the AI Collective voice and structure guidelines."
+        )
+        tail = f'End with: "{SIGN_OFF}"'
+        research_text = self.research_notes(research)
+        research_part = f"## Research\n{research_text}" if research_text else ""
+        prompt = "\n\n".join([head] + ([research_part] if research_part else []) + [tail])
+        return self.style_prefix(), prompt
+
+    def build(self, query: str, research: Dict[str, Any]) -> Optional[str]:
+        """Return the whole prompt as one string, or None when the style guides are unavailable."""
+        parts = self.build_parts(query, research)
+        if parts is None:
+            return None
+        return "\n\n".join(part for part in parts if part)
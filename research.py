@@ -0,0 +1,224 @@
+import os
+import re
+import hashlib
+import logging
+from typing import Dict, List, Any, Optional
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+logger = logging.getLogger(__name__)
+
+# Angles a deep research pass covers in addition to the topic itself
+SUBQUERY_TEMPLATES = [
+    "{topic}",
+    "{topic} latest trends and news",
+    "{topic} statistics and data",
+    "{topic} common mistakes and challenges",
+    "{topic} practical examples and case studies",
+    "{topic} expert opinions and predictions",
+]
+
+TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "ref", "mc_cid", "mc_eid")
+
+
+class DeepResearchConfig:
+    """How wide a deep research pass fans out and how large its brief may get."""
+
+    def __init__(self, subqueries: int = 4, brief_chars: int = 2000, max_sources: int = 8):
+        self.subqueries = max(1, min(subqueries, len(SUBQUERY_TEMPLATES)))
+        self.brief_chars = brief_chars
+        self.max_sources = max_sources
+
+    @classmethod
+    def from_env(cls) -> "DeepResearchConfig":
+        """Read RESEARCH_SUBQUERIES, RESEARCH_BRIEF_CHARS and RESEARCH_MAX_SOURCES."""
+        return cls(
+            subqueries=int(os.getenv("RESEARCH_SUBQUERIES", "4")),
+            brief_chars=int(os.getenv("RESEARCH_BRIEF_CHARS", "2000")),
+            max_sources=int(os.getenv("RESEARCH_MAX_SOURCES", "8"))
+        )
+
+    @property
+    def cache_tag(self) -> str:
+        """Identifies the settings in research cache keys, so changing them misses the cache."""
+        return f"brief:{self.subqueries}:{self.brief_chars}:{self.max_sources}"
+
+
+def plan_subqueries(topic: str, count: int) -> List[str]:
+    """Split a topic into count search queries covering different angles."""
+    topic = topic.strip().rstrip("?!.")
+    return [template.format(topic=topic) for template in SUBQUERY_TEMPLATES[:count]]
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form of a URL for deduplication (no fragment, tracking params or trailing slash)."""
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return url.strip()
+    query = [
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith(TRACKING_PARAMS)
+    ]
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower() or "https", host, path, urlencode(query), ""))
+
+
+def content_hash(text: str) -> str:
+    """Hash of whitespace- and case-normalized text, so syndicated copies collide."""
+    normalized = re.sub(r"\s+", " ", text.lower()).strip()
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def to_data(response: Any) -> Any:
+    """Turn a LinkUp SDK response (pydantic model, JSON string or dict) into plain data."""
+    if hasattr(response, "model_dump"):
+        return response.model_dump()
+    if isinstance(response, str):
+        return {"answer": response}
+    return response
+
+
+def extract_answer(response: Any) -> str:
+    """The answer text of a sourcedAnswer response, if any."""
+    data = to_data(response)
+    if isinstance(data, dict):
+        return data.get("answer") or ""
+    return ""
+
+
+def extract_sources(response: Any) -> List[Dict[str, str]]:
+    """Sources from a sourcedAnswer ("sources") or searchResults ("results") response."""
+    data = to_data(response)
+    if not isinstance(data, dict):
+        return []
+    items = data.get("sources") or data.get("results") or []
+    sources = []
+    for item in items:
+        if hasattr(item, "model_dump"):
+            item = item.model_dump()
+        if not isinstance(item, dict) or not item.get("url"):
+            continue
+        text = item.get("snippet") or item.get("content") or ""
+        sources.append({
+            "name": item.get("name") or item["url"],
+            "url": item["url"],
+            "snippet": re.sub(r"\s+", " ", text).strip(),
+        })
+    return sources
+
+
+def merge_sources(result_lists: List[List[Dict[str, str]]], max_sources: int) -> List[Dict[str, Any]]:
+    """Deduplicate sources by URL and content hash and rank them.
+
+    A source scores higher when several sub-queries found it and when it ranked
+    near the top of each result list.
+    """
+    merged: Dict[str, Dict[str, Any]] = {}
+    by_hash: Dict[str, str] = {}
+    for results in result_lists:
+        for position, source in enumerate(results):
+            url_key = normalize_url(source["url"])
+            digest = content_hash(source["snippet"]) if source["snippet"] else None
+            key = url_key
+            if key not in merged and digest in by_hash:
+                # Same text under a different URL (mirrors, syndication)
+                key = by_hash[digest]
+            score = 1.0 / (1 + position)
+            if key in merged:
+                entry = merged[key]
+                entry["score"] += score
+                entry["hits"] += 1
+                # Keep the most informative snippet seen for this source
+                if len(source["snippet"]) > len(entry["snippet"]):
+                    entry["snippet"] = source["snippet"]
+            else:
+                merged[key] = dict(source, score=score, hits=1)
+                if digest:
+                    by_hash[digest] = key
+    ranked = sorted(merged.values(), key=lambda entry: (entry["hits"], entry["score"]), reverse=True)
+    return ranked[:max_sources]
+
+
+def _sentences(text: str) -> List[str]:
+    return [sentence.strip() for sentence in re.split(r"(?<=[.!?])\s+", text) if sentence.strip()]
+
+
+def build_brief(topic: str, answers: List[str], sources: List[Dict[str, Any]], max_chars: int) -> str:
+    """Merge sub-query answers and ranked sources into a research brief of at most max_chars."""
+    lines = [f"Research brief: {topic}", "", "Key findings:"]
+    seen = set()
+    findings = []
+    # Round-robin over answers so every angle contributes its lead sentences first
+    answer_sentences = [_sentences(answer) for answer in answers if answer]
+    for depth in range(3):
+        for sentences in answer_sentences:
+            if depth < len(sentences):
+                key = content_hash(sentences[depth])
+                if key not in seen:
+                    seen.add(key)
+                    findings.append(f"- {sentences[depth]}")
+    source_lines = [
+        f"[{index}] {source['name']}: {source['snippet'][:240]} ({source['url']})"
+        for index, source in enumerate(sources, 1)
+    ]
+
+    brief = "\n".join(lines)
+    for line in findings:
+        if len(brief) + len(line) + 1 > max_chars * 2 // 3:
+            break
+        brief += "\n" + line
+    if source_lines:
+        brief += "\n\nSources:"
+        for line in source_lines:
+            if len(brief) + len(line) + 1 > max_chars:
+                break
+            brief += "\n" + line
+    return brief[:max_chars]
+
+
+def summarize(answers: List[str], limit: int = 200) -> str:
+    """Short lead summary kept for callers that only show a line of research."""
+    for answer in answers:
+        if answer:
+            short_answer = " ".join(_sentences(answer)[:2])
+            return short_answer if len(short_answer) <= limit else short_answer[:limit - 3] + "..."
+    return ""
+
+
+def merge_deep_research(
+    topic: str,
+    subqueries: List[str],
+    responses: List[Any],
+    searched: Any,
+    config: DeepResearchConfig
+) -> Optional[Dict[str, Any]]:
+    """Combine sub-query sourcedAnswers and a searchResults pass into a research result.
+
+    Failed searches are passed as exceptions and skipped; None means nothing usable came back.
+    """
+    answers: List[str] = []
+    source_lists: List[List[Dict[str, str]]] = []
+    for subquery, response in zip(subqueries, responses):
+        if isinstance(response, BaseException):
+            logger.warning(f"Sub-query failed ({subquery}): {str(response)}")
+            continue
+        answers.append(extract_answer(response))
+        source_lists.append(extract_sources(response))
+    if isinstance(searched, BaseException):
+        logger.warning(f"Search results pass failed: {str(searched)}")
+    elif searched is not None:
+        source_lists.append(extract_sources(searched))
+
+    if not any(answers) and not any(source_lists):
+        return None
+    sources = merge_sources(source_lists, config.max_sources)
+    return {
+        "summary": summarize(answers) or (sources[0]["snippet"][:200] if sources else ""),
+        "brief": build_brief(topic, answers, sources, config.brief_chars),
+        "sources": [{"name": source["name"], "url": source["url"]} for source in sources],
+        "subqueries": subqueries,
+        "depth": "deep",
+    }
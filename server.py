@@ -1,22 +1,167 @@
+import os
+import json
 import asyncio
-from mcp.server.fastmcp import FastMCP
-from agents import run_research
+import logging
+from typing import Optional, TYPE_CHECKING
+from mcp.server.fastmcp import FastMCP, Context
+from metrics import REGISTRY
+from linkup_scheduler import get_linkup_scheduler
+from jobs import JobQueue, WorkerPool, DONE, FAILED
+
+# The generator stack is imported on the first tool call, so the server
+# answers the client's initialize/list_tools handshake without waiting on it
+if TYPE_CHECKING:
+    from async_agents import AsyncBlogGenerator
 
 # Create FastMCP instance
 mcp = FastMCP("crew_research")
 
+# Report generation progress every N streamed tokens
+PROGRESS_EVERY = 20
+
+# One generator per process; async so concurrent tool calls share the event loop
+_generator: Optional["AsyncBlogGenerator"] = None
+
+def get_generator() -> "AsyncBlogGenerator":
+    """Create the shared async blog generator on first use.
+
+    Set GENERATION_CACHE=1 so retried tool calls reuse finished posts.
+    """
+    global _generator
+    if _generator is None:
+        from async_agents import AsyncBlogGenerator
+        _generator = AsyncBlogGenerator()
+    return _generator
+
+# Background job queue; workers run in separate processes so long posts never tie up the server
+_queue: Optional[JobQueue] = None
+_workers: Optional[WorkerPool] = None
+
+def get_job_queue() -> JobQueue:
+    """Open the job queue and start local workers on first use (JOB_WORKERS=0 uses external workers)."""
+    global _queue, _workers
+    if _queue is None:
+        _queue = JobQueue()
+        workers = int(os.getenv("JOB_WORKERS", "2"))
+        if workers > 0:
+            _workers = WorkerPool(workers, _queue.path).start()
+    return _queue
+
 @mcp.tool()
-async def crew_research(query: str) -> str:
-    """Run CrewAI-based research system for given user query. Can do both standard and deep web search.
+async def crew_research(query: str, deep: bool = False) -> str:
+    """Run LinkUp web research for a given user query and return a short summary.
 
     Args:
         query (str): The research query or question.
+        deep (bool): Search several angles concurrently and return a merged, sourced brief.
+
+    Returns:
+        str: The research summary, or the research brief in deep mode.
+    """
+    research = await get_generator().get_research(query, depth="deep" if deep else "standard")
+    if research.get("fallback"):
+        raise RuntimeError(f"Research unavailable: {research.get('error', 'no usable results')}")
+    return research.get("brief") or research.get("summary", "")
+
+@mcp.tool()
+async def generate_blog_post(query: str, ctx: Context) -> str:
+    """Research a topic and write a Substack-ready blog post about it.
+
+    Progress is streamed to the client as stage messages and token counts
+    while the post is being written.
+
+    Args:
+        query (str): The topic to write about.
+
+    Returns:
+        str: The generated blog post in markdown.
+    """
+    content = ""
+    tokens = 0
+    async for event in get_generator().stream_blog_post(query):
+        if event["type"] == "stage":
+            await ctx.info(f"Stage: {event['stage']}")
+        elif event["type"] == "research" and event.get("error"):
+            await ctx.warning(f"Research unavailable, writing without it: {event['error']}")
+        elif event["type"] == "token":
+            tokens += 1
+            # Throttle notifications; one per token would flood the client
+            if tokens % PROGRESS_EVERY == 0:
+                await ctx.report_progress(tokens)
+        elif event["type"] == "done":
+            content = event["content"]
+            if event.get("cached"):
+                await ctx.info("Served from generation cache")
+    return content
+
+@mcp.tool()
+async def generate_blog_variants(query: str, ctx: Context, count: int = 3) -> str:
+    """Research a topic once and write several drafts of a post about it, best first.
+
+    Drafts are written concurrently at different sampling temperatures and
+    ranked by length, section count and sign-off.
+
+    Args:
+        query (str): The topic to write about.
+        count (int): Number of drafts, at most 5.
+
+    Returns:
+        str: JSON list of drafts with their rank, scores, temperature, seed and markdown content.
+    """
+    variants, metrics = await get_generator().create_variants(query, count)
+    if metrics.research_error:
+        await ctx.warning(f"Research unavailable, writing without it: {metrics.research_error}")
+    if metrics.generation_timed_out:
+        await ctx.warning("Time limit reached, some drafts were cut short")
+    return json.dumps(variants)
+
+@mcp.tool()
+async def submit_blog_post(query: str, priority: int = 0) -> str:
+    """Queue a blog post to be written in the background.
+
+    Args:
+        query (str): The topic to write about.
+        priority (int): Lower values run first.
+
+    Returns:
+        str: The job id to pass to blog_post_status.
+    """
+    return await asyncio.to_thread(get_job_queue().submit, query, priority)
+
+@mcp.tool()
+async def blog_post_status(job_id: str, wait_seconds: float = 0) -> str:
+    """Check on a queued blog post, optionally waiting up to wait_seconds for it to finish.
+
+    Args:
+        job_id (str): The id returned by submit_blog_post.
+        wait_seconds (float): How long to wait for completion before answering.
+
+    Returns:
+        str: The finished post, or a JSON status with stage and partial content.
+    """
+    queue = get_job_queue()
+    job = await asyncio.to_thread(queue.result, job_id, wait_seconds)
+    if job is None:
+        return json.dumps({"job_id": job_id, "status": "unknown"})
+    if job["status"] == DONE:
+        return job["result"]
+    status = {key: job.get(key) for key in ("status", "stage", "partial", "queue_position")}
+    if job["status"] == FAILED:
+        status["error"] = job["error"]
+    return json.dumps({"job_id": job_id, **status})
+
+@mcp.tool()
+async def pipeline_metrics() -> str:
+    """Report blog pipeline latency and throughput metrics for this server process.
 
     Returns:
-        str: The research response from the CrewAI pipeline.
+        str: Stage timings, token counts, cache hits and fallbacks, and LinkUp queue depths
+            and rate limiting, in Prometheus text format.
     """
-    return run_research(query)
+    return REGISTRY.render_prometheus() + get_linkup_scheduler().render_prometheus()
 
 # Run the server
 if __name__ == "__main__":
-    mcp.run(transport="stdio") 
\ No newline at end of file
+    # stdout carries the MCP protocol, so logs go to stderr
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    mcp.run(transport="stdio")
@@ -0,0 +1,78 @@
+import os
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Any, Optional, Callable
+
+from singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+def keep_alive() -> str:
+    """How long Ollama keeps a model loaded after a request (LLM_KEEP_ALIVE, Ollama duration syntax)."""
+    return os.getenv("LLM_KEEP_ALIVE", "30m")
+
+
+def session_key(model: str, system: str) -> str:
+    """Identifies a warmed prefix: the model plus the exact system text."""
+    digest = hashlib.sha256(system.encode("utf-8")).hexdigest()[:16]
+    return f"{model}:{digest}"
+
+
+class SessionStore:
+    """Precomputed Ollama contexts for shared prompt prefixes, one per (model, prefix).
+
+    A context is the token list Ollama returns from /api/generate. Passing it
+    back with the next request lets the runner reuse the KV cache for those
+    tokens, so each post only prefills its own topic and research. Warm-ups
+    are coalesced, so concurrent posts trigger one warm-up per key.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._contexts: Dict[str, List[int]] = {}
+        self._failed: set = set()
+        self._flights = SingleFlight("session warm-up")
+
+    def get(self, key: str, warm: Callable[[], Optional[List[int]]]) -> Optional[List[int]]:
+        """Return the context for key, calling warm() once to create it; None if warming failed."""
+        with self._lock:
+            if key in self._contexts:
+                return self._contexts[key]
+            if key in self._failed:
+                return None
+
+        def create() -> Optional[List[int]]:
+            context = warm()
+            with self._lock:
+                if context:
+                    self._contexts[key] = context
+                else:
+                    # Don't retry on every post; invalidate() clears this
+                    self._failed.add(key)
+            return context
+
+        context, _ = self._flights.do(key, create)
+        return context
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        """Drop one warmed context (e.g. after the model was reloaded), or all of them."""
+        with self._lock:
+            if key is None:
+                self._contexts.clear()
+                self._failed.clear()
+            else:
+                self._contexts.pop(key, None)
+                self._failed.discard(key)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "sessions": len(self._contexts),
+                "context_tokens": {key: len(context) for key, context in self._contexts.items()},
+                "failed": len(self._failed),
+            }
+
+
+SESSIONS = SessionStore()
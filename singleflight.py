@@ -0,0 +1,339 @@
+import time
+import logging
+import threading
+from typing import Dict, List, Any, Optional, Callable, Iterator, AsyncIterator, Awaitable, Tuple, TYPE_CHECKING
+
+# asyncio is only needed by the async classes; importing it lazily keeps the
+# sync pipeline (and `import agents`) from paying for the event loop machinery
+if TYPE_CHECKING:
+    import asyncio
+
+logger = logging.getLogger(__name__)
+
+
+class StreamAbandoned(RuntimeError):
+    """The producer was stopped because every subscriber left; the items are incomplete."""
+
+
+class _Call:
+    """One in-flight computation and its eventual outcome."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SharedStream:
+    """Buffers items from one producer so any number of subscribers can replay and follow them.
+
+    A subscriber that attaches late first receives everything produced so far,
+    then new items as they arrive. meta is filled in by the producer (e.g. with
+    Ollama's final stats) and is complete once iteration ends.
+    """
+
+    def __init__(self):
+        self.items: List[Any] = []
+        self.meta: Dict[str, Any] = {}
+        self.finished = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.abandoned = False
+        # Called once when the stream is abandoned, so no new caller joins it
+        self.on_abandon: Optional[Callable[[], None]] = None
+        self._condition = threading.Condition()
+
+    def publish(self, item: Any) -> bool:
+        """Append an item; returns False once every subscriber has gone away."""
+        with self._condition:
+            self.items.append(item)
+            self._condition.notify_all()
+            return not self.abandoned
+
+    def close(self, error: Optional[BaseException] = None) -> None:
+        """Mark the stream complete, optionally with the producer's error."""
+        with self._condition:
+            self.finished = True
+            self.error = error
+            self._condition.notify_all()
+
+    def abandon(self) -> None:
+        """Stop the producer early if nobody has subscribed (e.g. a later part of a post that ran out of time)."""
+        with self._condition:
+            abandoned = self._abandon_if_unwatched()
+        if abandoned and self.on_abandon is not None:
+            self.on_abandon()
+
+    def _abandon_if_unwatched(self) -> bool:
+        """Mark the stream abandoned if it has no subscribers and is still running (hold _condition)."""
+        if self.subscribers or self.finished or self.abandoned:
+            return False
+        self.abandoned = True
+        return True
+
+    def subscribe(self, timeout_at: Optional[float] = None) -> Iterator[Any]:
+        """Yield every item from the start, blocking for new ones until the stream closes.
+
+        timeout_at is a time.monotonic() deadline; once it passes before the
+        stream has finished, TimeoutError is raised. Leaving early counts as
+        unsubscribing.
+        """
+        with self._condition:
+            self.subscribers += 1
+        index = 0
+        try:
+            while True:
+                with self._condition:
+                    while index >= len(self.items) and not self.finished:
+                        if timeout_at is None:
+                            self._condition.wait()
+                        elif not self._condition.wait(max(0.0, timeout_at - time.monotonic())):
+                            break
+                    if timeout_at is not None and time.monotonic() >= timeout_at and not self.finished:
+                        raise TimeoutError("Deadline reached before the stream finished")
+                    batch = self.items[index:]
+                    index = len(self.items)
+                    finished = self.finished
+                    error = self.error
+                for item in batch:
+                    yield item
+                if finished and index >= len(self.items):
+                    if error is not None:
+                        raise error
+                    return
+        finally:
+            with self._condition:
+                self.subscribers -= 1
+                abandoned = self._abandon_if_unwatched()
+            if abandoned and self.on_abandon is not None:
+                self.on_abandon()
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into one computation.
+
+    The first caller for a key runs the work; callers arriving while it is in
+    flight wait for and share its result (or error). Nothing is remembered once
+    the work finishes, so this complements, rather than replaces, the caches.
+    """
+
+    def __init__(self, name: str):
+        """name labels log messages, e.g. "research" or "generation"."""
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self._streams: Dict[str, SharedStream] = {}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Run fn once per in-flight key; returns (result, shared)."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            logger.info(f"Joining in-flight {self.name}")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result, False
+
+    def stream(self, key: str, producer: Callable[[Dict[str, Any]], Iterator[Any]]) -> Tuple[SharedStream, bool]:
+        """Share one producer iterator per in-flight key; returns (stream, shared).
+
+        The producer runs on a background thread so it keeps going if the
+        caller that started it stops listening, and is closed early once every
+        subscriber has left, with StreamAbandoned as its error. An abandoned
+        stream is never joined; the next caller starts a new one. The producer
+        receives the stream's meta dict to fill in.
+        """
+        with self._lock:
+            shared = self._streams.get(key)
+            if shared is not None and not shared.abandoned:
+                logger.info(f"Joining in-flight {self.name} stream")
+                return shared, True
+            shared = SharedStream()
+            shared.on_abandon = lambda: self._forget(key, shared)
+            self._streams[key] = shared
+
+        def run() -> None:
+            error: Optional[BaseException] = None
+            iterator = producer(shared.meta)
+            try:
+                for item in iterator:
+                    if not shared.publish(item):
+                        logger.info(f"All subscribers left, stopping {self.name} stream")
+                        error = StreamAbandoned(f"{self.name} stream stopped after every subscriber left")
+                        break
+            except BaseException as e:
+                error = e
+            finally:
+                close = getattr(iterator, "close", None)
+                if close is not None:
+                    close()
+                self._forget(key, shared)
+                shared.close(error)
+
+        threading.Thread(target=run, name=f"singleflight-{self.name}", daemon=True).start()
+        return shared, False
+
+    def _forget(self, key: str, shared: SharedStream) -> None:
+        """Stop offering shared to new callers, unless a newer stream already replaced it."""
+        with self._lock:
+            if self._streams.get(key) is shared:
+                del self._streams[key]
+
+
+class AsyncSharedStream:
+    """asyncio counterpart of SharedStream."""
+
+    def __init__(self):
+        import asyncio
+
+        self.items: List[Any] = []
+        self.meta: Dict[str, Any] = {}
+        self.finished = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.abandoned = False
+        self.on_abandon: Optional[Callable[[], None]] = None
+        self.task: Optional["asyncio.Task"] = None
+        self._changed = asyncio.Event()
+
+    def publish(self, item: Any) -> None:
+        self.items.append(item)
+        self._changed.set()
+
+    def close(self, error: Optional[BaseException] = None) -> None:
+        self.finished = True
+        self.error = error
+        self._changed.set()
+
+    def abandon(self) -> None:
+        """Cancel the producer if nobody has subscribed."""
+        if self.subscribers or self.finished or self.abandoned or self.task is None:
+            return
+        # Nobody is listening any more; stop generating and let the next caller start afresh
+        self.abandoned = True
+        if self.on_abandon is not None:
+            self.on_abandon()
+        self.task.cancel()
+
+    async def subscribe(self, timeout_at: Optional[float] = None) -> AsyncIterator[Any]:
+        """Yield every item from the start, waiting for new ones until the stream closes.
+
+        timeout_at is a time.monotonic() deadline, as in SharedStream.subscribe;
+        the builtin TimeoutError is raised on every Python version.
+        """
+        import asyncio
+
+        self.subscribers += 1
+        index = 0
+        try:
+            while True:
+                if timeout_at is not None and time.monotonic() >= timeout_at and not self.finished:
+                    raise TimeoutError("Deadline reached before the stream finished")
+                while index < len(self.items):
+                    item = self.items[index]
+                    index += 1
+                    yield item
+                if self.finished:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                self._changed.clear()
+                if timeout_at is None:
+                    await self._changed.wait()
+                else:
+                    # wait_for raises asyncio.TimeoutError, a different class from the builtin before
+                    # Python 3.11; callers catch the builtin TimeoutError, as for SharedStream
+                    try:
+                        await asyncio.wait_for(self._changed.wait(), max(0.0, timeout_at - time.monotonic()))
+                    except asyncio.TimeoutError:
+                        raise TimeoutError("Deadline reached before the stream finished") from None
+        finally:
+            self.subscribers -= 1
+            self.abandon()
+
+
+class AsyncSingleFlight:
+    """asyncio counterpart of SingleFlight for use on one event loop."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._tasks: Dict[str, "asyncio.Task"] = {}
+        self._streams: Dict[str, AsyncSharedStream] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Await fn once per in-flight key; returns (result, shared)."""
+        import asyncio
+
+        task = self._tasks.get(key)
+        shared = task is not None
+        if shared:
+            logger.info(f"Joining in-flight {self.name}")
+        else:
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        # Shield so one caller being cancelled does not cancel the others
+        return await asyncio.shield(task), shared
+
+    def stream(self, key: str, producer: Callable[[Dict[str, Any]], AsyncIterator[Any]]) -> Tuple[AsyncSharedStream, bool]:
+        """Share one async producer per in-flight key; returns (stream, shared).
+
+        As with SingleFlight.stream, an abandoned stream is never joined and
+        closes with StreamAbandoned.
+        """
+        shared = self._streams.get(key)
+        if shared is not None and not shared.abandoned:
+            logger.info(f"Joining in-flight {self.name} stream")
+            return shared, True
+        import asyncio
+
+        shared = AsyncSharedStream()
+        shared.on_abandon = lambda: self._forget(key, shared)
+        self._streams[key] = shared
+
+        async def run() -> None:
+            error: Optional[BaseException] = None
+            iterator = producer(shared.meta)
+            try:
+                async for item in iterator:
+                    shared.publish(item)
+            except BaseException as e:
+                # Includes cancellation once the last subscriber has left
+                error = e
+            finally:
+                await iterator.aclose()
+                self._forget(key, shared)
+                if shared.abandoned:
+                    logger.info(f"All subscribers left, stopping {self.name} stream")
+                    error = StreamAbandoned(f"{self.name} stream stopped after every subscriber left")
+                shared.close(error)
+
+        shared.task = asyncio.ensure_future(run())
+        return shared, False
+
+    def _forget(self, key: str, shared: AsyncSharedStream) -> None:
+        """Stop offering shared to new callers, unless a newer stream already replaced it."""
+        if self._streams.get(key) is shared:
+            del self._streams[key]
+
+
+# Process-wide so every generator instance (Streamlit sessions, MCP calls, batch threads) coalesces together
+RESEARCH_FLIGHTS = SingleFlight("research")
+GENERATION_FLIGHTS = SingleFlight("generation")
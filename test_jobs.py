@@ -0,0 +1,73 @@
+import time
+
+from jobs import JobQueue, QUEUED, RUNNING, FAILED
+
+
+def test_long_stage_is_not_requeued(tmp_path):
+    """A job whose single stage outlasts stale_after stays with its worker while heartbeats run."""
+    path = str(tmp_path / "jobs.sqlite3")
+    queue = JobQueue(path, stale_after=0.5)
+    other = JobQueue(path, stale_after=0.5)
+    job_id = queue.submit("slow topic")
+
+    job = queue.claim("worker-a")
+    assert job["id"] == job_id
+    with queue.keep_alive(job_id, "worker-a", interval=0.1):
+        # No progress events for three times stale_after
+        time.sleep(1.5)
+        assert other.claim("worker-b") is None
+
+    status = queue.status(job_id)
+    assert status["status"] == RUNNING
+    assert status["worker"] == "worker-a"
+    assert status["attempts"] == 1
+
+
+def test_silent_job_is_requeued(tmp_path):
+    """Without heartbeats the job goes back to the queue for another worker."""
+    path = str(tmp_path / "jobs.sqlite3")
+    queue = JobQueue(path, stale_after=0.2)
+    job_id = queue.submit("topic")
+    queue.claim("worker-a")
+
+    time.sleep(0.3)
+    job = queue.claim("worker-b")
+    assert job["id"] == job_id
+    assert queue.status(job_id)["attempts"] == 2
+    # The first worker no longer holds the job
+    assert not queue.heartbeat(job_id, "worker-a")
+
+
+def test_stale_worker_cannot_finish_requeued_job(tmp_path):
+    """Once a job has been handed to another worker, the old worker's result and failure are rejected."""
+    path = str(tmp_path / "jobs.sqlite3")
+    queue = JobQueue(path, stale_after=0.2)
+    job_id = queue.submit("topic")
+    queue.claim("worker-a")
+
+    time.sleep(0.3)
+    assert queue.claim("worker-b")["id"] == job_id
+    assert not queue.complete(job_id, "worker-a", "stale post")
+    assert not queue.fail(job_id, "worker-a", "stale error")
+    status = queue.status(job_id)
+    assert status["status"] == RUNNING
+    assert status["worker"] == "worker-b"
+
+    assert queue.complete(job_id, "worker-b", "fresh post")
+    assert queue.status(job_id)["result"] == "fresh post"
+
+
+def test_poison_job_fails_after_max_attempts(tmp_path):
+    """A job that keeps killing its worker is failed instead of requeued forever."""
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), stale_after=0.1, max_attempts=2)
+    job_id = queue.submit("poison")
+
+    for attempt in range(2):
+        assert queue.claim(f"worker-{attempt}")["id"] == job_id
+        time.sleep(0.2)
+
+    assert queue.claim("worker-2") is None
+    status = queue.status(job_id)
+    assert status["status"] == FAILED
+    assert "2 attempts" in status["error"]
+    assert queue.counts().get(QUEUED, 0) == 0
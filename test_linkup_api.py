@@ -1,17 +1,17 @@
 import logging
-from agents import LinkUpSearchTool
+from agents import BlogGenerator
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def test_linkup_api(query: str):
+def check_linkup_api(query: str):
     logging.debug(f"Testing LinkUp API with query: {query}")
     try:
-        # Initialize the LinkUp Search Tool
-        linkup_search_tool = LinkUpSearchTool()
+        # Initialize the blog generator
+        generator = BlogGenerator()
 
-        # Perform the search
-        result = linkup_search_tool._run(query=query)
+        # Perform the search; refresh skips the cache and reused research so the API is really called
+        result = generator.get_research(query, refresh=True)
         logging.debug(f"Search result: {result}")
         print("Search result:", result)
     except Exception as e:
@@ -19,5 +19,6 @@ def test_linkup_api(query: str):
         print(f"Error: {str(e)}")
 
 # Test the LinkUp API with a sample query
-test_query = "AI advancements in 2023"
-test_linkup_api(test_query) 
\ No newline at end of file
+if __name__ == "__main__":
+    test_query = "AI advancements in 2023"
+    check_linkup_api(test_query)
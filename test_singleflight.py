@@ -0,0 +1,81 @@
+import time
+import asyncio
+import threading
+from contextlib import aclosing
+
+import pytest
+
+from singleflight import SingleFlight, AsyncSingleFlight, StreamAbandoned
+
+
+def slow_tokens(count: int, delay: float):
+    def producer(meta):
+        for index in range(count):
+            time.sleep(delay)
+            yield f"t{index} "
+    return producer
+
+
+def test_abandoned_stream_is_not_joined():
+    """A caller arriving after every subscriber left starts a new flight instead of getting a truncated one."""
+    flights = SingleFlight("test")
+    first, shared = flights.stream("key", slow_tokens(10, 0.05))
+    assert not shared
+    for number, _ in enumerate(first.subscribe()):
+        if number == 2:
+            break
+
+    # The producer has not published since the subscriber left
+    second, shared = flights.stream("key", slow_tokens(10, 0.0))
+    assert not shared
+    assert second is not first
+    assert "".join(second.subscribe()) == "".join(f"t{index} " for index in range(10))
+
+    with pytest.raises(StreamAbandoned):
+        list(first.subscribe())
+
+
+def test_late_subscriber_of_abandoned_stream_gets_an_error():
+    """A stream stopped for lack of subscribers closes with StreamAbandoned, not as if it were complete."""
+    flights = SingleFlight("test")
+    stream, _ = flights.stream("key", slow_tokens(10, 0.05))
+    stream.abandon()
+    done = threading.Event()
+    errors = []
+
+    def late() -> None:
+        try:
+            list(stream.subscribe())
+        except StreamAbandoned as e:
+            errors.append(e)
+        done.set()
+
+    threading.Thread(target=late).start()
+    assert done.wait(5)
+    assert errors
+
+
+def test_async_abandoned_stream_is_not_joined():
+    async def producer(meta):
+        for index in range(10):
+            await asyncio.sleep(0.02)
+            yield f"t{index} "
+
+    async def scenario() -> None:
+        flights = AsyncSingleFlight("test")
+        first, _ = flights.stream("key", producer)
+        number = 0
+        async with aclosing(first.subscribe()) as items:
+            async for _ in items:
+                number += 1
+                if number == 3:
+                    break
+
+        second, shared = flights.stream("key", producer)
+        assert not shared
+        assert "".join([item async for item in second.subscribe()]) == "".join(f"t{i} " for i in range(10))
+        with pytest.raises(StreamAbandoned):
+            async for _ in first.subscribe():
+                pass
+
+    asyncio.run(scenario())
@@ -0,0 +1,62 @@
+import multiprocessing
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from vector_index import VectorIndex
+
+ROWS_PER_WRITER = 200
+DIM = 8
+
+
+def vector_for(writer: int, number: int):
+    """A vector that identifies who wrote it and which of their rows it is."""
+    return [float(writer + 1), float(number + 1)] + [1.0] * (DIM - 2)
+
+
+def append_rows(path: str, writer: int, start) -> None:
+    index = VectorIndex(path, model="test-embed")
+    start.wait()
+    for number in range(ROWS_PER_WRITER):
+        index.add("research", f"writer {writer} row {number}", vector_for(writer, number),
+                  {"writer": writer, "number": number})
+
+
+def test_concurrent_writers_keep_vectors_and_metadata_aligned(tmp_path):
+    """Two processes appending at once never attach one row's metadata to another's vector."""
+    path = str(tmp_path / "vectors")
+    context = multiprocessing.get_context("spawn")
+    start = context.Event()
+    writers = [context.Process(target=append_rows, args=(path, writer, start)) for writer in range(2)]
+    for process in writers:
+        process.start()
+    start.set()
+    for process in writers:
+        process.join(60)
+        assert process.exitcode == 0
+
+    index = VectorIndex(path, model="test-embed")
+    assert len(index) == 2 * ROWS_PER_WRITER
+    matrix = np.fromfile(f"{path}/vectors.f32", dtype=np.float32).reshape(-1, DIM)
+    assert matrix.shape[0] == 2 * ROWS_PER_WRITER
+    for row, entry in enumerate(index._entries):
+        assert entry["row"] == row
+        assert np.allclose(matrix[row], index._normalise(vector_for(entry["writer"], entry["number"])))
+
+
+def test_out_of_order_metadata_is_dropped_on_load(tmp_path):
+    """Entries whose recorded row does not match their position are cut off when the index is opened."""
+    path = str(tmp_path / "vectors")
+    index = VectorIndex(path, model="test-embed")
+    for number in range(3):
+        index.add("research", f"row {number}", vector_for(0, number), {})
+    # Swap the last two metadata lines, as an unlocked interleaved append would have
+    with open(f"{path}/entries.jsonl", encoding="utf-8") as f:
+        lines = f.readlines()
+    with open(f"{path}/entries.jsonl", "w", encoding="utf-8") as f:
+        f.writelines([lines[0], lines[2], lines[1]])
+
+    reopened = VectorIndex(path, model="test-embed")
+    assert len(reopened) == 1
+    assert reopened.add("research", "next", vector_for(0, 9), {}) == 1
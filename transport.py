@@ -0,0 +1,192 @@
+import os
+import logging
+import threading
+import weakref
+from typing import Any, Optional, Tuple, TYPE_CHECKING
+
+# The HTTP stacks are imported on first use so that importing this module
+# (and agents/server) stays cheap for short-lived CLI and MCP processes
+if TYPE_CHECKING:
+    import httpx
+    import requests
+    from linkup import LinkupClient
+
+logger = logging.getLogger(__name__)
+
+LINKUP_BASE_URL = "https://api.linkup.so/v1"
+
+
+class Transport:
+    """Connection-pooled HTTP transport shared by the Ollama and LinkUp calls."""
+
+    def __init__(
+        self,
+        pool_size: int = 10,
+        retries: int = 3,
+        backoff_factor: float = 0.5,
+        connect_timeout: float = 10,
+        read_timeout: float = 30
+    ):
+        """Configure a keep-alive session with retries and backoff; it is created on first request."""
+        self.pool_size = pool_size
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+
+        self._session: Optional["requests.Session"] = None
+        self._session_lock = threading.Lock()
+        self._linkup = None
+        self._linkup_lock = threading.Lock()
+        self._linkup_http: Optional["httpx.Client"] = None
+        # An httpx.AsyncClient is bound to the event loop it first ran on
+        self._linkup_async_http: "weakref.WeakKeyDictionary[Any, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+    @property
+    def session(self) -> "requests.Session":
+        """The pooled requests session, built on first use."""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = self._create_session()
+        return self._session
+
+    def _create_session(self) -> "requests.Session":
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        # Only connection failures and overload responses are retried; a read
+        # error mid-stream must not silently re-run a generation.
+        retry = Retry(
+            total=self.retries,
+            connect=self.retries,
+            read=0,
+            status=self.retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=(429, 502, 503, 504),
+            allowed_methods=frozenset({"GET", "POST"}),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size, max_retries=retry)
+
+        session = requests.Session()
+        session.headers.update({"Content-Type": "application/json"})
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    @classmethod
+    def from_env(cls) -> "Transport":
+        """Build a transport from LLM_* environment settings."""
+        return cls(
+            pool_size=int(os.getenv("LLM_POOL_SIZE", "10")),
+            retries=int(os.getenv("LLM_RETRIES", "3")),
+            backoff_factor=float(os.getenv("LLM_BACKOFF", "0.5")),
+            connect_timeout=float(os.getenv("LLM_CONNECT_TIMEOUT", "10")),
+            read_timeout=float(os.getenv("LLM_READ_TIMEOUT", "30"))
+        )
+
+    def timeout(self, read: Optional[float] = None) -> Tuple[float, float]:
+        """Return a (connect, read) timeout tuple for requests."""
+        return (self.connect_timeout, self.read_timeout if read is None else read)
+
+    def get(self, url: str, read_timeout: Optional[float] = None, **kwargs) -> "requests.Response":
+        """GET through the pooled session."""
+        return self.session.get(url, timeout=self.timeout(read_timeout), **kwargs)
+
+    def post(self, url: str, read_timeout: Optional[float] = None, **kwargs) -> "requests.Response":
+        """POST through the pooled session."""
+        return self.session.post(url, timeout=self.timeout(read_timeout), **kwargs)
+
+    def linkup(self, api_key: str) -> "LinkupClient":
+        """Return a LinkUp client whose searches share this transport's keep-alive connections.
+
+        The SDK opens a new httpx client, and so a new TCP/TLS connection, for
+        every call; the client returned here sends its requests through one
+        pooled httpx client instead (one per event loop for async searches).
+        LINKUP_BASE_URL overrides the API host.
+        """
+        with self._linkup_lock:
+            if self._linkup is None:
+                self._linkup = _pooled_linkup_client(self, api_key, os.getenv("LINKUP_BASE_URL") or LINKUP_BASE_URL)
+            return self._linkup
+
+    def _limits(self) -> "httpx.Limits":
+        import httpx
+
+        return httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+
+    def linkup_http(self) -> "httpx.Client":
+        """The pooled httpx client LinkUp searches are sent through."""
+        with self._linkup_lock:
+            if self._linkup_http is None:
+                import httpx
+
+                self._linkup_http = httpx.Client(
+                    limits=self._limits(),
+                    transport=httpx.HTTPTransport(retries=self.retries),
+                    timeout=httpx.Timeout(None, connect=self.connect_timeout)
+                )
+            return self._linkup_http
+
+    def linkup_async_http(self) -> "httpx.AsyncClient":
+        """The pooled httpx.AsyncClient for LinkUp searches on the running event loop."""
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        with self._linkup_lock:
+            client = self._linkup_async_http.get(loop)
+            if client is None:
+                import httpx
+
+                client = httpx.AsyncClient(
+                    limits=self._limits(),
+                    transport=httpx.AsyncHTTPTransport(retries=self.retries),
+                    timeout=httpx.Timeout(None, connect=self.connect_timeout)
+                )
+                self._linkup_async_http[loop] = client
+            return client
+
+    def async_client(self, base_url: str) -> "httpx.AsyncClient":
+        """Create an httpx.AsyncClient with matching pool, retry and timeout settings."""
+        import httpx
+
+        return httpx.AsyncClient(
+            base_url=base_url,
+            headers={"Content-Type": "application/json"},
+            limits=self._limits(),
+            transport=httpx.AsyncHTTPTransport(retries=self.retries),
+            timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout)
+        )
+
+    def close(self) -> None:
+        """Close pooled connections."""
+        if self._session is not None:
+            self._session.close()
+        if self._linkup_http is not None:
+            self._linkup_http.close()
+
+
+def _pooled_linkup_client(transport: Transport, api_key: str, base_url: str) -> "LinkupClient":
+    """A LinkupClient whose HTTP requests go through transport's pooled httpx clients."""
+    from linkup import LinkupClient
+
+    class PooledLinkupClient(LinkupClient):
+        # The SDK opens a throwaway httpx client in _request and _async_request;
+        # search parameters, error mapping and response validation stay its own
+        def _pooled_headers(self) -> dict:
+            headers = getattr(self, "_headers", None)
+            return headers() if callable(headers) else {"Authorization": f"Bearer {api_key}"}
+
+        def _request(self, method: str, url: str, **kwargs) -> "httpx.Response":
+            return transport.linkup_http().request(method, f"{base_url}{url}", headers=self._pooled_headers(), **kwargs)
+
+        async def _async_request(self, method: str, url: str, **kwargs) -> "httpx.Response":
+            client = transport.linkup_async_http()
+            return await client.request(method, f"{base_url}{url}", headers=self._pooled_headers(), **kwargs)
+
+    if not hasattr(LinkupClient, "_request"):
+        logger.warning("This linkup-sdk version has no _request hook, so LinkUp searches are not pooled")
+    return PooledLinkupClient(api_key=api_key, base_url=base_url)
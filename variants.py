@@ -0,0 +1,69 @@
+import re
+import random
+import logging
+from typing import Dict, List, Any, Optional
+
+from prompt_builder import SIGN_OFF
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VARIANTS = 3
+MAX_VARIANTS = 5
+# Drafts are spread evenly over this temperature range, coolest first
+MIN_TEMPERATURE = 0.5
+MAX_TEMPERATURE = 1.0
+# How much each heuristic counts towards a draft's score (they sum to 1)
+SCORE_WEIGHTS = {
+    "length": 0.35,
+    "sections": 0.25,
+    "sign_off": 0.2,
+    "title": 0.1,
+    "repetition": 0.1,
+}
+
+
+def variant_options(count: int, seed: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Sampling options for count drafts: distinct temperatures and consecutive seeds from seed (random if None)."""
+    base_seed = random.randrange(2 ** 31) if seed is None else seed
+    options = []
+    for index in range(count):
+        share = index / (count - 1) if count > 1 else 0.5
+        temperature = MIN_TEMPERATURE + share * (MAX_TEMPERATURE - MIN_TEMPERATURE)
+        options.append({"temperature": round(temperature, 2), "seed": base_seed + index})
+    return options
+
+
+def variant_payloads(payload: Dict[str, Any], count: int, seed: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Copies of a generation payload differing only in temperature and seed."""
+    return [dict(payload, options=dict(payload["options"], **options)) for options in variant_options(count, seed)]
+
+
+def score_draft(text: str, target_words: int, partial: bool = False) -> Dict[str, float]:
+    """Cheap quality heuristics for a raw draft, each from 0 to 1, and their weighted "total".
+
+    length: closeness to target_words; sections: 2-4 "##" headings; sign_off:
+    the model wrote the sign-off itself; title: it opens with a "#" title;
+    repetition: share of sentences that are not repeats. A partial draft's
+    total is halved.
+    """
+    words = len(text.split())
+    headings = len(re.findall(r"^##\s+\S", text, re.MULTILINE))
+    sentences = [sentence.strip().lower() for sentence in re.split(r"[.!?]\s+", text) if sentence.strip()]
+    scores = {
+        "length": max(0.0, 1 - abs(words - target_words) / max(target_words, 1)),
+        "sections": 1.0 if 2 <= headings <= 4 else 0.5 if headings == 1 or headings == 5 else 0.0,
+        "sign_off": 1.0 if SIGN_OFF.rstrip("!") in text else 0.0,
+        "title": 1.0 if text.lstrip().startswith("# ") else 0.0,
+        "repetition": len(set(sentences)) / len(sentences) if sentences else 0.0,
+    }
+    total = sum(SCORE_WEIGHTS[name] * value for name, value in scores.items())
+    scores["total"] = round(total / 2 if partial else total, 4)
+    return scores
+
+
+def rank_variants(variants: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Order drafts best first, fallbacks last, numbering them by "rank" from 1."""
+    ranked = sorted(variants, key=lambda variant: (not variant["fallback"], variant["scores"]["total"]), reverse=True)
+    for rank, variant in enumerate(ranked, 1):
+        variant["rank"] = rank
+    return ranked
@@ -0,0 +1,343 @@
+import os
+import re
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Any, Iterator, Optional, Tuple
+
+from cache import DEFAULT_CACHE_DIR
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: appends are only serialised within one process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+VECTORS_FILE = "vectors.f32"
+ENTRIES_FILE = "entries.jsonl"
+HEADER_FILE = "index.json"
+LOCK_FILE = "index.lock"
+# Characters of a post that are embedded, and of it that are kept to quote in later prompts
+POST_EMBED_CHARS = 2000
+EXCERPT_CHARS = 300
+# Seconds to wait before trying the embeddings endpoint again after it failed
+EMBED_RETRY_SECONDS = 60.0
+
+
+def _numpy() -> Any:
+    """numpy, imported on first use; None when it is not installed."""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def default_index_path() -> str:
+    return os.getenv("VECTOR_INDEX_PATH", os.path.join(DEFAULT_CACHE_DIR, "vectors"))
+
+
+def embed_model() -> str:
+    return os.getenv("EMBED_MODEL", "nomic-embed-text")
+
+
+def vector_index_enabled() -> bool:
+    """Whether research and posts are indexed for semantic reuse (VECTOR_INDEX, on by default, needs numpy)."""
+    if os.getenv("VECTOR_INDEX", "1").lower() in ("0", "false", "no", "off"):
+        return False
+    if _numpy() is None:
+        logger.info("numpy is not installed, semantic research reuse is off")
+        return False
+    return True
+
+
+def embedding_payload(model: str, text: str) -> Dict[str, Any]:
+    """Request body for Ollama's /api/embeddings endpoint."""
+    return {"model": model, "prompt": text}
+
+
+def parse_embedding(body: Dict[str, Any]) -> Optional[List[float]]:
+    """The vector from an /api/embeddings (or /api/embed) response; None if it has none."""
+    vector = body.get("embedding")
+    if vector is None and body.get("embeddings"):
+        vector = body["embeddings"][0]
+    return vector or None
+
+
+def post_text(topic: str, content: str) -> str:
+    """What is embedded for a post: its topic and opening."""
+    return f"{topic}\n{content[:POST_EMBED_CHARS]}"
+
+
+def post_excerpt(content: str) -> str:
+    """The opening prose of a post, without its title and headings, for quoting in later prompts."""
+    lines = [line.strip() for line in content.splitlines()]
+    prose = " ".join(line for line in lines if line and not line.startswith("#"))
+    prose = re.sub(r"\s+", " ", prose)
+    if len(prose) > EXCERPT_CHARS:
+        prose = prose[:EXCERPT_CHARS - 3].rsplit(" ", 1)[0] + "..."
+    return prose
+
+
+class VectorIndex:
+    """Embeddings of past research and posts, searched by cosine similarity.
+
+    Vectors are L2-normalised float32 rows appended to one flat file, which is
+    memory-mapped for search, so inserts are incremental and the index is
+    never loaded into memory in full. Each row's metadata (kind, topic,
+    payload, created_at, row) is a line in a JSON-lines file next to it. The
+    index belongs to one embedding model; opening it with another starts it
+    afresh. Workers, the CLI and batch runs may share one index: writers hold
+    an exclusive lock on a lock file for each append, and every metadata line
+    records the row it describes, which _load checks.
+    """
+
+    def __init__(self, path: Optional[str] = None, model: Optional[str] = None):
+        """Open (or create) the index directory; raises RuntimeError without numpy."""
+        self.np = _numpy()
+        if self.np is None:
+            raise RuntimeError("numpy is required for the vector index")
+        self.path = path or default_index_path()
+        self.model = model or embed_model()
+        os.makedirs(self.path, exist_ok=True)
+        self._vectors_path = os.path.join(self.path, VECTORS_FILE)
+        self._entries_path = os.path.join(self.path, ENTRIES_FILE)
+        self._header_path = os.path.join(self.path, HEADER_FILE)
+        self._lock_path = os.path.join(self.path, LOCK_FILE)
+
+        self._lock = threading.Lock()
+        self.dim: Optional[int] = None
+        self._entries: List[Dict[str, Any]] = []
+        self._entries_offset = 0
+        self._matrix: Any = None
+        with self._file_lock():
+            self._load()
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """Hold the index's lock file so only one process writes to the index at a time."""
+        if fcntl is None:
+            yield
+            return
+        with open(self._lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _read_header(self) -> Dict[str, Any]:
+        if not os.path.exists(self._header_path):
+            return {}
+        with open(self._header_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _load(self) -> None:
+        """Read the header and metadata, dropping rows a crash left half-written or out of order."""
+        header = self._read_header()
+        if header and header.get("model") != self.model:
+            logger.warning(f"Vector index was built with {header.get('model')}, starting afresh for {self.model}")
+            self._reset()
+            return
+        self.dim = header.get("dim")
+        self._read_new_entries()
+        for position, entry in enumerate(self._entries):
+            if entry.get("row", position) != position:
+                logger.warning(f"Vector index entry {position} describes row {entry['row']}, keeping {position}")
+                self._truncate(position)
+                break
+        rows = self._vector_rows()
+        if rows != len(self._entries):
+            keep = min(rows, len(self._entries))
+            logger.warning(f"Vector index had {rows} vectors for {len(self._entries)} entries, keeping {keep}")
+            self._truncate(keep)
+
+    def _reset(self) -> None:
+        for file_path in (self._vectors_path, self._entries_path, self._header_path):
+            if os.path.exists(file_path):
+                os.remove(file_path)
+        self.dim = None
+        self._entries = []
+        self._entries_offset = 0
+        self._matrix = None
+
+    def _truncate(self, rows: int) -> None:
+        self._entries = self._entries[:rows]
+        with open(self._entries_path, "wb") as f:
+            for entry in self._entries:
+                f.write((json.dumps(entry) + "\n").encode("utf-8"))
+            self._entries_offset = f.tell()
+        if self.dim:
+            with open(self._vectors_path, "r+b") as f:
+                f.truncate(rows * self.dim * 4)
+        self._matrix = None
+
+    def _vector_rows(self) -> int:
+        if not self.dim or not os.path.exists(self._vectors_path):
+            return 0
+        return os.path.getsize(self._vectors_path) // (self.dim * 4)
+
+    def _read_new_entries(self) -> None:
+        """Pick up entries appended since the last read."""
+        exists = os.path.exists(self._entries_path)
+        if self._entries_offset and (not exists or os.path.getsize(self._entries_path) < self._entries_offset):
+            logger.info("Vector index was cleared by another process")
+            self._entries = []
+            self._entries_offset = 0
+            self._matrix = None
+        if not exists:
+            return
+        with open(self._entries_path, "rb") as f:
+            f.seek(self._entries_offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                self._entries.append(json.loads(line))
+                self._entries_offset += len(line)
+
+    def _normalise(self, vector: List[float]) -> Any:
+        array = self.np.asarray(vector, dtype=self.np.float32)
+        norm = float(self.np.linalg.norm(array))
+        return array / norm if norm > 0 else array
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def add(self, kind: str, topic: str, vector: List[float], payload: Dict[str, Any]) -> Optional[int]:
+        """Append one row and return its number; None if the vector does not fit the index."""
+        with self._lock, self._file_lock():
+            # Another process may have started or cleared the index since this one read it
+            self.dim = self._read_header().get("dim")
+            if self.dim is None:
+                self.dim = len(vector)
+                with open(self._header_path, "w", encoding="utf-8") as f:
+                    json.dump({"model": self.model, "dim": self.dim}, f)
+            elif len(vector) != self.dim:
+                logger.warning(f"Embedding has {len(vector)} dimensions, the vector index {self.dim}")
+                return None
+            self._read_new_entries()
+            row = len(self._entries)
+            # A writer that died between its two appends left a vector without metadata
+            if self._vector_rows() > row:
+                with open(self._vectors_path, "r+b") as f:
+                    f.truncate(row * self.dim * 4)
+                self._matrix = None
+            entry = {"kind": kind, "topic": topic, "created_at": time.time(), **payload, "row": row}
+            # Vector first: a crash in between leaves a vector without metadata, which _load drops
+            with open(self._vectors_path, "ab") as f:
+                f.write(self._normalise(vector).tobytes())
+            line = (json.dumps(entry) + "\n").encode("utf-8")
+            with open(self._entries_path, "ab") as f:
+                f.write(line)
+            self._entries_offset += len(line)
+            self._entries.append(entry)
+            return row
+
+    def _rows(self) -> Any:
+        """Memory map over every row written so far, reopened when rows were added."""
+        self._read_new_entries()
+        rows = min(self._vector_rows(), len(self._entries))
+        if rows == 0:
+            return None
+        if self._matrix is None or self._matrix.shape[0] != rows:
+            self._matrix = self.np.memmap(self._vectors_path, dtype=self.np.float32, mode="r", shape=(rows, self.dim))
+        return self._matrix
+
+    def search(
+        self,
+        vector: List[float],
+        kind: Optional[str] = None,
+        limit: int = 5,
+        min_similarity: float = 0.0,
+        max_age: Optional[float] = None
+    ) -> List[Tuple[float, Dict[str, Any]]]:
+        """Most similar entries first, as (cosine similarity, entry) pairs."""
+        with self._lock:
+            if self.dim is None or len(vector) != self.dim:
+                return []
+            matrix = self._rows()
+            if matrix is None:
+                return []
+            scores = matrix @ self._normalise(vector)
+            since = time.time() - max_age if max_age is not None else None
+            matches: List[Tuple[float, Dict[str, Any]]] = []
+            for row in self.np.argsort(-scores):
+                score = float(scores[row])
+                if score < min_similarity:
+                    break
+                entry = self._entries[row]
+                if kind and entry["kind"] != kind:
+                    continue
+                if since is not None and entry["created_at"] < since:
+                    continue
+                matches.append((score, entry))
+                if len(matches) >= limit:
+                    break
+            return matches
+
+    def contains(self, kind: str, **fields: Any) -> bool:
+        """Whether a row of kind has all of the given metadata values."""
+        with self._lock:
+            self._read_new_entries()
+            return any(
+                entry["kind"] == kind and all(entry.get(key) == value for key, value in fields.items())
+                for entry in self._entries
+            )
+
+    def kind_counts(self) -> Dict[str, int]:
+        """Number of rows of each kind."""
+        with self._lock:
+            self._read_new_entries()
+            counts: Dict[str, int] = {}
+            for entry in self._entries:
+                counts[entry["kind"]] = counts.get(entry["kind"], 0) + 1
+            return counts
+
+    def clear(self) -> None:
+        """Delete every row."""
+        with self._lock, self._file_lock():
+            self._reset()
+
+
+# One index per path in the process, so every generator sees every insert
+_INDEXES: Dict[str, VectorIndex] = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def get_vector_index() -> VectorIndex:
+    """The shared vector index from environment configuration."""
+    path = os.path.abspath(default_index_path())
+    with _INDEXES_LOCK:
+        if path not in _INDEXES:
+            _INDEXES[path] = VectorIndex(path, embed_model())
+        return _INDEXES[path]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Inspect the semantic index of past research and posts")
+    parser.add_argument("--clear", action="store_true", help="Delete every indexed entry")
+    args = parser.parse_args()
+
+    if _numpy() is None:
+        print("numpy is not installed")
+        return 1
+    index = get_vector_index()
+    if args.clear:
+        index.clear()
+        print("Vector index cleared.")
+        return 0
+    print(f"{index.path}: {len(index)} entries, model {index.model}, {index.dim or 0} dimensions")
+    for kind, count in sorted(index.kind_counts().items()):
+        print(f"  {kind}: {count}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())